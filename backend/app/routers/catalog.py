@@ -0,0 +1,76 @@
+import hashlib
+import os
+from fastapi import APIRouter, HTTPException, Request, Response
+from app.services.catalog_store import CatalogStore, COLUMNS
+from app.services.index_manager import IndexManager
+
+router = APIRouter()
+# Follows the published index generation, like RAGService (swaps after a re-ingest)
+catalog_manager = IndexManager(
+    os.getenv("SCHEME_INDEX_ROOT", "scheme_indexes"),
+    lambda path: {"catalog": CatalogStore(os.path.join(path, "catalog"))},
+    float(os.getenv("SCHEME_INDEX_CHECK_SECONDS", "1.0")),
+)
+MAX_PAGE = 100
+
+
+def _etag(catalog, *parts):
+    # Weak validator: the catalog content hash plus the query; changes only with a new catalog
+    key = "|".join([catalog.etag, *map(str, parts)])
+    return f'W/"{hashlib.sha1(key.encode("utf-8")).hexdigest()[:20]}"'
+
+
+def _not_modified(request, etag):
+    return etag in [t.strip() for t in request.headers.get("if-none-match", "").split(",")]
+
+
+# --- SCHEME CATALOG (columnar store, no vector search) ---
+@router.get("/api/catalog")
+def list_schemes(request: Request, response: Response, category: str = None, level: str = None,
+                 offset: int = 0, limit: int = 20):
+    if offset < 0 or not 0 < limit <= MAX_PAGE:
+        raise HTTPException(400, f"offset must be >= 0 and limit between 1 and {MAX_PAGE}")
+    with catalog_manager.acquire() as handle:
+        if handle is None or handle.catalog is None:
+            raise HTTPException(503, "Scheme catalog not built yet (run ingest.py)")
+        etag = _etag(handle.catalog, category, level, offset, limit)
+        if _not_modified(request, etag):
+            return Response(status_code=304, headers={"ETag": etag})
+        page = handle.catalog.page(category, level, offset, limit)
+    response.headers["ETag"] = etag
+    return {"generation": handle.generation, **page}
+
+
+@router.get("/api/catalog/facets")
+def facets(request: Request, response: Response):
+    with catalog_manager.acquire() as handle:
+        if handle is None or handle.catalog is None:
+            raise HTTPException(503, "Scheme catalog not built yet (run ingest.py)")
+        etag = _etag(handle.catalog, "facets")
+        if _not_modified(request, etag):
+            return Response(status_code=304, headers={"ETag": etag})
+        body = {"category": handle.catalog.values("category"), "level": handle.catalog.values("level")}
+    response.headers["ETag"] = etag
+    return body
+
+
+@router.get("/api/catalog/{scheme_id}")
+def scheme_detail(scheme_id: str, request: Request, response: Response, fields: str = None):
+    """
+    fields: comma-separated subset of the catalog columns (only those are read).
+    """
+    wanted = [f.strip() for f in fields.split(",")] if fields else list(COLUMNS)
+    unknown = [f for f in wanted if f not in COLUMNS]
+    if unknown:
+        raise HTTPException(400, f"Unknown fields: {', '.join(unknown)}")
+    with catalog_manager.acquire() as handle:
+        if handle is None or handle.catalog is None:
+            raise HTTPException(503, "Scheme catalog not built yet (run ingest.py)")
+        etag = _etag(handle.catalog, scheme_id, *wanted)
+        if _not_modified(request, etag):
+            return Response(status_code=304, headers={"ETag": etag})
+        scheme = handle.catalog.get(scheme_id, wanted)
+    if scheme is None:
+        raise HTTPException(404, "Scheme not found")
+    response.headers["ETag"] = etag
+    return scheme
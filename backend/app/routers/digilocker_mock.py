@@ -0,0 +1,86 @@
+"""
+Local stand-in for the DigiLocker (API Setu) endpoints, built from the mock data in DigiLockerService.
+
+Used in-process by AsyncDigiLockerClient when DIGILOCKER_BASE_URL is not set, or run on its own
+for offline load tests:
+    uvicorn app.routers.digilocker_mock:mock_app --port 8100
+
+Knobs (read per request, so benchmarks can change them at runtime):
+    DIGILOCKER_MOCK_LATENCY_MS   - artificial delay added to every call
+    DIGILOCKER_MOCK_EXTRA_DOCS   - number of extra marksheets to list, for bulk-fetch load tests
+"""
+import asyncio
+import os
+from fastapi import APIRouter, FastAPI, Form, Header, HTTPException
+from fastapi.responses import Response
+from app.services.digilocker_service import DigiLockerService
+
+router = APIRouter()
+sandbox = DigiLockerService()
+
+
+async def _simulate_latency():
+    latency_ms = float(os.getenv("DIGILOCKER_MOCK_LATENCY_MS", "0"))
+    if latency_ms > 0:
+        await asyncio.sleep(latency_ms / 1000)
+
+
+def _bearer(authorization):
+    if not authorization or not authorization.startswith("Bearer "):
+        raise HTTPException(status_code=401, detail="unauthorized")
+    return authorization[len("Bearer "):]
+
+
+@router.post("/oauth2/1/token")
+async def token(code: str = Form(...), grant_type: str = Form("authorization_code")):
+    await _simulate_latency()
+    data = sandbox.get_access_token(code)
+    if "error" in data:
+        raise HTTPException(status_code=400, detail=data["error"])
+    return data
+
+
+@router.get("/oauth2/1/user")
+async def user(authorization: str = Header(None)):
+    await _simulate_latency()
+    data = sandbox.get_user_details(_bearer(authorization))
+    if "error" in data:
+        raise HTTPException(status_code=401, detail=data["error"])
+    return data
+
+
+@router.get("/oauth2/2/files/issued")
+async def issued(authorization: str = Header(None)):
+    await _simulate_latency()
+    data = sandbox.get_issued_documents(_bearer(authorization))
+    if "error" in data:
+        raise HTTPException(status_code=401, detail=data["error"])
+
+    extra = int(os.getenv("DIGILOCKER_MOCK_EXTRA_DOCS", "0"))
+    if extra:
+        template = data["items"][0]
+        data = {"items": data["items"] + [
+            {**template, "uri": f"{template['uri']}-{i}", "name": f"{template['name']} #{i}"}
+            for i in range(extra)
+        ]}
+    return data
+
+
+@router.get("/oauth2/1/xml/{uri:path}")
+async def xml(uri: str, authorization: str = Header(None)):
+    await _simulate_latency()
+    content = sandbox.get_file_xml(uri, _bearer(authorization))
+    if "<Error>Unauthorized" in content:
+        raise HTTPException(status_code=401, detail="unauthorized")
+    if "<Error>" in content:
+        raise HTTPException(status_code=404, detail="document not found")
+    return Response(content=content, media_type="application/xml")
+
+
+def create_mock_app():
+    mock = FastAPI(title="DigiLocker Sandbox (Local)")
+    mock.include_router(router)
+    return mock
+
+
+mock_app = create_mock_app()
@@ -0,0 +1,17 @@
+from fastapi import APIRouter
+from app.services.eligibility_service import EligibilityService
+
+router = APIRouter()
+eligibility_service = EligibilityService()
+
+# --- ELIGIBILITY (precomputed, no LLM) ---
+@router.get("/api/eligible/{user_name}")
+def eligible_schemes(user_name: str):
+    """
+    Schemes the user certainly qualifies for, plus those that only need more data ("needs").
+    """
+    return eligibility_service.eligible_schemes(user_name)
+
+@router.get("/api/recommendations/{user_name}")
+def recommendations(user_name: str, limit: int = 10):
+    return {"user": user_name.strip().lower(), "recommendations": eligibility_service.recommend(user_name, limit)}
@@ -1,25 +1,40 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException
+from fastapi import APIRouter, UploadFile, File, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
 from app.services.ocr_service import OCRService
 from app.services.digilocker_service import DigiLockerService
+from app.services.digilocker_client import AsyncDigiLockerClient
+from app.services.xml_normalizer import DigiLockerXMLNormalizer
+from app.services.data_service import DataService
+from app.services.unit_of_work import UnitOfWork
+from app.services.admission import get_controller, client_key
+import asyncio
+import time
 
 router = APIRouter()
 ocr_service = OCRService()
 digilocker_service = DigiLockerService()
+digilocker_client = AsyncDigiLockerClient()
+xml_normalizer = DigiLockerXMLNormalizer()
+data_service = DataService()
 
 # --- OCR ENDPOINTS (Manual Upload) ---
 @router.post("/upload")
-async def upload_document(file: UploadFile = File(...)):
+async def upload_document(request: Request, file: UploadFile = File(...)):
     if file.content_type not in ["image/jpeg", "image/png"]:
         raise HTTPException(400, "Only JPEG or PNG images allowed")
 
     content = await file.read()
-    text = ocr_service.extract_text(content)
+    # Tesseract is CPU-bound: bounded slots, fair per client, off the event loop
+    async with get_controller("upload").slot(client_key(request)):
+        text = await run_in_threadpool(ocr_service.extract_text, content)
     
     if not text:
         return {"status": "failed", "message": "No text extracted."}
 
     parsed_data = ocr_service.parse_document(text)
-    return {"status": "success", "filename": file.filename, "data": parsed_data}
+    # Which registered user this document belongs to (index lookup on uid / id_number / mobile ...)
+    matched_user = data_service.resolve_identity(parsed_data.get("extracted_data", {}))
+    return {"status": "success", "filename": file.filename, "data": parsed_data, "matched_user": matched_user}
 
 # --- DIGILOCKER ENDPOINTS (Verified Data) ---
 
@@ -32,38 +47,139 @@ def digilocker_init():
     return {"redirect_url": url}
 
 @router.get("/digilocker/callback")
-def digilocker_callback(code: str, state: str):
+async def digilocker_callback(code: str, state: str):
     """
     Step 2: The frontend sends the 'code' here to exchange for an Access Token.
     """
     # 1. Exchange Code for Token
-    token_data = digilocker_service.get_access_token(code)
+    token_data = await digilocker_client.get_access_token(code)
     if "error" in token_data:
         raise HTTPException(status_code=400, detail="Invalid Auth Code")
     
     # 2. Immediately fetch User Profile to confirm identity
     access_token = token_data["access_token"]
-    user_profile = digilocker_service.get_user_details(access_token)
+    user_profile = await digilocker_client.get_user_details(access_token)
+
+    # 3. Resolve to our user record by DigiLocker id (index lookup, not a scan)
+    user_key = data_service.find_key("digilockerid", user_profile.get("digilockerid"))
     
     return {
         "status": "success",
         "token": access_token, 
-        "user": user_profile
+        "user": user_profile,
+        "user_key": user_key or data_service.resolve_key(user_profile.get("name")),
+        "known_user": user_key is not None
     }
 
 @router.get("/digilocker/documents")
-def get_documents(token: str):
+async def get_documents(token: str):
     """
     Step 3: Fetch list of issued documents (Marksheets, Aadhaar, etc.)
     """
-    docs = digilocker_service.get_issued_documents(token)
+    docs = await digilocker_client.get_issued_documents(token)
     return docs
 
 @router.get("/digilocker/xml")
-def get_document_xml(uri: str, token: str):
+async def get_document_xml(uri: str, token: str):
     """
     Step 4: Fetch the MACHINE-READABLE XML for a specific document.
     This is what the Automation Engine (Module C) will read.
     """
-    xml_data = digilocker_service.get_file_xml(uri, token)
-    return {"uri": uri, "xml_content": xml_data}
\ No newline at end of file
+    xml_data = await digilocker_client.get_file_xml(uri, token)
+    return {"uri": uri, "xml_content": xml_data}
+
+@router.get("/digilocker/bulk")
+async def get_all_documents_xml(token: str):
+    """
+    Step 3+4 in one call: list issued documents and fetch ALL their XML concurrently.
+    """
+    start = time.perf_counter()
+    documents = await digilocker_client.fetch_all_xml(token)
+    if isinstance(documents, dict) and "error" in documents:
+        raise HTTPException(status_code=401, detail="Invalid or expired token")
+
+    return {
+        "count": len(documents),
+        "documents": documents,
+        "elapsed_ms": round((time.perf_counter() - start) * 1000, 1)
+    }
+
+def _save_documents(user_name, identifiers, digilockerid, parsed_docs):
+    """
+    All imported documents merged into the user's record and saved in one store write.
+    -> the user key, or None when there is nobody to save them under.
+    """
+    user_key = data_service.resolve_key(user_name, identifiers)
+    if not user_key and digilockerid:
+        # No name and no known identifier: the DigiLocker account is still one person
+        user_key = f"digilocker-{digilockerid}".strip().lower()
+    uow = UnitOfWork(data_service)
+    for parsed in parsed_docs:
+        std_data = dict(parsed["standardized_data"])
+        std_data["digilockerid"] = digilockerid
+        uow.update_user_data(user_key, {
+            "document_type": parsed["document_type"],
+            "standardized_data": std_data,
+            "specific_data": parsed["specific_data"],
+        })
+    if parsed_docs and not uow.dirty:
+        # update_user_data ignores empty (and reserved "__") keys
+        return None
+    uow.commit()
+    return user_key
+
+@router.post("/digilocker/import")
+async def import_verified_documents(token: str):
+    """
+    Step 5: Pull every issued document, parse the XML locally and save it to the user's profile.
+    Verified data, zero LLM calls. Already-parsed documents (same URI + version) are not re-downloaded.
+    """
+    user_profile, listing = await asyncio.gather(
+        digilocker_client.get_user_details(token), digilocker_client.get_issued_documents(token)
+    )
+    if "error" in user_profile or "error" in listing:
+        raise HTTPException(status_code=401, detail="Invalid or expired token")
+
+    items = listing.get("items", [])
+    parsed_docs, missing = [], []
+    for item in items:
+        cached = xml_normalizer.get_cached(item.get("uri"), item.get("date"))
+        if cached is not None:
+            parsed_docs.append(cached)
+        else:
+            missing.append(item)
+
+    fetched = await digilocker_client.fetch_all_xml(token, items=missing)
+    failed = []
+    for doc in fetched:
+        if "error" in doc:
+            failed.append({"uri": doc["uri"], "error": doc["error"]})
+            continue
+        parsed = xml_normalizer.normalize(
+            doc["xml_content"], doctype=doc["doctype"], uri=doc["uri"], version=doc["version"]
+        )
+        if parsed["document_type"] == "Unknown":
+            failed.append({"uri": doc["uri"], "error": "No mapping for this document type"})
+        else:
+            parsed_docs.append(parsed)
+
+    user_name = user_profile.get("name")
+    # Same person = same DigiLocker id / UID / roll number, even if another user shares the name
+    identifiers = {"digilockerid": user_profile.get("digilockerid")}
+    for parsed in parsed_docs:
+        for field, value in parsed["standardized_data"].items():
+            identifiers.setdefault(field, value)
+    user_key = await run_in_threadpool(
+        _save_documents, user_name, identifiers, user_profile.get("digilockerid"), parsed_docs)
+    if user_key is None:
+        raise HTTPException(status_code=422, detail="Could not identify the DigiLocker user; nothing was saved.")
+
+    return {
+        "status": "success",
+        "user": user_name,
+        "user_key": user_key,
+        "imported": [p["document_type"] for p in parsed_docs],
+        "cached": len(items) - len(missing),
+        "failed": failed,
+        "llm_calls": 0
+    }
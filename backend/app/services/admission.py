@@ -0,0 +1,203 @@
+"""
+Admission control for the expensive endpoints (LLM chat and batches, tesseract OCR, Chrome RPA).
+
+Each class has a concurrency limit and a bounded waiting queue. Waiters are queued per client
+(client_key) and served round-robin, so one client hammering /api/chat cannot starve the others.
+When there is no room the request is refused immediately instead of piling up:
+
+    429 + Retry-After   this client already has `per_user` requests waiting
+    503 + Retry-After   the class queue is full, or the wait exceeded `max_wait` seconds
+
+Limits are per process (serve.py workers each get their own). Override per class with
+ADMISSION_<CLASS>=concurrency:queue:max_wait_seconds:per_user, e.g. ADMISSION_CHAT=8:32:10:2
+"""
+import asyncio
+import math
+import os
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from app.services.metrics import registry
+from app.services.log_service import get_logger
+
+log = get_logger(__name__)
+
+IN_FLIGHT = registry.gauge("sevai_admission_in_flight", "Requests holding a slot, by class")
+QUEUE_DEPTH = registry.gauge("sevai_admission_queue_depth", "Requests waiting for a slot, by class")
+REJECTED = registry.counter("sevai_admission_rejected_total", "Requests refused, by class and reason")
+WAIT_SECONDS = registry.histogram("sevai_admission_wait_seconds", "Time spent queued before admission")
+
+DEFAULTS = {
+    "chat": (8, 32, 10.0, 2),
+    "upload": (os.cpu_count() or 2, 16, 15.0, 2),
+    "rpa": (2, 4, 30.0, 1),
+    # /api/chat/batch: each admitted batch fans out up to CHAT_BATCH_CONCURRENCY LLM calls itself
+    "batch": (2, 4, 30.0, 1),
+}
+
+
+def client_key(request):
+    """
+    Who a request is queued and limited as: the connecting address (uvicorn --proxy-headers
+    resolves it behind a trusted proxy). Never a name from the body, which a client could
+    change on every request.
+    """
+    return request.client.host if request.client else "anonymous"
+
+
+class Rejected(Exception):
+    def __init__(self, status, reason, retry_after):
+        super().__init__(reason)
+        self.status = status
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class Lease:
+    """
+    One admitted slot. transfer() hands it to background work that outlives the request (an LLM
+    call finishing after a degraded reply): the slot stays counted until that work releases it.
+    """
+    def __init__(self, controller):
+        self.controller = controller
+        self.start = time.perf_counter()
+        self.transferred = False
+
+    def transfer(self):
+        self.transferred = True
+        return self
+
+    def release(self):
+        self.controller.release(time.perf_counter() - self.start)
+
+
+class AdmissionController:
+    """
+    Lives on the event loop thread; no locks needed.
+    """
+    def __init__(self, name, concurrency, max_queue, max_wait, per_user):
+        self.name = name
+        self.concurrency = concurrency
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.per_user = per_user
+        self.active = 0
+        self.queued = 0
+        self._queues = OrderedDict()  # user -> deque of futures, in round-robin order
+        self._service_time = 1.0      # EWMA of slot hold time, for Retry-After
+
+    def _retry_after(self):
+        backlog = (self.queued + 1) / max(self.concurrency, 1)
+        return max(1, math.ceil(backlog * self._service_time))
+
+    def _publish(self):
+        IN_FLIGHT.set(self.active, cls=self.name)
+        QUEUE_DEPTH.set(self.queued, cls=self.name)
+
+    def _reject(self, status, reason):
+        REJECTED.inc(cls=self.name, reason=reason)
+        raise Rejected(status, reason, self._retry_after())
+
+    async def acquire(self, user):
+        if self.active < self.concurrency and not self.queued:
+            self.active += 1
+            self._publish()
+            return
+
+        if self.queued >= self.max_queue:
+            self._reject(503, "queue_full")
+        user_queue = self._queues.get(user)
+        if user_queue is not None and len(user_queue) >= self.per_user:
+            self._reject(429, "per_user_limit")
+
+        future = asyncio.get_running_loop().create_future()
+        self._queues.setdefault(user, deque()).append(future)
+        self.queued += 1
+        self._publish()
+
+        start = time.perf_counter()
+        try:
+            done, _ = await asyncio.wait({future}, timeout=self.max_wait)
+        except asyncio.CancelledError:
+            # Client went away while waiting; a slot handed over in the meantime must be passed on
+            if future.done():
+                self.release()
+            else:
+                self._withdraw(user, future)
+            raise
+        WAIT_SECONDS.observe(time.perf_counter() - start, cls=self.name)
+        if not done:
+            self._withdraw(user, future)
+            self._reject(503, "wait_timeout")
+
+    def try_acquire(self):
+        """
+        A Lease when a slot is free right now and nobody is waiting, else None. Never queues
+        (speculative work must not take a turn from real requests).
+        """
+        if self.active < self.concurrency and not self.queued:
+            self.active += 1
+            self._publish()
+            return Lease(self)
+        return None
+
+    def _withdraw(self, user, future):
+        user_queue = self._queues.get(user)
+        if user_queue and future in user_queue:
+            user_queue.remove(future)
+            self.queued -= 1
+            if not user_queue:
+                del self._queues[user]
+        future.cancel()
+        self._publish()
+
+    def release(self, held=None):
+        if held is not None:
+            self._service_time = 0.8 * self._service_time + 0.2 * held
+        # Hand the slot straight to the next user in round-robin order (active count unchanged)
+        while self._queues:
+            user, user_queue = next(iter(self._queues.items()))
+            future = user_queue.popleft()
+            self.queued -= 1
+            if user_queue:
+                self._queues.move_to_end(user)
+            else:
+                del self._queues[user]
+            if not future.done():
+                future.set_result(True)
+                self._publish()
+                return
+        self.active -= 1
+        self._publish()
+
+    @asynccontextmanager
+    async def slot(self, user="anonymous"):
+        await self.acquire(user)
+        lease = Lease(self)
+        try:
+            yield lease
+        finally:
+            if not lease.transferred:
+                lease.release()
+
+
+def _config(name):
+    concurrency, max_queue, max_wait, per_user = DEFAULTS[name]
+    raw = os.getenv(f"ADMISSION_{name.upper()}")
+    if raw:
+        parts = raw.split(":")
+        concurrency = int(parts[0])
+        max_queue = int(parts[1]) if len(parts) > 1 else max_queue
+        max_wait = float(parts[2]) if len(parts) > 2 else max_wait
+        per_user = int(parts[3]) if len(parts) > 3 else per_user
+    return concurrency, max_queue, max_wait, per_user
+
+
+_controllers = {}
+
+
+def get_controller(name):
+    if name not in _controllers:
+        _controllers[name] = AdmissionController(name, *_config(name))
+        log.info("🚦 Admission class ready", extra={"cls": name, "limits": _config(name)})
+    return _controllers[name]
@@ -0,0 +1,74 @@
+"""
+Content-addressed store for document payloads (OCR / DigiLocker), next to user_db.json.
+
+    blobs/ab/ab3f...e9.json      key = sha256 of the canonical JSON, so identical documents share one file
+
+User records keep only a compact reference (see make_ref); payloads are read when a flow needs them.
+"""
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from app.services.metrics import span, CACHE_HITS, CACHE_MISSES
+
+# Small fields copied into the reference so common reads (prompt, eligibility) never open the blob
+KEY_FIELDS = (
+    "board_name", "Board", "board", "year", "result", "Result", "total", "Total", "percentage",
+    "annual_income", "income", "category", "caste", "community", "certificate_number",
+)
+MAX_KEY_FIELD_CHARS = 80
+
+
+def content_hash(payload):
+    canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def make_ref(doc, digest, added_at):
+    data = doc.get("data") or {}
+    key_fields = {
+        k: v for k, v in data.items()
+        if k in KEY_FIELDS and isinstance(v, (str, int, float)) and len(str(v)) <= MAX_KEY_FIELD_CHARS
+    }
+    return {"type": doc.get("type", "Unknown"), "hash": digest, "added_at": added_at, "key_fields": key_fields}
+
+
+class BlobStore:
+    def __init__(self, directory="blobs", cache_size=128):
+        self.directory = directory
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+
+    def _path(self, digest):
+        return os.path.join(self.directory, digest[:2], f"{digest}.json")
+
+    def put(self, payload):
+        """
+        -> hash. Writing an existing hash is a no-op (same content, same name).
+        """
+        digest = content_hash(payload)
+        path = self._path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{os.getpid()}.tmp"
+            with span("blob.save"), open(tmp, "w", encoding="utf-8") as f:
+                json.dump(payload, f, ensure_ascii=False)
+            os.replace(tmp, path)
+        return digest
+
+    def get(self, digest):
+        cached = self._cache.get(digest)
+        if cached is not None:
+            CACHE_HITS.inc(cache="blob")
+            self._cache.move_to_end(digest)
+            return cached
+        CACHE_MISSES.inc(cache="blob")
+        try:
+            with span("blob.load"), open(self._path(digest), "r", encoding="utf-8") as f:
+                payload = json.load(f)
+        except FileNotFoundError:
+            return None
+        self._cache[digest] = payload
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return payload
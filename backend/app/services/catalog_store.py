@@ -0,0 +1,250 @@
+"""
+Columnar, memory-mapped scheme catalog, built by ingest.py into each index generation.
+
+    catalog/
+        <column>.bin + <column>_offsets.npy   UTF-8 values of one field, back to back (see scheme_index)
+        ids_sorted.npy / id_rows.npy          scheme ids sorted, and the row of each (binary search)
+        <category|level>_rows.npy             rows grouped by value
+        <category|level>_keys.json            {lower-cased value: [start, end]} into the rows array
+        manifest.json                         {"count", "columns", "etag"}
+
+One field of one scheme is a slice of a mapped file: no pandas, no re-parsing of page_content,
+and forked workers share the pages. The vector index holds one chunk per scheme section
+(chunk_sections) tagged with `scheme_id` and `section`; retrieval hydrates only the matched
+sections from here.
+"""
+import hashlib
+import json
+import os
+import shutil
+import numpy as np
+from app.services.scheme_index import write_blob
+from app.services.log_service import get_logger
+
+log = get_logger(__name__)
+
+# catalog field -> CSV header
+COLUMNS = {
+    "name": "scheme_name",
+    "category": "schemeCategory",
+    "level": "level",
+    "details": "details",
+    "benefits": "benefits",
+    "eligibility": "eligibility",
+    "documents": "documents",
+    "application": "application",
+}
+INDEXED = ("category", "level")
+SUMMARY = ("name", "category", "level")
+# Long-text columns, embedded one chunk per section (ingest.py) -> label shown to the LLM
+SECTIONS = {
+    "details": "Details",
+    "benefits": "Benefits",
+    "eligibility": "Eligibility",
+    "documents": "Documents Required",
+    "application": "Application Process",
+}
+# MiniLM reads 256 word pieces at most; longer sections are split into windows of this many words
+CHUNK_WORDS = 160
+EMPTY_VALUES = ("", "not specified", "nan")
+
+
+def row_fields(row):
+    """
+    CSV row (dict / pandas Series) -> {field: str}.
+    """
+    return {field: str(row.get(header, "") or "") for field, header in COLUMNS.items()}
+
+
+def scheme_id(fields):
+    key = "|".join((fields["name"], fields["category"], fields["level"])).lower()
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()[:12]
+
+
+def page_content(fields):
+    """
+    The text that gets embedded (and shown to the LLM) for one scheme.
+    """
+    return f"""
+        Scheme Name: {fields.get('name') or 'Unknown'}
+        Category: {fields.get('category') or 'Unknown'}
+        Level: {fields.get('level') or 'Unknown'}
+
+        Details:
+        {fields.get('details', '')}
+
+        Benefits:
+        {fields.get('benefits', '')}
+
+        Eligibility:
+        {fields.get('eligibility', '')}
+
+        Documents Required:
+        {fields.get('documents', '')}
+        """
+
+
+def section_content(fields, sections):
+    """
+    Scheme header plus only the given sections (in catalog order), for the prompt.
+    """
+    lines = [
+        f"        Scheme Name: {fields.get('name') or 'Unknown'}",
+        f"        Category: {fields.get('category') or 'Unknown'} | Level: {fields.get('level') or 'Unknown'}",
+    ]
+    for section in SECTIONS:
+        if section in sections and fields.get(section):
+            lines.append(f"        {SECTIONS[section]}:\n        {fields[section]}")
+    return "\n".join(lines) + "\n"
+
+
+def chunk_sections(fields, chunk_words=CHUNK_WORDS):
+    """
+    One scheme -> [(section, part, text)] to embed. Each chunk is prefixed with the scheme name
+    so a chunk is still about its scheme when read alone.
+    """
+    chunks = []
+    for section, label in SECTIONS.items():
+        value = (fields.get(section) or "").strip()
+        if value.lower() in EMPTY_VALUES:
+            continue
+        words = value.split()
+        for part, start in enumerate(range(0, len(words), chunk_words)):
+            body = " ".join(words[start:start + chunk_words])
+            chunks.append((section, part, f"Scheme Name: {fields.get('name') or 'Unknown'}\n{label}: {body}"))
+    return chunks
+
+
+def write_catalog(directory, rows):
+    """
+    rows: [{field: str}] (see row_fields) -> list of scheme ids, in row order.
+    Written into a temp dir and renamed, like the scheme index.
+    """
+    tmp = directory.rstrip("/") + ".tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+
+    ids, seen = [], {}
+    for fields in rows:
+        sid = scheme_id(fields)
+        # Exact duplicate rows in the CSV still get distinct ids
+        seen[sid] = seen.get(sid, 0) + 1
+        ids.append(sid if seen[sid] == 1 else f"{sid}-{seen[sid]}")
+
+    digest = hashlib.sha256()
+    for field in COLUMNS:
+        values = [fields[field] for fields in rows]
+        write_blob(tmp, field, values)
+        for value in values:
+            digest.update(value.encode("utf-8"))
+            digest.update(b"\0")
+
+    write_blob(tmp, "id", ids)
+    order = np.argsort(np.array(ids, dtype=object)).astype(np.int64)
+    np.save(os.path.join(tmp, "ids_sorted.npy"), np.array([ids[i] for i in order], dtype="U"))
+    np.save(os.path.join(tmp, "id_rows.npy"), order)
+
+    for field in INDEXED:
+        groups = {}
+        for i, fields in enumerate(rows):
+            groups.setdefault(fields[field].strip().lower(), []).append(i)
+        flat, keys = [], {}
+        for value in sorted(groups):
+            keys[value] = [len(flat), len(flat) + len(groups[value])]
+            flat.extend(groups[value])
+        np.save(os.path.join(tmp, f"{field}_rows.npy"), np.array(flat, dtype=np.int64))
+        with open(os.path.join(tmp, f"{field}_keys.json"), "w", encoding="utf-8") as f:
+            json.dump(keys, f, ensure_ascii=False)
+
+    with open(os.path.join(tmp, "manifest.json"), "w") as f:
+        json.dump({"count": len(rows), "columns": list(COLUMNS), "etag": digest.hexdigest()[:16]}, f)
+
+    if os.path.exists(directory):
+        shutil.rmtree(directory)
+    os.replace(tmp, directory)
+    log.info("✅ Scheme catalog written", extra={"dir": directory, "schemes": len(rows)})
+    return ids
+
+
+class CatalogStore:
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, "manifest.json")) as f:
+            manifest = json.load(f)
+        self.count = manifest["count"]
+        self.etag = manifest["etag"]
+        self._columns = {field: self._map(field) for field in list(COLUMNS) + ["id"]}
+        self._ids_sorted = np.load(os.path.join(directory, "ids_sorted.npy"), mmap_mode="r")
+        self._id_rows = np.load(os.path.join(directory, "id_rows.npy"), mmap_mode="r")
+        self._indexes = {}
+        for field in INDEXED:
+            with open(os.path.join(directory, f"{field}_keys.json"), encoding="utf-8") as f:
+                keys = json.load(f)
+            self._indexes[field] = (np.load(os.path.join(directory, f"{field}_rows.npy"), mmap_mode="r"), keys)
+
+    def _map(self, field):
+        path = os.path.join(self.directory, f"{field}.bin")
+        # An all-empty column is a zero-byte file, which cannot be mapped
+        blob = np.memmap(path, dtype=np.uint8, mode="r") if os.path.getsize(path) else np.zeros(0, dtype=np.uint8)
+        return blob, np.load(os.path.join(self.directory, f"{field}_offsets.npy"), mmap_mode="r")
+
+    def __len__(self):
+        return self.count
+
+    def field(self, row, field):
+        blob, offsets = self._columns[field]
+        return blob[offsets[row]:offsets[row + 1]].tobytes().decode("utf-8")
+
+    def row_of(self, sid):
+        i = int(np.searchsorted(self._ids_sorted, sid))
+        if i < len(self._ids_sorted) and self._ids_sorted[i] == sid:
+            return int(self._id_rows[i])
+        return None
+
+    def get(self, sid, fields=None):
+        """
+        -> {"scheme_id", field: value, ...} or None. Only the requested columns are read.
+        """
+        row = self.row_of(sid)
+        if row is None:
+            return None
+        return {"scheme_id": sid, **{f: self.field(row, f) for f in (fields or COLUMNS)}}
+
+    def page_content(self, sid, sections=None):
+        """
+        Whole scheme text, or only `sections` (plus the name) when given.
+        """
+        if not sections:
+            scheme = self.get(sid)
+            return page_content(scheme) if scheme else None
+        scheme = self.get(sid, list(SUMMARY) + [s for s in sections if s in SECTIONS])
+        return section_content(scheme, sections) if scheme else None
+
+    def rows(self, category=None, level=None):
+        """
+        Row numbers matching the filters, ascending (catalog order).
+        """
+        selected = None
+        for field, value in (("category", category), ("level", level)):
+            if not value:
+                continue
+            rows, keys = self._indexes[field]
+            start, end = keys.get(value.strip().lower(), (0, 0))
+            matched = np.asarray(rows[start:end])
+            selected = matched if selected is None else np.intersect1d(selected, matched)
+        return np.arange(self.count) if selected is None else np.sort(selected)
+
+    def values(self, field):
+        """
+        Distinct (lower-cased) values of an indexed field with their counts.
+        """
+        _, keys = self._indexes[field]
+        return {value: end - start for value, (start, end) in keys.items()}
+
+    def page(self, category=None, level=None, offset=0, limit=20):
+        rows = self.rows(category, level)
+        items = [
+            {"scheme_id": self.field(int(r), "id"), **{f: self.field(int(r), f) for f in SUMMARY}}
+            for r in rows[offset:offset + limit]
+        ]
+        return {"total": int(len(rows)), "offset": offset, "limit": limit, "items": items}
@@ -0,0 +1,168 @@
+"""
+Latency budgets for /api/chat and the locally built fallback answer.
+
+Budget, first match wins:
+    1. X-Deadline-Ms header
+    2. "deadline_ms" in the request body
+    3. CHAT_CLIENT_DEADLINES_MS[X-Client header], e.g. '{"web": 6000, "cli": 30000}'
+    4. CHAT_DEADLINE_MS (default 10000)
+clamped to [CHAT_DEADLINE_MIN_MS, CHAT_DEADLINE_MAX_MS].
+
+When the LLM cannot answer inside the budget, the user gets the retrieved scheme names with
+their key eligibility lines and the profile fields still missing, flagged "degraded".
+The full answer can keep running in the background (PendingResults) and be fetched later.
+"""
+import asyncio
+import json
+import os
+import re
+import time
+import uuid
+from collections import OrderedDict
+from app.services.metrics import registry
+from app.services.log_service import get_logger
+
+log = get_logger(__name__)
+
+DEGRADED = registry.counter("sevai_chat_degraded_total", "Chat answers built without the LLM, by reason")
+
+_ELIGIBILITY = re.compile(r"Eligibility:\s*(.+?)(?:\n\s*\n|Documents Required:|Application Process:|$)", re.S)
+_NAME = re.compile(r"Scheme Name:\s*(.+)")
+
+
+def _client_deadlines():
+    try:
+        return json.loads(os.getenv("CHAT_CLIENT_DEADLINES_MS", "{}"))
+    except ValueError:
+        return {}
+
+
+def resolve_budget(headers, body_ms=None):
+    """
+    -> seconds available for the whole request.
+    """
+    value = headers.get("x-deadline-ms") or body_ms
+    if not value:
+        value = _client_deadlines().get(headers.get("x-client", ""), os.getenv("CHAT_DEADLINE_MS", "10000"))
+    try:
+        ms = float(value)
+    except (TypeError, ValueError):
+        ms = float(os.getenv("CHAT_DEADLINE_MS", "10000"))
+    low = float(os.getenv("CHAT_DEADLINE_MIN_MS", "500"))
+    high = float(os.getenv("CHAT_DEADLINE_MAX_MS", "60000"))
+    return min(max(ms, low), high) / 1000
+
+
+def _key_lines(text, limit=220, column=None):
+    """
+    First sentences of the eligibility criteria: the catalog column when given, else parsed
+    out of the document text (which, hydrated, may hold other sections only).
+    """
+    if column is None:
+        match = _ELIGIBILITY.search(text or "")
+        column = match.group(1) if match else ""
+    body = " ".join(column.split())
+    if not body or body.lower() in ("not specified", "nan"):
+        return ""
+    first = re.split(r"(?<=[.;])\s+", body)
+    out = ""
+    for sentence in first:
+        if len(out) + len(sentence) > limit:
+            break
+        out = f"{out} {sentence}".strip()
+    return out or body[:limit - 1] + "…"
+
+
+def build_degraded_answer(docs, missing, reason, eligibility=None):
+    """
+    docs: [(page_content, metadata)] from retrieval; missing: {automation: [fields]};
+    eligibility: {scheme_id: eligibility column} from the catalog (RAGService.eligibility_of).
+    Same keys as a normal LLM answer, plus "degraded" and "schemes".
+    """
+    eligibility = eligibility or {}
+    DEGRADED.inc(reason=reason)
+    schemes = []
+    for text, meta in docs:
+        name = (meta or {}).get("scheme_name")
+        if not name:
+            found = _NAME.search(text or "")
+            name = found.group(1).strip() if found else "Unnamed scheme"
+        column = eligibility.get((meta or {}).get("scheme_id"))
+        schemes.append({"scheme_name": name, "eligibility": _key_lines(text, column=column)})
+
+    lines = ["I'm taking longer than usual, so here is a quick answer from our scheme database."]
+    if schemes:
+        lines.append("Schemes that match your question:")
+        for s in schemes:
+            lines.append(f"• {s['scheme_name']}" + (f" — {s['eligibility']}" if s["eligibility"] else ""))
+    else:
+        lines.append("I could not find matching schemes right now.")
+    gaps = sorted({f for fields in missing.values() for f in fields})
+    if gaps:
+        lines.append(f"To apply on your behalf I still need: {', '.join(f.replace('_', ' ') for f in gaps)}.")
+
+    return {
+        "response_text": "\n".join(lines),
+        "extracted_data": None,
+        "action": "NONE",
+        "target_scheme": None,
+        "missing_data": gaps,
+        "schemes": schemes,
+        "degraded": True,
+        "degraded_reason": reason,
+    }
+
+
+class PendingResults:
+    """
+    Work still running after the reply went out: full answers behind a degraded reply, and
+    application (RPA) runs. At most `max_pending` run at once; a finished entry is kept for
+    `ttl` seconds from when it finished, and at most `max_finished` of them (oldest dropped).
+    """
+    def __init__(self, max_pending=None, ttl=600, max_finished=None):
+        self.max_pending = max_pending or int(os.getenv("CHAT_BACKGROUND_MAX", "32"))
+        self.max_finished = max_finished or int(os.getenv("CHAT_RESULTS_MAX", "512"))
+        self.ttl = ttl
+        self._tasks = OrderedDict()     # result_id -> task
+        self._finished = OrderedDict()  # result_id -> finish time, in finishing order
+
+    def _expire(self):
+        now = time.time()
+        while self._finished:
+            result_id, finished = next(iter(self._finished.items()))
+            if now - finished <= self.ttl and len(self._finished) <= self.max_finished:
+                break
+            del self._finished[result_id]
+            del self._tasks[result_id]
+
+    def _on_done(self, result_id):
+        self._finished[result_id] = time.time()
+        self._expire()
+
+    def running(self):
+        return len(self._tasks) - len(self._finished)
+
+    def submit(self, coro):
+        """
+        -> result_id, or None when too many are already running (the caller cancels the work).
+        """
+        self._expire()
+        if self.running() >= self.max_pending:
+            coro.close()
+            return None
+        result_id = uuid.uuid4().hex
+        task = asyncio.ensure_future(coro)
+        self._tasks[result_id] = task
+        task.add_done_callback(lambda _: self._on_done(result_id))
+        return result_id
+
+    def get(self, result_id):
+        self._expire()
+        task = self._tasks.get(result_id)
+        if task is None:
+            return {"status": "unknown"}
+        if not task.done():
+            return {"status": "pending"}
+        if task.cancelled() or task.exception() is not None:
+            return {"status": "failed"}
+        return {"status": "done", "response": task.result()}
@@ -1,76 +1,575 @@
+import copy
 import json
 import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from app.services.metrics import span, CACHE_HITS, CACHE_MISSES
+from app.services.blob_store import BlobStore, content_hash, make_ref
+from app.services.log_service import get_logger
+
+try:
+    import fcntl
+except ImportError:  # Windows dev machines: in-process lock only
+    fcntl = None
+
+log = get_logger(__name__)
 
 DB_FILE = "user_db.json"
 
+# --- APPLICATION VIEW ---
+# Canonical fields every automation needs, one bit each (order matters: it is the bit position)
+CANONICAL_FIELDS = (
+    "full_name", "first_name", "middle_name", "last_name", "dob", "gender", "father_name",
+    "mobile", "email", "address", "state", "district", "pincode", "id_number",
+)
+FIELD_BITS = {field: 1 << i for i, field in enumerate(CANONICAL_FIELDS)}
+
+# Fields each automation needs before it can run (bit i of "ready_mask" = scheme i is ready)
+SCHEME_REQUIREMENTS = {
+    "PAN Card": ("first_name", "dob", "mobile", "email"),
+    "Scholarship": ("full_name", "dob", "mobile", "father_name"),
+}
+SCHEME_BITS = {scheme: 1 << i for i, scheme in enumerate(SCHEME_REQUIREMENTS)}
+SCHEME_MASKS = {
+    scheme: sum(FIELD_BITS[f] for f in fields) for scheme, fields in SCHEME_REQUIREMENTS.items()
+}
+
+# Where the same canonical field shows up under other names (OCR, LLM, DigiLocker)
+FIELD_ALIASES = {
+    "name": "full_name",
+    "raw_name": "full_name",
+    "parent_name": "father_name",
+    "full_address": "address",
+}
+
+# Nested profile sections (OCR / seed data); any other dict value is not profile fields
+PROFILE_GROUPS = ("personal_details", "contact_details", "address_details", "relations")
+
+# --- SECONDARY IDENTITY INDEXES ---
+# Stored in the same file under a reserved key, so records and indexes are saved together.
+# Keys starting with "__" are never user records.
+INDEX_KEY = "__indexes__"
+# Strongest first: resolve_identity trusts the first one that matches
+INDEXED_FIELDS = ("uid", "digilockerid", "id_number", "mobile", "email")
+# A different value for one of these on a same-name record means a different person
+STRONG_FIELDS = ("uid", "digilockerid", "id_number")
+MAX_CONFLICTS = 200
+
+
+def normalize_identifier(field, value):
+    value = str(value or "").strip()
+    if field == "mobile":
+        digits = re.sub(r"\D", "", value)
+        return digits[-10:] if len(digits) >= 10 else None
+    if field == "email":
+        return value.lower() if "@" in value else None
+    if field == "uid":
+        # Only a full 12-digit Aadhaar identifies someone: a masked one (xxxx xxxx 1234) is shared
+        # by everyone with the same last four digits, so it is never indexed
+        value = re.sub(r"[\s\-]", "", value)
+        return value if re.fullmatch(r"\d{12}", value) else None
+    if field == "id_number":
+        value = re.sub(r"[\s\-]", "", value).upper()
+        return value if len(value) >= 4 else None
+    return value or None
+
+
+def extract_identifiers(data):
+    """
+    Indexed identifiers anywhere in a (nested) profile or payload -> {field: normalized value}.
+    """
+    found = {}
+    # Top-level values are the latest writes (update_user_data sets them flat): they win over nested ones
+    for field, value in data.items():
+        if field in INDEXED_FIELDS and not isinstance(value, dict):
+            normalized = normalize_identifier(field, value)
+            if normalized:
+                found[field] = normalized
+    for value in data.values():
+        if isinstance(value, dict):
+            for nested, nested_value in extract_identifiers(value).items():
+                found.setdefault(nested, nested_value)
+    return found
+
+
+def view_ready(view, scheme):
+    return bool(view["ready_mask"] & SCHEME_BITS.get(scheme, 0))
+
+
+def view_missing(view, scheme):
+    return [f for f in SCHEME_REQUIREMENTS.get(scheme, ()) if not view["field_mask"] & FIELD_BITS[f]]
+
+
+def view_rpa_payload(view):
+    fields, education = view["fields"], view["education"]
+    return {
+        "personal_details": {
+            "first_name": fields.get("first_name", ""),
+            "middle_name": fields.get("middle_name", ""),
+            "last_name": fields.get("last_name", ""),
+            "dob": fields.get("dob", ""),
+            "father_name": fields.get("father_name", "")
+        },
+        "contact_details": {
+            "mobile": fields.get("mobile", ""),
+            "email": fields.get("email", "")
+        },
+        "education_details": {
+            "board": education.get("board") or "State Board",
+            "marks": {"physics": education.get("marks", {}).get("Physics"), "total": education.get("total")}
+        }
+    }
+
+
+# Called as fn(key, record, previous_stamp, stamp) after every write (e.g. EligibilityService)
+_listeners = []
+
+
+def subscribe(fn):
+    _listeners.append(fn)
+
+
+class VersionConflict(Exception):
+    """
+    The user was written by another request between this one's read and its commit.
+    """
+    def __init__(self, key, expected, found):
+        super().__init__(f"{key}: read version {expected}, store has {found}")
+        self.key = key
+        self.expected = expected
+        self.found = found
+
+
+_thread_lock = threading.RLock()
+_write_depth = 0
+
+
+@contextmanager
+def _write_lock():
+    """
+    Serializes read-check-save: threads of this process, then other processes (serve.py workers)
+    through an advisory lock file next to the DB. Re-entrant (update_user_data -> commit).
+    """
+    global _write_depth
+    with _thread_lock:
+        lock_file = open(f"{DB_FILE}.lock", "a") if fcntl is not None and not _write_depth else None
+        if lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        _write_depth += 1
+        try:
+            yield
+        finally:
+            _write_depth -= 1
+            if lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+                lock_file.close()
+
+
 class DataService:
     def __init__(self):
         self._ensure_db_exists()
+        self._cache = None
+        self._cache_stamp = None
+        # Document payloads live beside the DB file; records only hold references
+        self.blobs = BlobStore(os.getenv("BLOB_DIR") or os.path.join(os.path.dirname(DB_FILE), "blobs"))
 
     def _ensure_db_exists(self):
         if not os.path.exists(DB_FILE):
             with open(DB_FILE, 'w') as f:
                 json.dump({}, f)
 
+    def _stamp(self):
+        try:
+            stat = os.stat(DB_FILE)
+            return (stat.st_mtime_ns, stat.st_size)
+        except FileNotFoundError:
+            return None
+
     def _load_db(self):
-        with open(DB_FILE, 'r') as f:
+        # Re-parse only when the file changed on disk (another worker/process wrote it)
+        stamp = self._stamp()
+        if self._cache is not None and stamp == self._cache_stamp:
+            CACHE_HITS.inc(cache="user_db")
+            return self._cache
+
+        CACHE_MISSES.inc(cache="user_db")
+        with span("store.load"), open(DB_FILE, 'r') as f:
             try:
-                return json.load(f)
+                data = json.load(f)
             except json.JSONDecodeError:
-                return {}
+                data = {}
+        if INDEX_KEY not in data:
+            # One-off backfill for stores written before the indexes existed (persisted on next write)
+            self._build_indexes(data)
+        self._cache, self._cache_stamp = data, stamp
+        return data
 
     def _save_db(self, data):
-        with open(DB_FILE, 'w') as f:
-            json.dump(data, f, indent=4)
+        # Write a sibling file and rename over the original: records + indexes change together or not at all
+        tmp = f"{DB_FILE}.tmp"
+        with span("store.save"):
+            with open(tmp, 'w') as f:
+                json.dump(data, f, indent=4)
+            os.replace(tmp, DB_FILE)
+        self._cache, self._cache_stamp = data, self._stamp()
 
     def update_user_data(self, primary_key, new_data):
-        if not primary_key: return {}
-        
-        db = self._load_db()
+        if not primary_key or primary_key.strip().startswith("__"): return {}
         key = primary_key.strip().lower()
+        # Read-merge-write under the write lock: always against the latest record, never a conflict
+        with _write_lock():
+            record = self.merge_record(key, self._load_db().get(key), new_data)
+            return self.commit({key: record})[key]
 
+    def merge_record(self, key, record, new_data):
+        """
+        One update_user_data payload applied to a copy of `record` (None for a new user) -> the
+        merged record. Nothing is saved and the cached store is left untouched: see commit.
+        """
         # --- MIGRATION LOGIC (The Fix) ---
         # If user exists but lacks the new structure, upgrade them.
-        if key in db:
-            if "profile" not in db[key] or "documents" not in db[key]:
-                print(f"🔧 Migrating legacy data for user: {key}")
-                old_data = db[key]
-                db[key] = {
-                    "profile": old_data, # Move old flat data into profile
+        if record:
+            record = copy.deepcopy(record)
+            if "profile" not in record or "documents" not in record:
+                log.info("🔧 Migrating legacy data", extra={"user": key})
+                record = {
+                    "profile": record, # Move old flat data into profile
                     "documents": []
                 }
+            self._externalize_documents(record)
+            if "view" not in record:
+                record["view"] = self._build_view(record)
         else:
             # Create new user
-            db[key] = {
+            record = {
                 "profile": {},
-                "documents": []
+                "documents": [],
+                "document_hashes": {},
+                "view": self._empty_view()
             }
 
         # --- UPDATE LOGIC ---
-        
         # 1. Update Profile (Standard Fields)
         std_data = new_data.get("standardized_data", {})
         # Safety check: ensure std_data is actually a dict
         if isinstance(std_data, dict):
             for field, value in std_data.items():
                 if value:
-                    db[key]["profile"][field] = value
+                    record["profile"][field] = value
 
-        # 2. Add Document Record (Specifics)
+        # 2. Add Document Record (Specifics): payload to the blob store, compact reference in the record
         doc_entry = {
             "type": new_data.get("document_type", "Unknown"),
             "data": new_data.get("specific_data", {})
         }
         
-        # Prevent duplicate document entries
-        if doc_entry not in db[key]["documents"]:
-            db[key]["documents"].append(doc_entry)
+        # Prevent duplicate document entries (hash lookup instead of comparing every document)
+        digest = content_hash(doc_entry)
+        hashes = record["document_hashes"]
+        if digest not in hashes:
+            self.blobs.put(doc_entry)
+            record["documents"].append(make_ref(doc_entry, digest, int(time.time())))
+            hashes[digest] = len(record["documents"]) - 1
+            self._apply_document_to_view(record["view"], doc_entry, hashes[digest])
 
-        self._save_db(db)
-        print(f"💾 Database Updated for: {primary_key}")
-        return db[key]
+        # 3. Keep the application view in step (only the fields that just changed)
+        if isinstance(std_data, dict):
+            self._apply_profile_to_view(record["view"], std_data)
+        return record
+
+    def commit(self, records, expected_versions=None):
+        """
+        Saves merged records {key: record} (see merge_record) in one atomic write and returns them
+        as written (new "version"). expected_versions {key: version read}: if any of those users was
+        written since, nothing is saved and VersionConflict is raised (optimistic concurrency, see
+        UnitOfWork).
+        """
+        with _write_lock():
+            cached = self._load_db()
+            for key, expected in (expected_versions or {}).items():
+                found = cached.get(key, {}).get("version", 0)
+                if found != expected:
+                    raise VersionConflict(key, expected, found)
+            previous_stamp = self._cache_stamp
+
+            # Changes go into a copy: the cache is swapped only once the file is replaced (_save_db)
+            db = dict(cached)
+            indexes = cached.get(INDEX_KEY, {})
+            db[INDEX_KEY] = {
+                "fields": {f: dict(index) for f, index in indexes.get("fields", {}).items()},
+                "conflicts": list(indexes.get("conflicts", [])),
+            }
+            written = {}
+            for key, record in records.items():
+                current = cached.get(key)
+                old_ids = extract_identifiers(current.get("profile", current)) if current else {}
+                # 4. Record version: caches derived from the record (profile embeddings) key on it
+                written[key] = db[key] = dict(record, version=(current or {}).get("version", 0) + 1)
+                # 5. Secondary indexes (saved in the same atomic write)
+                self._reindex(db, key, old_ids, extract_identifiers(record["profile"]))
+
+            self._save_db(db)
+        log.info("💾 Database Updated", extra={"users": sorted(written)})
+        for key, record in written.items():
+            for listener in _listeners:
+                try:
+                    listener(key, record, previous_stamp, self._cache_stamp)
+                except Exception as e:
+                    log.error("❌ Listener failed", extra={"user": key, "error": str(e)})
+        return written
 
     def get_user_data(self, primary_key):
+        """
+        A copy of the record: the loaded store is shared by every caller of this process.
+        """
         db = self._load_db()
         key = primary_key.strip().lower()
-        return db.get(key, {})
\ No newline at end of file
+        if key.startswith("__"):
+            return {}
+        return copy.deepcopy(db.get(key, {}))
+
+    def snapshot(self):
+        """
+        The whole store as loaded now, for callers reading many users at once (treat as read-only).
+        """
+        db = self._load_db()
+        return {k: v for k, v in db.items() if not k.startswith("__")}
+
+    # --- DOCUMENT PAYLOADS (lazy) ---
+
+    def load_documents(self, primary_key, doc_type=None):
+        """
+        Full documents ({"type", "added_at", "data"}) for flows that need the payload, optionally one type.
+        Profile reads never touch the blobs.
+        """
+        record = self.get_user_data(primary_key)
+        out = []
+        for doc in record.get("documents", []):
+            if doc_type and doc.get("type") != doc_type:
+                continue
+            out.append(self._hydrate(doc))
+        return out
+
+    def _hydrate(self, doc):
+        if "hash" not in doc:
+            return doc  # legacy inline document
+        payload = self.blobs.get(doc["hash"]) or {}
+        return {"type": doc.get("type"), "added_at": doc.get("added_at"), "data": payload.get("data", {})}
+
+    def _externalize_documents(self, record):
+        """
+        Legacy records (inline documents) -> references; positions are kept so view indexes stay valid.
+        """
+        if "document_hashes" in record:
+            return
+        hashes = {}
+        for index, doc in enumerate(record["documents"]):
+            if "hash" not in doc:
+                entry = {"type": doc.get("type", "Unknown"), "data": doc.get("data", {})}
+                digest = self.blobs.put(entry)
+                record["documents"][index] = make_ref(entry, digest, None)
+            hashes.setdefault(record["documents"][index]["hash"], index)
+        record["document_hashes"] = hashes
+
+    # --- IDENTITY LOOKUPS (O(1) via the secondary indexes) ---
+
+    def find_key(self, field, value):
+        """
+        User key owning this identifier (mobile, email, uid, id_number, digilockerid), or None.
+        """
+        normalized = normalize_identifier(field, value)
+        if field not in INDEXED_FIELDS or not normalized:
+            return None
+        return self._load_db().get(INDEX_KEY, {}).get("fields", {}).get(field, {}).get(normalized)
+
+    def find_user(self, field, value):
+        key = self.find_key(field, value)
+        return self.get_user_data(key) if key else {}
+
+    def resolve_identity(self, identifiers):
+        """
+        First match on the strongest identifier present in `identifiers` (any nesting) -> key or None.
+        """
+        found = extract_identifiers(identifiers)
+        for field in INDEXED_FIELDS:
+            if field in found:
+                key = self.find_key(field, found[field])
+                if key:
+                    return key
+        return None
+
+    def resolve_key(self, name, identifiers=None):
+        """
+        Key to store a person under: the indexed owner of their identifiers if any, else their name,
+        or "name#2", "name#3"... when a same-name record belongs to someone with a different UID/id.
+        """
+        identifiers = identifiers or {}
+        owner = self.resolve_identity(identifiers)
+        if owner:
+            return owner
+
+        db = self._load_db()
+        found = extract_identifiers(identifiers)
+        base = (name or "").strip().lower()
+        candidate, n = base, 1
+        while candidate in db:
+            existing = extract_identifiers(db[candidate].get("profile", db[candidate]))
+            if not any(f in found and f in existing and existing[f] != found[f] for f in STRONG_FIELDS):
+                return candidate
+            n += 1
+            candidate = f"{base}#{n}"
+        return candidate
+
+    def get_conflicts(self):
+        """
+        Identifiers claimed by a second user (newest last); the first owner keeps the index entry.
+        """
+        return list(self._load_db().get(INDEX_KEY, {}).get("conflicts", []))
+
+    def _build_indexes(self, db):
+        db[INDEX_KEY] = {"fields": {f: {} for f in INDEXED_FIELDS}, "conflicts": []}
+        for key, record in list(db.items()):
+            if key.startswith("__") or not isinstance(record, dict):
+                continue
+            self._reindex(db, key, {}, extract_identifiers(record.get("profile", record)))
+
+    def _reindex(self, db, key, old_ids, new_ids):
+        indexes = db.setdefault(INDEX_KEY, {"fields": {}, "conflicts": []})
+        for field in INDEXED_FIELDS:
+            index = indexes["fields"].setdefault(field, {})
+            old, new = old_ids.get(field), new_ids.get(field)
+            if old and old != new and index.get(old) == key:
+                del index[old]
+            if not new:
+                continue
+            owner = index.get(new)
+            if owner is None or owner == key or owner not in db:
+                index[new] = key
+            elif new != old:
+                # Only report when this user newly claims it (not on every later write)
+                log.warning("⚠️ Identifier already owned", extra={"field": field, "owner": owner, "user": key})
+                indexes["conflicts"].append(
+                    {"field": field, "value": new, "owner": owner, "claimed_by": key, "at": int(time.time())})
+                del indexes["conflicts"][:-MAX_CONFLICTS]
+
+    # --- MATERIALIZED APPLICATION VIEW ---
+
+    def get_application_view(self, primary_key):
+        """
+        Canonical personal/contact/education fields + readiness bits, maintained on write.
+        """
+        if not primary_key: return {}
+        return copy.deepcopy(self._view(primary_key))
+
+    def _view(self, primary_key):
+        # The cached record's view itself: for the read-only helpers below
+        if not primary_key: return self._empty_view()
+        return self.record_view(self._load_db().get(primary_key.strip().lower()))
+
+    def record_view(self, record):
+        if not record:
+            return self._empty_view()
+        if "view" not in record:
+            # Legacy record written before views existed (kept in memory until the next write)
+            record["view"] = self._build_view(record)
+        return record["view"]
+
+    def is_ready(self, primary_key, scheme):
+        return view_ready(self._view(primary_key), scheme)
+
+    def missing_fields(self, primary_key, scheme):
+        return view_missing(self._view(primary_key), scheme)
+
+    def get_rpa_payload(self, primary_key):
+        """
+        The payload RPAService expects, straight from the view.
+        """
+        return view_rpa_payload(self._view(primary_key))
+
+    def _empty_view(self):
+        return {"fields": {}, "field_mask": 0, "ready_mask": 0, "education": {}, "documents_by_type": {}}
+
+    def _build_view(self, record):
+        view = self._empty_view()
+        for index, doc in enumerate(record.get("documents", [])):
+            self._apply_document_to_view(view, doc, index)
+        self._apply_profile_to_view(view, record.get("profile", {}))
+        return view
+
+    def _apply_profile_to_view(self, view, data):
+        fields = view["fields"]
+        given = self._apply_profile_fields(fields, data)
+
+        # Name parts follow the full name (same split as the PAN mapper) unless given explicitly;
+        # parts of the previous name are never kept
+        if "full_name" in given:
+            for part in {"first_name", "middle_name", "last_name"} - given:
+                fields.pop(part, None)
+        if "full_name" in given and not given & {"first_name", "last_name"}:
+            parts = fields["full_name"].split()
+            if len(parts) == 1:
+                fields["last_name"] = parts[0]
+            elif parts:
+                fields["first_name"], fields["last_name"] = parts[0], parts[-1]
+                if len(parts) > 2:
+                    fields["middle_name"] = " ".join(parts[1:-1])
+
+        self._refresh_masks(view)
+
+    def _apply_profile_fields(self, fields, data):
+        # -> the canonical fields this payload set
+        given = set()
+        for field, value in data.items():
+            if field in PROFILE_GROUPS:
+                if isinstance(value, dict):
+                    given |= self._apply_profile_fields(fields, value)
+                continue
+            canonical = FIELD_ALIASES.get(field, field)
+            if field == "parent_name" and str(data.get("relation_type") or "Father").strip().lower() != "father":
+                continue  # relations: {"parent_name", "relation_type": "Mother"} is not the father
+            if canonical in FIELD_BITS and value and isinstance(value, (str, int)):
+                fields[canonical] = str(value)
+                given.add(canonical)
+        return given
+
+    def _apply_document_to_view(self, view, doc, index):
+        doc_type = doc.get("type", "Unknown")
+        view["documents_by_type"].setdefault(doc_type, []).append(index)
+        if "hash" in doc and "mark" in doc_type.lower():
+            # Only marks documents feed the view, so only they are loaded
+            doc = self._hydrate(doc)
+
+        data = doc.get("data") or {}
+        if "mark" not in doc_type.lower() or not data:
+            return
+
+        # Latest marks document wins (same rule the RPA trigger used)
+        marks = data.get("marks") or {}
+        if isinstance(marks, list):
+            marks = {m.get("subject"): m.get("marks_obtained") for m in marks if isinstance(m, dict)}
+        else:
+            # A copy: `data` is the blob cache entry (or the caller's payload), never modified here
+            marks = dict(marks)
+        for subject in ("Physics", "Chemistry", "Maths", "Mathematics", "Biology"):
+            if data.get(subject) is not None:
+                marks[subject] = data[subject]
+
+        view["education"] = {
+            "board": data.get("Board") or data.get("board_name") or data.get("board"),
+            "marks": marks,
+            "total": data.get("Total") or data.get("total"),
+            "result": data.get("result") or data.get("Result"),
+            "document_type": doc_type
+        }
+        if data.get("Father Name"):
+            view["fields"]["father_name"] = data["Father Name"]
+            self._refresh_masks(view)
+
+    def _refresh_masks(self, view):
+        view["field_mask"] = sum(FIELD_BITS[f] for f, v in view["fields"].items() if v)
+        view["ready_mask"] = sum(
+            bit for scheme, bit in SCHEME_BITS.items()
+            if view["field_mask"] & SCHEME_MASKS[scheme] == SCHEME_MASKS[scheme]
+        )
\ No newline at end of file
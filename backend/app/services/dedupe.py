@@ -0,0 +1,116 @@
+"""
+Near-duplicate scheme detection (MinHash + LSH banding) for ingestion.
+
+State copies of a central scheme differ by a few words (state name, department, amounts),
+so exact dedupe misses them. Each document becomes a set of word 3-shingles; 128 MinHash
+values estimate Jaccard similarity, and 32 bands x 4 rows make pairs above ~0.5 collide
+in at least one band. Candidates are confirmed against `threshold` and merged (union-find).
+"""
+import json
+import re
+import zlib
+import numpy as np
+
+_PRIME = (1 << 31) - 1
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+class MinHasher:
+    def __init__(self, num_perm=128, shingle_size=3, seed=1):
+        rng = np.random.RandomState(seed)
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.a = rng.randint(1, _PRIME, size=num_perm, dtype=np.int64)
+        self.b = rng.randint(0, _PRIME, size=num_perm, dtype=np.int64)
+
+    def shingles(self, text):
+        words = _WORD.findall(text.lower())
+        if len(words) < self.shingle_size:
+            return {" ".join(words)} if words else set()
+        return {" ".join(words[i:i + self.shingle_size]) for i in range(len(words) - self.shingle_size + 1)}
+
+    def signature(self, text):
+        hashes = np.fromiter((zlib.crc32(s.encode("utf-8")) % _PRIME for s in self.shingles(text)), dtype=np.int64)
+        if not len(hashes):
+            return np.full(self.num_perm, _PRIME, dtype=np.int64)
+        # (a*x + b) mod p for every permutation x shingle, min over shingles; all terms < 2^62
+        return ((np.outer(self.a, hashes) + self.b[:, None]) % _PRIME).min(axis=1)
+
+
+def find_clusters(texts, threshold=0.7, bands=32, hasher=None):
+    """
+    -> list of clusters (lists of indices into texts), singletons included, in first-seen order.
+    """
+    hasher = hasher or MinHasher()
+    rows = hasher.num_perm // bands
+    signatures = np.vstack([hasher.signature(t) for t in texts]) if texts else np.zeros((0, hasher.num_perm))
+
+    parent = list(range(len(texts)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for band in range(bands):
+        buckets = {}
+        block = signatures[:, band * rows:(band + 1) * rows]
+        for i, key in enumerate(map(bytes, block)):
+            buckets.setdefault(key, []).append(i)
+        for members in buckets.values():
+            first = members[0]
+            for other in members[1:]:
+                ri, rj = find(first), find(other)
+                if ri == rj:
+                    continue
+                # Confirm: fraction of equal MinHash values = estimated Jaccard
+                if np.mean(signatures[first] == signatures[other]) >= threshold:
+                    parent[max(ri, rj)] = min(ri, rj)
+
+    clusters = {}
+    for i in range(len(texts)):
+        clusters.setdefault(find(i), []).append(i)
+    return list(clusters.values())
+
+
+def dedupe_documents(documents, threshold=0.7, text_fn=None):
+    """
+    LangChain Documents -> one canonical Document per cluster.
+
+    The canonical one is a "Central" row when the cluster has one (state copies usually derive
+    from it), otherwise the longest text. The rest are kept as metadata["variants"]
+    (a JSON string: Chroma metadata values must be scalars).
+    """
+    text_fn = text_fn or (lambda d: d.page_content)
+    clusters = find_clusters([text_fn(d) for d in documents], threshold=threshold)
+
+    canonical_docs = []
+    for cluster_id, members in enumerate(clusters):
+        docs = [documents[i] for i in members]
+        canonical = max(docs, key=lambda d: (str(d.metadata.get("level", "")).lower() == "central",
+                                             len(d.page_content)))
+        variants = [
+            {"scheme_id": d.metadata.get("scheme_id"), "scheme_name": d.metadata.get("scheme_name"),
+             "level": d.metadata.get("level"), "category": d.metadata.get("category")}
+            for d in docs if d is not canonical
+        ]
+        canonical.metadata = dict(canonical.metadata, cluster_id=cluster_id, variant_count=len(variants),
+                                  variants=json.dumps(variants, ensure_ascii=False))
+        canonical_docs.append(canonical)
+    return canonical_docs
+
+
+def expand_variants(metadata, limit=5):
+    """
+    Query-time expansion: one short line naming the other versions of a canonical scheme.
+    """
+    try:
+        variants = json.loads((metadata or {}).get("variants") or "[]")
+    except ValueError:
+        return ""
+    if not variants:
+        return ""
+    names = [f"{v.get('scheme_name')} ({v.get('level')})" for v in variants[:limit]]
+    more = f" and {len(variants) - limit} more" if len(variants) > limit else ""
+    return f"Also offered as: {'; '.join(names)}{more}"
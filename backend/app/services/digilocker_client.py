@@ -0,0 +1,136 @@
+import asyncio
+import os
+import httpx
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+class AsyncDigiLockerClient:
+    """
+    Non-blocking DigiLocker client.
+    - One pooled httpx.AsyncClient for the whole app (keep-alive connections are reused).
+    - No token cache: an authorization code is single-use, so every exchange goes to the
+      provider (a replayed code must be rejected there, not answered from memory).
+    - Bulk XML fetch runs concurrently behind a semaphore.
+
+    If DIGILOCKER_BASE_URL is not set, requests go in-process to the local sandbox
+    (app.routers.digilocker_mock), so nothing leaves the machine.
+    """
+    def __init__(self, base_url=None, max_connections=20, concurrency=8, timeout=10.0):
+        base_url = base_url or os.getenv("DIGILOCKER_BASE_URL")
+        limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+
+        if base_url:
+            transport = httpx.AsyncHTTPTransport(limits=limits, retries=1)
+        else:
+            from app.routers.digilocker_mock import mock_app
+            transport = httpx.ASGITransport(app=mock_app)
+            base_url = "http://digilocker.local"
+
+        self.base_url = base_url
+        self.concurrency = int(os.getenv("DIGILOCKER_CONCURRENCY", concurrency))
+        self.client_id = os.getenv("DIGILOCKER_CLIENT_ID")
+        self.client_secret = os.getenv("DIGILOCKER_CLIENT_SECRET")
+        self.redirect_uri = "http://localhost:5173/callback"
+        self.http = httpx.AsyncClient(base_url=base_url, transport=transport, timeout=timeout)
+
+    async def aclose(self):
+        await self.http.aclose()
+
+    def _auth(self, token):
+        return {"Authorization": f"Bearer {token}"}
+
+    async def get_access_token(self, code: str):
+        """
+        POST /oauth2/1/token
+        """
+        response = await self.http.post("/oauth2/1/token", data={
+            "code": code,
+            "grant_type": "authorization_code",
+            "client_id": self.client_id or "",
+            "client_secret": self.client_secret or "",
+            "redirect_uri": self.redirect_uri,
+        })
+        if response.status_code != 200:
+            return {"error": "invalid_grant"}
+
+        return response.json()
+
+    async def get_user_details(self, token: str):
+        """
+        GET /oauth2/1/user
+        """
+        response = await self.http.get("/oauth2/1/user", headers=self._auth(token))
+        if response.status_code != 200:
+            return {"error": "unauthorized"}
+        return response.json()
+
+    async def get_issued_documents(self, token: str):
+        """
+        GET /oauth2/2/files/issued
+        """
+        response = await self.http.get("/oauth2/2/files/issued", headers=self._auth(token))
+        if response.status_code != 200:
+            return {"error": "unauthorized"}
+        return response.json()
+
+    async def get_file_xml(self, uri: str, token: str):
+        """
+        GET /oauth2/1/xml/{uri}
+        """
+        response = await self.http.get(f"/oauth2/1/xml/{uri}", headers=self._auth(token))
+        if response.status_code == 401:
+            return "<Error>Unauthorized</Error>"
+        if response.status_code != 200:
+            return "<Error>Document Not Found</Error>"
+        return response.text
+
+    async def fetch_all_xml(self, token: str, items=None, concurrency=None):
+        """
+        Downloads the XML of every issued document at once (at most `concurrency` in flight).
+        Returns one entry per document, in listing order.
+        """
+        if items is None:
+            listing = await self.get_issued_documents(token)
+            if "error" in listing:
+                return listing
+            items = listing.get("items", [])
+
+        semaphore = asyncio.Semaphore(concurrency or self.concurrency)
+
+        async def fetch(item):
+            async with semaphore:
+                try:
+                    xml = await self.get_file_xml(item["uri"], token)
+                except httpx.HTTPError as e:
+                    return {**self._summary(item), "error": str(e)}
+            if xml.startswith("<Error>"):
+                return {**self._summary(item), "error": xml}
+            return {**self._summary(item), "xml_content": xml}
+
+        return await asyncio.gather(*(fetch(item) for item in items))
+
+    async def onboard(self, code: str):
+        """
+        Full DigiLocker pull for one user: token -> (profile + listing in parallel) -> all XML in parallel.
+        """
+        token_data = await self.get_access_token(code)
+        if "error" in token_data:
+            return token_data
+
+        token = token_data["access_token"]
+        user, listing = await asyncio.gather(self.get_user_details(token), self.get_issued_documents(token))
+        if "error" in listing:
+            return listing
+
+        documents = await self.fetch_all_xml(token, items=listing.get("items", []))
+        return {"token": token, "user": user, "documents": documents}
+
+    def _summary(self, item):
+        return {
+            "uri": item.get("uri"),
+            "doctype": item.get("doctype"),
+            "name": item.get("name"),
+            "version": item.get("date"),
+        }
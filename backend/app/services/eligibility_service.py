@@ -0,0 +1,459 @@
+"""
+Batch eligibility: every registered user against every scheme, without the LLM.
+
+Each scheme's eligibility text is compiled (regex heuristics, optionally overridden by
+ELIGIBILITY_RULES_FILE) into one NumPy column per rule. Users are turned into the matching
+attribute columns, and the whole user x scheme grid is evaluated with broadcasting, in chunks.
+
+A rule only counts against a user when we know the attribute:
+    "eligible" = every active rule is known and passes
+    "possible" = nothing known fails, but some rule needs data we do not have yet
+
+Refresh:
+    - one user row when DataService writes that user (DataService.subscribe)
+    - everything when the catalog file or another process's write changes the stamps
+"""
+import csv
+import json
+import math
+import os
+import re
+import threading
+from datetime import date
+import numpy as np
+from app.services.data_service import DataService, subscribe
+from app.services.metrics import span
+from app.services.log_service import get_logger
+
+log = get_logger(__name__)
+
+CATALOG_CSV = "updated_data.csv"  # same file ingest.py reads
+
+GENDERS = ("male", "female", "transgender")
+CASTES = ("general", "obc", "sc", "st", "ews")
+STATES = (
+    "andhra pradesh", "arunachal pradesh", "assam", "bihar", "chhattisgarh", "goa", "gujarat", "haryana",
+    "himachal pradesh", "jharkhand", "karnataka", "kerala", "madhya pradesh", "maharashtra", "manipur",
+    "meghalaya", "mizoram", "nagaland", "odisha", "punjab", "rajasthan", "sikkim", "tamil nadu", "telangana",
+    "tripura", "uttar pradesh", "uttarakhand", "west bengal", "andaman and nicobar", "chandigarh",
+    "dadra and nagar haveli and daman and diu", "delhi", "jammu and kashmir", "ladakh", "lakshadweep", "puducherry",
+)
+OCCUPATIONS = {
+    "student": r"\bstudents?\b|\bscholars?\b|\bstudying\b|\benrolled\b",
+    "farmer": r"\bfarmers?\b|\bcultivators?\b|\bagricultur",
+    "fisherman": r"\bfisher(?:men|man|folk|ies)\b",
+    "artisan": r"\bartisans?\b|\bcraftsm[ae]n\b|\bweavers?\b",
+    "construction_worker": r"\bconstruction workers?\b|\bbuilding workers?\b",
+    "street_vendor": r"\bstreet vendors?\b|\bhawkers?\b",
+    "entrepreneur": r"\bentrepreneurs?\b|\bstart-?ups?\b|\bmsmes?\b",
+    "unemployed": r"\bunemployed\b|\bjob ?seekers?\b",
+}
+ALL_GENDERS = (1 << len(GENDERS)) - 1
+ALL_CASTES = (1 << len(CASTES)) - 1
+NO_AGE_MAX = 200.0
+
+# --- TEXT HEURISTICS (lower-cased eligibility text) ---
+_AMOUNT = r"(?:rs\.?|inr|₹)?\s*(\d[\d,]*(?:\.\d+)?)\s*(lakhs?|lacs?|crores?)?"
+_INCOME = re.compile(
+    r"income[^.]{0,80}?(?:not exceed\w*|does not exceed|less than|below|up ?to|within|not more than|<=?|≤)\s*" + _AMOUNT)
+_AGE_RANGE = re.compile(r"(?:between|from)\s+(\d{1,2})\s*(?:years?\s*)?(?:and|to|-)\s*(\d{1,2})\s*years")
+_AGE_MIN = re.compile(
+    r"(?:above|at least|minimum(?: age)?(?: of)?|not less than|completed)\s+(\d{1,2})\s*years"
+    r"|(\d{1,2})\s*years(?: of age)?\s*(?:and|or)\s*above")
+_AGE_MAX = re.compile(
+    r"(?:below|under|not (?:be )?(?:more|older) than|maximum(?: age)?(?: of)?|up ?to|not exceed\w*)\s+(\d{1,2})\s*years")
+_MARKS = re.compile(
+    r"(?:at least|minimum(?: of)?|not less than|secured|scored|obtained)\s*(\d{2})\s*%"
+    r"|(\d{2})\s*%\s*(?:marks|or more|and above|aggregate)")
+_FEMALE = re.compile(r"\b(?:women|woman|girls?|female|widows?|pregnant|mothers?)\b")
+_MALE = re.compile(r"\b(?:men|boys?|male)\b")
+_CASTE_PATTERNS = {  # run on the original text: "SC"/"ST" are only meaningful in capitals
+    "sc": re.compile(r"\bSCs?\b|[Ss]cheduled [Cc]astes?"),
+    "st": re.compile(r"\bSTs?\b|[Ss]cheduled [Tt]ribes?"),
+    "obc": re.compile(r"\bOBCs?\b|\bM?BCs?\b|[Bb]ackward [Cc]lass"),
+    "ews": re.compile(r"\bEWS\b|[Ee]conomically [Ww]eaker"),
+}
+_STATE_PATTERNS = [(i, re.compile(r"\b" + re.escape(s) + r"\b")) for i, s in enumerate(STATES)]
+
+
+def _amount(value, unit):
+    try:
+        amount = float(value.replace(",", ""))
+    except ValueError:  # stray separators in OCR / scraped text
+        return float("nan")
+    if unit and unit.startswith("la"):
+        amount *= 100_000
+    elif unit and unit.startswith("cr"):
+        amount *= 10_000_000
+    return amount
+
+
+def parse_rules(text):
+    """
+    Eligibility text -> rule dict (the ELIGIBILITY_RULES_FILE shape). Missing keys = no constraint.
+    """
+    raw = text or ""
+    low = raw.lower()
+    rules = {}
+
+    incomes = [a for a in (_amount(v, u) for v, u in _INCOME.findall(low)) if not math.isnan(a)]
+    if incomes:
+        rules["income_max"] = max(incomes)
+
+    rng = _AGE_RANGE.search(low)
+    if rng:
+        rules["age_min"], rules["age_max"] = float(rng.group(1)), float(rng.group(2))
+    else:
+        m = _AGE_MIN.search(low)
+        if m:
+            rules["age_min"] = float(m.group(1) or m.group(2))
+        m = _AGE_MAX.search(low)
+        if m:
+            rules["age_max"] = float(m.group(1))
+
+    marks = [float(a or b) for a, b in _MARKS.findall(low)]
+    if marks:
+        rules["marks_min"] = min(marks)
+
+    if _FEMALE.search(low) and not _MALE.search(low):
+        rules["gender"] = ["female"]
+
+    castes = [c for c, pattern in _CASTE_PATTERNS.items() if pattern.search(raw)]
+    if castes:
+        rules["castes"] = castes
+
+    if re.search(r"\b(?:resident|domicile|native|permanent)\b", low):
+        states = [STATES[i] for i, pattern in _STATE_PATTERNS if pattern.search(low)]
+        if states:
+            rules["states"] = states
+
+    occupations = [o for o, pattern in OCCUPATIONS.items() if re.search(pattern, low)]
+    if occupations:
+        rules["occupations"] = occupations
+    return rules
+
+
+def _bits(values, vocabulary):
+    return sum(1 << vocabulary.index(v) for v in values if v in vocabulary)
+
+
+def _state_bit(value):
+    value = (value or "").strip().lower()
+    return 1 << STATES.index(value) if value in STATES else 0
+
+
+def _caste_bit(value):
+    value = (value or "").strip().lower()
+    if not value:
+        return 0
+    if value in ("sc", "st", "obc", "ews"):
+        return 1 << CASTES.index(value)
+    if "scheduled caste" in value or value.startswith("sc"):
+        return 1 << CASTES.index("sc")
+    if "scheduled tribe" in value or value.startswith("st"):
+        return 1 << CASTES.index("st")
+    if "backward" in value or value in ("bc", "mbc", "bcm", "dnc"):
+        return 1 << CASTES.index("obc")
+    if "ews" in value or "economically" in value:
+        return 1 << CASTES.index("ews")
+    if value in ("general", "gen", "oc", "open", "ur"):
+        return 1 << CASTES.index("general")
+    return 0
+
+
+def _number(value):
+    """
+    "Rs. 1,20,000" -> 120000.0, "2.5 lakh" -> 250000.0, "" -> NaN
+    """
+    m = re.search(r"(\d[\d,]*(?:\.\d+)?)\s*(lakhs?|lacs?|crores?)?", str(value).lower())
+    return _amount(m.group(1), m.group(2)) if m else float("nan")
+
+
+def _scalars(data, out):
+    """
+    Nested profile/document dicts -> one flat {lower key: value} (first value wins).
+    """
+    for key, value in data.items():
+        if isinstance(value, dict):
+            _scalars(value, out)
+        elif isinstance(value, (str, int, float)) and value not in ("", None):
+            out.setdefault(key.lower(), value)
+    return out
+
+
+def user_attributes(record, today=None):
+    """
+    DataService record -> {income, age, gender, caste, state, occupation, marks} (NaN / 0 = unknown).
+    """
+    view = record.get("view") or {}
+    fields = view.get("fields", {})
+    flat = _scalars(record.get("profile", {}), {})
+    for doc in record.get("documents", []):
+        # Blob-store references carry the fields we need (income, category, percentage) inline
+        _scalars(doc.get("data") or doc.get("key_fields") or {}, flat)
+
+    income = _number(flat.get("annual_income") or flat.get("income") or "")
+
+    age = float("nan")
+    dob = fields.get("dob") or flat.get("dob") or ""
+    year = re.search(r"(\d{4})$", str(dob).strip())
+    if year:
+        today = today or date.today()
+        parts = re.split(r"[/\-.]", str(dob).strip())
+        born_year = int(year.group(1))
+        age = today.year - born_year
+        if len(parts) == 3 and parts[1].isdigit() and parts[0].isdigit():
+            if (today.month, today.day) < (int(parts[1]), int(parts[0])):
+                age -= 1
+        age = float(age)
+
+    gender = str(fields.get("gender") or flat.get("gender") or "").lower()
+    gender_bit = 1 << GENDERS.index(gender) if gender in GENDERS else 0
+
+    caste_bit = _caste_bit(str(flat.get("category") or flat.get("caste") or flat.get("community") or ""))
+    state_bit = _state_bit(fields.get("state") or flat.get("state"))
+
+    occupation = str(flat.get("occupation") or "").lower()
+    if not occupation and view.get("education"):
+        occupation = "student"
+    occupation_bit = 1 << list(OCCUPATIONS).index(occupation) if occupation in OCCUPATIONS else 0
+
+    marks = _number(flat.get("percentage") or "")
+    if np.isnan(marks):
+        scores = [_number(v) for v in (view.get("education") or {}).get("marks", {}).values()]
+        scores = [s for s in scores if not np.isnan(s) and s <= 100]
+        if scores:
+            marks = sum(scores) / len(scores)
+
+    return {
+        "income": income, "age": age, "gender": gender_bit, "caste": caste_bit,
+        "state": state_bit, "occupation": occupation_bit, "marks": marks,
+    }
+
+
+class SchemeRules:
+    """
+    Columnar rule table: one array per rule, one slot per scheme.
+    """
+    def __init__(self, schemes):
+        self.schemes = schemes  # [{"scheme_name", "category", "level", "rules"}]
+        n = len(schemes)
+        self.income_max = np.full(n, np.inf)
+        self.age_min = np.zeros(n)
+        self.age_max = np.full(n, NO_AGE_MAX)
+        self.marks_min = np.zeros(n)
+        self.gender_mask = np.full(n, ALL_GENDERS, dtype=np.int64)
+        self.caste_mask = np.full(n, ALL_CASTES, dtype=np.int64)
+        self.state_mask = np.zeros(n, dtype=np.int64)       # 0 = any state
+        self.occupation_mask = np.zeros(n, dtype=np.int64)  # 0 = any occupation
+
+        for i, scheme in enumerate(schemes):
+            r = scheme["rules"]
+            self.income_max[i] = r.get("income_max", np.inf)
+            self.age_min[i] = r.get("age_min", 0)
+            self.age_max[i] = r.get("age_max", NO_AGE_MAX)
+            self.marks_min[i] = r.get("marks_min", 0)
+            if r.get("gender"):
+                self.gender_mask[i] = _bits(r["gender"], GENDERS)
+            if r.get("castes"):
+                self.caste_mask[i] = _bits(r["castes"], CASTES)
+            if r.get("states"):
+                self.state_mask[i] = _bits(r["states"], STATES)
+            if r.get("occupations"):
+                self.occupation_mask[i] = _bits(r["occupations"], list(OCCUPATIONS))
+
+        # (name, active per scheme) in the order _evaluate applies them
+        self.active = {
+            "income": np.isfinite(self.income_max),
+            "age": (self.age_min > 0) | (self.age_max < NO_AGE_MAX),
+            "gender": self.gender_mask != ALL_GENDERS,
+            "caste": self.caste_mask != ALL_CASTES,
+            "state": self.state_mask != 0,
+            "occupation": self.occupation_mask != 0,
+            "marks": self.marks_min > 0,
+        }
+        # More targeted schemes first in recommendations
+        self.specificity = sum(a.astype(np.int8) for a in self.active.values()) if n else np.zeros(0, np.int8)
+
+    def __len__(self):
+        return len(self.schemes)
+
+
+def load_catalog(csv_path=None, rules_path=None):
+    csv_path = csv_path or os.getenv("CATALOG_CSV", CATALOG_CSV)
+    rules_path = rules_path or os.getenv("ELIGIBILITY_RULES_FILE")
+    overrides = {}
+    if rules_path and os.path.exists(rules_path):
+        with open(rules_path, "r") as f:
+            overrides = json.load(f)
+
+    schemes = []
+    if os.path.exists(csv_path):
+        with open(csv_path, "r", encoding="utf-8", newline="") as f:
+            for row in csv.DictReader(f):
+                name = row.get("scheme_name") or "Unknown"
+                rules = parse_rules(row.get("eligibility", ""))
+                rules.update(overrides.get(name, {}))
+                schemes.append({
+                    "scheme_name": name,
+                    "category": row.get("schemeCategory") or "Not Specified",
+                    "level": row.get("level") or "Not Specified",
+                    "rules": rules,
+                })
+    return SchemeRules(schemes)
+
+
+class EligibilityService:
+    def __init__(self, data_service=None, csv_path=None, rules_path=None, chunk_size=2048):
+        self.data_store = data_service or DataService()
+        self.csv_path = csv_path or os.getenv("CATALOG_CSV", CATALOG_CSV)
+        self.rules_path = rules_path or os.getenv("ELIGIBILITY_RULES_FILE")
+        self.chunk_size = chunk_size
+        self._lock = threading.RLock()
+        self._eligible = {}   # user key -> int32 scheme indices
+        self._possible = {}
+        self._catalog_stamp = None
+        self._db_stamp = None
+        self.rules = None
+        self.refresh_all()
+        subscribe(self._on_user_written)
+
+    # --- STALENESS ---
+    def _file_stamp(self, path):
+        try:
+            stat = os.stat(path)
+            return (stat.st_mtime_ns, stat.st_size)
+        except (FileNotFoundError, TypeError):
+            return None
+
+    def _catalog_stamps(self):
+        return (self._file_stamp(self.csv_path), self._file_stamp(self.rules_path))
+
+    def _sync(self):
+        if self._catalog_stamps() != self._catalog_stamp or self.data_store._stamp() != self._db_stamp:
+            self.refresh_all()
+
+    # --- REFRESH ---
+    def refresh_all(self):
+        with self._lock, span("eligibility.refresh"):
+            if self._catalog_stamps() != self._catalog_stamp or self.rules is None:
+                self.rules = load_catalog(self.csv_path, self.rules_path)
+                self._catalog_stamp = self._catalog_stamps()
+            db = self.data_store._load_db()
+            self._db_stamp = self.data_store._stamp()
+            users = [(k, v) for k, v in db.items() if isinstance(v, dict) and not k.startswith("__")]
+
+            self._eligible, self._possible = {}, {}
+            for start in range(0, len(users), self.chunk_size):
+                chunk = users[start:start + self.chunk_size]
+                definite, possible, _ = self._evaluate([self._attributes(r) for _, r in chunk])
+                for row, (key, _) in enumerate(chunk):
+                    self._store_row(key, definite[row], possible[row])
+            log.info("✅ Eligibility grid built", extra={"users": len(users), "schemes": len(self.rules)})
+
+    def refresh_user(self, key, record):
+        with self._lock, span("eligibility.refresh"):
+            definite, possible, _ = self._evaluate([self._attributes(record)])
+            self._store_row(key, definite[0], possible[0])
+
+    def _on_user_written(self, key, record, previous_stamp, stamp):
+        with self._lock:
+            self.refresh_user(key, record)
+            # The grid is still complete if the file it saw is the one this write started from
+            if previous_stamp == self._db_stamp:
+                self._db_stamp = stamp
+
+    def _attributes(self, record):
+        if "view" not in record:
+            # Legacy record written before views existed
+            record = dict(record, view=self.data_store._build_view(record))
+        return user_attributes(record)
+
+    def _store_row(self, key, definite, possible):
+        self._eligible[key] = np.flatnonzero(definite).astype(np.int32)
+        self._possible[key] = np.flatnonzero(possible & ~definite).astype(np.int32)
+
+    # --- VECTORISED EVALUATION ---
+    def _columns(self, attrs):
+        return {name: np.array([a[name] for a in attrs], dtype=np.float64 if name in ("income", "age", "marks")
+                               else np.int64) for name in attrs[0]} if attrs else {}
+
+    def _evaluate(self, attrs):
+        """
+        -> (definite [n, m], possible [n, m], unknown {rule: [n, m]}) boolean grids.
+        """
+        r = self.rules
+        u = self._columns(attrs)
+        n, m = len(attrs), len(r)
+        definite = np.ones((n, m), dtype=bool)
+        possible = np.ones((n, m), dtype=bool)
+        unknown = {}
+        if not n or not m:
+            return definite, possible, unknown
+
+        checks = {
+            "income": (~np.isnan(u["income"]), u["income"][:, None] <= r.income_max[None, :]),
+            "age": (~np.isnan(u["age"]), (u["age"][:, None] >= r.age_min[None, :]) &
+                    (u["age"][:, None] <= r.age_max[None, :])),
+            "gender": (u["gender"] != 0, (u["gender"][:, None] & r.gender_mask[None, :]) != 0),
+            "caste": (u["caste"] != 0, (u["caste"][:, None] & r.caste_mask[None, :]) != 0),
+            "state": (u["state"] != 0, (u["state"][:, None] & r.state_mask[None, :]) != 0),
+            "occupation": (u["occupation"] != 0, (u["occupation"][:, None] & r.occupation_mask[None, :]) != 0),
+            "marks": (~np.isnan(u["marks"]), u["marks"][:, None] >= r.marks_min[None, :]),
+        }
+        for name, (known, ok) in checks.items():
+            active = r.active[name][None, :]
+            known = known[:, None]
+            definite &= ~active | (known & ok)
+            possible &= ~active | ~known | ok
+            unknown[name] = active & ~known
+        return definite, possible, unknown
+
+    # --- LOOKUPS ---
+    def _scheme(self, i):
+        s = self.rules.schemes[i]
+        return {"scheme_name": s["scheme_name"], "category": s["category"], "level": s["level"]}
+
+    def eligible_schemes(self, primary_key):
+        """
+        {"eligible": [...], "possible": [{..., "needs": [rule, ...]}]} from the precomputed grid.
+        """
+        key = (primary_key or "").strip().lower()
+        with self._lock:
+            self._sync()
+            eligible = self._eligible.get(key)
+            possible = self._possible.get(key)
+            if eligible is None:
+                return {"user": key, "known_user": False, "eligible": [], "possible": []}
+
+            needs = {}
+            if len(possible):
+                record = self.data_store.get_user_data(key)
+                _, _, unknown = self._evaluate([self._attributes(record)])
+                for name, grid in unknown.items():
+                    for i in possible[grid[0, possible]]:
+                        needs.setdefault(int(i), []).append(name)
+
+            return {
+                "user": key,
+                "known_user": True,
+                "eligible": [self._scheme(i) for i in eligible],
+                "possible": [dict(self._scheme(i), needs=needs.get(int(i), [])) for i in possible],
+            }
+
+    def recommend(self, primary_key, limit=10):
+        """
+        Proactive suggestions: certain matches first, most targeted schemes first.
+        """
+        key = (primary_key or "").strip().lower()
+        with self._lock:
+            self._sync()
+            eligible = self._eligible.get(key, np.zeros(0, np.int32))
+            ranked = eligible[np.argsort(-self.rules.specificity[eligible], kind="stable")] if len(eligible) else eligible
+            picks = [dict(self._scheme(i), match="eligible") for i in ranked[:limit]]
+            if len(picks) < limit:
+                possible = self._possible.get(key, np.zeros(0, np.int32))
+                if len(possible):
+                    possible = possible[np.argsort(-self.rules.specificity[possible], kind="stable")]
+                picks += [dict(self._scheme(i), match="possible") for i in possible[:limit - len(picks)]]
+            return picks
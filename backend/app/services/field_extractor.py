@@ -0,0 +1,199 @@
+import re
+from functools import lru_cache
+from typing import NamedTuple, Tuple
+
+# Default value pattern: rest of the line after the label
+LINE_VALUE = r"[^\n]+"
+
+
+class LabelSpec(NamedTuple):
+    """
+    One field to extract.
+    aliases: printed labels that precede the value ("Father Name", "Father's Name").
+             Empty -> the value pattern is matched on its own (dates, UIDs, keywords).
+    Labels are case-insensitive unless case_sensitive is set; value patterns are used as written.
+    """
+    name: str
+    aliases: Tuple[str, ...] = ()
+    value: str = LINE_VALUE
+    case_sensitive: bool = False
+
+
+DATE = r"\d{2}[/\-.]\d{2}[/\-.]\d{4}"
+AMOUNT = r"(?i:rs\.?|inr|₹)?\s*[\d,]+(?:\.\d{1,2})?"
+
+# --- DOCUMENT TYPES AS LABEL SETS ---
+DOCUMENT_LABEL_SETS = {
+    "Aadhaar Card": (
+        # The addressee's name usually sits on the line below "To,": the only value allowed there
+        LabelSpec("raw_name", ("To,", "To"), r"(?:\r?\n[ \t]*)?[A-Z][a-zA-Z .]+", case_sensitive=True),
+        LabelSpec("dob", ("DOB", "Date of Birth", "Year of Birth"), DATE + r"|\d{4}"),
+        LabelSpec("dob", (), DATE),
+        LabelSpec("gender", (), r"(?i:\b(?:female|male|transgender)\b)"),
+        LabelSpec("uid", (), r"\b\d{4}\s\d{4}\s\d{4}\b"),
+        LabelSpec("vid", ("VID",), r"\d{4}\s\d{4}\s\d{4}\s\d{4}"),
+    ),
+    "Marks Sheet": (
+        LabelSpec("raw_name", ("Name of the Candidate", "Candidate Name", "Student Name", "Name")),
+        LabelSpec("father_name", ("Father's Name", "Father Name", "Father")),
+        LabelSpec("mother_name", ("Mother's Name", "Mother Name", "Mother")),
+        LabelSpec("id_number", ("Roll No", "Roll Number", "Registration No", "Reg No"), r"[A-Z0-9/\-]+"),
+        LabelSpec("dob", ("Date of Birth", "DOB"), DATE),
+        LabelSpec("school_name", ("School", "Name of the School", "Institution")),
+        LabelSpec("board", ("Board",)),
+        LabelSpec("year", ("Year of Passing", "Year", "Session"), r"\d{4}(?:\s*-\s*\d{2,4})?"),
+        LabelSpec("total", ("Grand Total", "Total Marks", "Total"), r"\d{1,4}(?:\s*/\s*\d{1,4})?"),
+        LabelSpec("percentage", ("Percentage",), r"\d{1,3}(?:\.\d+)?\s*%?"),
+        LabelSpec("result", ("Result",), r"(?i:pass|fail|passed|failed|compartment)"),
+    ),
+    "Income Certificate": (
+        LabelSpec("raw_name", ("This is to certify that", "Name of the Applicant", "Applicant Name", "Name")),
+        LabelSpec("father_name", ("S/o", "D/o", "Son of", "Daughter of", "Father's Name", "Father Name")),
+        LabelSpec("annual_income", ("Annual Income", "Total Annual Income", "Income from all sources"), AMOUNT),
+        LabelSpec("certificate_number", ("Certificate No", "Certificate Number", "Serial No"), r"[A-Z0-9/\-]+"),
+        LabelSpec("issue_date", ("Date of Issue", "Issued on", "Date"), DATE),
+        LabelSpec("district", ("District",)),
+        LabelSpec("taluk", ("Taluk", "Tehsil", "Mandal")),
+    ),
+    "Caste Certificate": (
+        LabelSpec("raw_name", ("This is to certify that", "Name of the Applicant", "Applicant Name", "Name")),
+        LabelSpec("father_name", ("S/o", "D/o", "Son of", "Daughter of", "Father's Name", "Father Name")),
+        LabelSpec("caste", ("belongs to the", "Caste", "Community"), r"[A-Za-z .()\-]+"),
+        LabelSpec("category", ("Category",), r"(?i:SC|ST|OBC|BC|MBC|EWS|General)"),
+        LabelSpec("certificate_number", ("Certificate No", "Certificate Number", "Serial No"), r"[A-Z0-9/\-]+"),
+        LabelSpec("issue_date", ("Date of Issue", "Issued on", "Date"), DATE),
+        LabelSpec("district", ("District",)),
+    ),
+}
+
+# Cheap keyword test, run once on the lower-cased text
+DOCUMENT_KEYWORDS = (
+    ("Aadhaar Card", ("unique identification", "aadhaar", "government of india")),
+    ("Marks Sheet", ("marks statement", "marksheet", "mark sheet", "grand total", "roll no")),
+    ("Income Certificate", ("income certificate", "annual income")),
+    ("Caste Certificate", ("caste certificate", "community certificate")),
+)
+
+
+def detect_document_type(text_lower):
+    for doc_type, keywords in DOCUMENT_KEYWORDS:
+        if any(k in text_lower for k in keywords):
+            return doc_type
+    return "Unknown"
+
+
+class CompiledLabelSet(NamedTuple):
+    labels: dict        # lower-cased alias -> (spec index, alias as written)
+    values: tuple       # per spec: compiled "separator + value" pattern (None for bare specs)
+    bare: tuple         # (spec index, compiled value pattern) for specs without aliases
+
+
+@lru_cache(maxsize=64)
+def compile_matcher(specs):
+    """
+    Compiles a set of LabelSpecs once (cached per label set). Each pattern is compiled on its
+    own, so a value pattern may contain groups of its own.
+    """
+    labels = {}
+    for i, spec in enumerate(specs):
+        for alias in spec.aliases:
+            labels.setdefault(alias.lower(), (i, alias))
+    values = tuple(
+        re.compile(rf"[ \t]*[:\-.]?[ \t]*({spec.value})") if spec.aliases else None for spec in specs
+    )
+    bare = tuple((i, re.compile(spec.value, re.IGNORECASE)) for i, spec in enumerate(specs) if not spec.aliases)
+    return CompiledLabelSet(labels, values, bare)
+
+
+_LETTERS = frozenset("abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ")
+
+
+def _find_all(text, sub):
+    pos = text.find(sub)
+    while pos != -1:
+        yield pos
+        pos = text.find(sub, pos + 1)
+
+
+def _label_hits(text, labels):
+    """
+    [(end, alias)] of every label standing as a word, in text order: the longest label at a
+    position wins and hits inside an earlier label are skipped (the scan resumes after it).
+    Labels are pre-filtered with plain substring tests, so a document only pays for the labels
+    it actually contains.
+    """
+    text_lower = text.lower()
+    # Rare characters change length when lower-cased; then positions come from a regex instead
+    same_length = len(text_lower) == len(text)
+    last = len(text) - 1
+    hits = []
+    for alias in labels:
+        if same_length:
+            if alias not in text_lower:
+                continue
+            positions = _find_all(text_lower, alias)
+        else:
+            positions = (m.start() for m in re.finditer(re.escape(alias), text, re.IGNORECASE))
+        for pos in positions:
+            end = pos + len(alias)
+            if (pos == 0 or text[pos - 1] not in _LETTERS) and (end > last or text[end] not in _LETTERS):
+                hits.append((pos, -end, alias))
+    hits.sort()
+
+    out, cursor = [], 0
+    for pos, neg_end, alias in hits:
+        if pos >= cursor:
+            cursor = -neg_end
+            out.append((cursor, alias))
+    return out
+
+
+class FieldExtractor:
+    """
+    Extracts many labelled fields from OCR text in one pass over the labels it contains.
+    """
+    def extract(self, text, specs):
+        """
+        Returns {field: {"value", "start", "end", "confidence"}}. Per field the most confident hit
+        wins, the earliest among equals: a labelled hit beats a bare-pattern hit anywhere.
+        """
+        specs = tuple(specs)
+        if not specs or not text:
+            return {}
+
+        compiled = compile_matcher(specs)
+        found = {}
+
+        def offer(i, start, end, confidence):
+            value = text[start:end].strip(" \t\r\n:-,.")
+            if not value:
+                return
+            if len(value) < 2:
+                confidence = round(confidence - 0.3, 2)
+            current = found.get(specs[i].name)
+            if current is None or confidence > current["confidence"] or (
+                    confidence == current["confidence"] and start < current["start"]):
+                found[specs[i].name] = {"value": value, "start": start, "end": end, "confidence": confidence}
+
+        for label_end, alias in _label_hits(text, compiled.labels):
+            i, written = compiled.labels[alias]
+            if specs[i].case_sensitive and text[label_end - len(alias):label_end] != written:
+                continue
+            if specs[i].name in found and found[specs[i].name]["confidence"] >= 0.9:
+                continue  # an earlier labelled hit already won
+            value_match = compiled.values[i].match(text, label_end)
+            if value_match:
+                offer(i, *value_match.span(1), 0.9)
+
+        for i, pattern in compiled.bare:
+            current = found.get(specs[i].name)
+            if current and current["confidence"] >= 0.6:
+                continue  # a bare hit cannot beat it
+            for match in pattern.finditer(text):
+                offer(i, *match.span(), 0.6)
+                if found.get(specs[i].name, {}).get("confidence", 0) >= 0.6:
+                    break
+        return found
+
+    def extract_document(self, text, doc_type):
+        return self.extract(text, DOCUMENT_LABEL_SETS.get(doc_type, ()))
@@ -0,0 +1,131 @@
+from PIL import Image, ImageOps, ImageChops
+import io
+from app.services.log_service import get_logger
+
+log = get_logger(__name__)
+
+# Magic bytes -> MIME type (used when we pass bytes through untouched)
+MAGIC_MIME = [
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"GIF8", "image/gif"),
+    (b"%PDF", "application/pdf"),
+]
+
+FORMAT_MIME = {"JPEG": "image/jpeg", "WEBP": "image/webp"}
+
+
+def sniff_mime(file_bytes):
+    """
+    Guesses the MIME type from the first bytes of the file.
+    """
+    if file_bytes[:4] == b"RIFF" and file_bytes[8:12] == b"WEBP":
+        return "image/webp"
+    for magic, mime in MAGIC_MIME:
+        if file_bytes.startswith(magic):
+            return mime
+    return "application/octet-stream"
+
+
+class ImagePreprocessor:
+    """
+    Shrinks document photos before they are sent to the Vision LLM.
+    Pipeline: EXIF rotate -> crop to the document -> downscale -> size-budgeted re-encode.
+    """
+    def __init__(self, max_long_edge=1600, max_bytes=350_000, fmt="JPEG", min_quality=40):
+        self.max_long_edge = max_long_edge
+        self.max_bytes = max_bytes
+        self.fmt = fmt.upper()
+        self.min_quality = min_quality
+
+    def prepare(self, file_bytes):
+        """
+        Returns {"bytes", "mime", "size", "original_bytes"} ready for a data URL.
+        Falls back to the original bytes if the image cannot be decoded.
+        """
+        try:
+            image = Image.open(io.BytesIO(file_bytes))
+            image.load()
+        except Exception as e:
+            log.warning("⚠️ Preprocess skipped (not a decodable image)", extra={"error": str(e)})
+            return {
+                "bytes": file_bytes,
+                "mime": sniff_mime(file_bytes),
+                "size": None,
+                "original_bytes": len(file_bytes),
+            }
+
+        # 1. Phone photos are often stored sideways with an EXIF rotation flag
+        image = ImageOps.exif_transpose(image)
+        image = self._to_rgb(image)
+
+        # 2. Drop the table/background around the document
+        image = self._crop_document(image)
+
+        # 3. Downscale (the model does not need more than ~1600px for printed text)
+        if max(image.size) > self.max_long_edge:
+            image.thumbnail((self.max_long_edge, self.max_long_edge), Image.LANCZOS)
+
+        # 4. Encode within the byte budget
+        encoded = self._encode_within_budget(image)
+
+        return {
+            "bytes": encoded,
+            "mime": FORMAT_MIME.get(self.fmt, "image/jpeg"),
+            "size": image.size,
+            "original_bytes": len(file_bytes),
+        }
+
+    def _to_rgb(self, image):
+        if image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info):
+            # Flatten transparency onto white, otherwise it turns black in JPEG
+            image = image.convert("RGBA")
+            background = Image.new("RGB", image.size, (255, 255, 255))
+            background.paste(image, mask=image.split()[-1])
+            return background
+        if image.mode != "RGB":
+            return image.convert("RGB")
+        return image
+
+    def _crop_document(self, image, margin_ratio=0.02):
+        """
+        Crops to the region that differs from the background colour (sampled at the corners).
+        Only applied when it removes a meaningful border and keeps most of the content.
+        """
+        gray = ImageOps.autocontrast(image.convert("L"))
+        w, h = gray.size
+        corners = [gray.getpixel((0, 0)), gray.getpixel((w - 1, 0)),
+                   gray.getpixel((0, h - 1)), gray.getpixel((w - 1, h - 1))]
+        background = Image.new("L", gray.size, int(sum(corners) / len(corners)))
+
+        # Threshold the difference so sensor noise does not count as content
+        diff = ImageChops.difference(gray, background).point(lambda p: 255 if p > 40 else 0)
+        bbox = diff.getbbox()
+        if not bbox:
+            return image
+
+        left, top, right, bottom = bbox
+        crop_area = (right - left) * (bottom - top)
+        if crop_area < 0.3 * w * h or crop_area > 0.95 * w * h:
+            # Either we found a speck (bad guess) or there is nothing worth trimming
+            return image
+
+        mx, my = int(w * margin_ratio), int(h * margin_ratio)
+        return image.crop((max(0, left - mx), max(0, top - my), min(w, right + mx), min(h, bottom + my)))
+
+    def _encode_within_budget(self, image):
+        """
+        Steps quality down, then resolution, until the payload fits max_bytes.
+        """
+        current = image
+        for _ in range(6):
+            for quality in range(85, self.min_quality - 1, -10):
+                buffer = io.BytesIO()
+                current.save(buffer, format=self.fmt, quality=quality, optimize=True)
+                data = buffer.getvalue()
+                if len(data) <= self.max_bytes:
+                    return data
+            # Still too big at the lowest quality: shrink and retry
+            new_size = (max(1, int(current.width * 0.85)), max(1, int(current.height * 0.85)))
+            current = current.resize(new_size, Image.LANCZOS)
+        return data
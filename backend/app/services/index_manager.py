@@ -0,0 +1,200 @@
+"""
+Versioned scheme index generations with atomic publish and hot swap.
+
+    scheme_indexes/
+        CURRENT                      name of the live generation (replaced atomically)
+        gen-20250101-120000-ab12/
+            chroma/                  Chroma persist directory
+            mmap/                    SchemeIndex export (serve.py workers)
+            catalog/                 CatalogStore columns (scheme fields by id, category, level)
+            manifest.json            {"generation", "count", "model", "created"}
+
+ingest.py builds into a fresh generation, validates it and publishes it by rewriting CURRENT.
+Running RAGServices stat CURRENT (at most once per `check_interval`), open the new generation
+beside the old one on a background thread (requests keep searching the old one meanwhile),
+swap, and close the old handle once its in-flight searches finish.
+Old generations are deleted after a grace period, so workers of other processes have time to move.
+"""
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from app.services.log_service import get_logger
+
+log = get_logger(__name__)
+
+DEFAULT_ROOT = "scheme_indexes"
+POINTER = "CURRENT"
+
+
+# --- BUILD SIDE (ingest.py) ---
+def new_generation(root=DEFAULT_ROOT):
+    name = f"gen-{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:4]}"
+    path = os.path.join(root, name)
+    os.makedirs(path)
+    return name, path
+
+
+def write_manifest(path, **fields):
+    manifest = {"generation": os.path.basename(path), "created": int(time.time()), **fields}
+    with open(os.path.join(path, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def validate_generation(path, vector_store, expected_count, probe="scholarship for students"):
+    """
+    Refuses to publish an index that is empty, short of documents or cannot answer a query.
+    """
+    count = len(vector_store.get(include=[])["ids"])
+    if count == 0 or count != expected_count:
+        raise ValueError(f"Generation {path} has {count} documents, expected {expected_count}")
+    if not vector_store.similarity_search(probe, k=1):
+        raise ValueError(f"Generation {path} returned nothing for a probe query")
+    if not os.path.exists(os.path.join(path, "manifest.json")):
+        raise ValueError(f"Generation {path} has no manifest")
+    return count
+
+
+def publish(root, name):
+    """
+    Atomic pointer switch: readers see the old name or the new one, never a partial file.
+    """
+    tmp = os.path.join(root, f"{POINTER}.{os.getpid()}.tmp")
+    with open(tmp, "w") as f:
+        f.write(name)
+    os.replace(tmp, os.path.join(root, POINTER))
+    log.info("📢 Index generation published", extra={"generation": name})
+
+
+def read_pointer(root=DEFAULT_ROOT):
+    try:
+        with open(os.path.join(root, POINTER), "r") as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def collect_garbage(root=DEFAULT_ROOT, keep=2, grace_seconds=600):
+    """
+    Deletes generations beyond the newest `keep`, once they are older than the grace period.
+    The live one is never removed.
+    """
+    live = read_pointer(root)
+    generations = sorted(d for d in os.listdir(root) if d.startswith("gen-"))
+    removed = []
+    for name in generations[:-keep] if keep else generations:
+        path = os.path.join(root, name)
+        if name == live or time.time() - os.path.getmtime(path) < grace_seconds:
+            continue
+        shutil.rmtree(path, ignore_errors=True)
+        removed.append(name)
+    if removed:
+        log.info("🧹 Old index generations removed", extra={"generations": removed})
+    return removed
+
+
+# --- SERVE SIDE (RAGService) ---
+class IndexHandle:
+    """
+    One open generation. `vector_store` (Chroma) or `scheme_index` (mmap) is set, per backend;
+    `catalog` when the generation has one.
+    """
+    def __init__(self, generation, vector_store=None, scheme_index=None, catalog=None):
+        self.generation = generation
+        self.vector_store = vector_store
+        self.scheme_index = scheme_index
+        self.catalog = catalog
+        self.refs = 0
+        self.retired = False
+
+    def close(self):
+        # Drop the Chroma client / mmap views; the files may be deleted by GC afterwards
+        self.vector_store = None
+        self.scheme_index = None
+        self.catalog = None
+
+
+class IndexManager:
+    def __init__(self, root, opener, check_interval=1.0):
+        """
+        opener(generation_path) -> IndexHandle kwargs, e.g. {"vector_store": Chroma(...)}.
+        """
+        self.root = root
+        self.opener = opener
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._swap_lock = threading.Lock()
+        self._handle = None
+        self._next_check = 0.0
+        if hasattr(os, "register_at_fork"):
+            # A loader thread does not survive fork (serve.py): its locks must not stay held
+            os.register_at_fork(after_in_child=self._reset_locks)
+        self._maybe_swap(force=True)
+
+    def _reset_locks(self):
+        self._lock = threading.Lock()
+        self._swap_lock = threading.Lock()
+
+    @property
+    def generation(self):
+        return self._handle.generation if self._handle else None
+
+    def _maybe_swap(self, force=False):
+        now = time.monotonic()
+        if not force and now < self._next_check:
+            return
+        self._next_check = now + self.check_interval
+        name = read_pointer(self.root)
+        if not name or name == self.generation:
+            return
+        # One loader at a time; searches keep using the old handle meanwhile
+        if not self._swap_lock.acquire(blocking=False):
+            return
+        if force:
+            self._load(name)
+        else:
+            # Opening Chroma / the catalog takes seconds: never on the request that noticed it
+            threading.Thread(target=self._load, args=(name,), name="index-load", daemon=True).start()
+
+    def _load(self, name):
+        # Called holding _swap_lock; only the swap itself takes _lock
+        try:
+            path = os.path.join(self.root, name)
+            try:
+                handle = IndexHandle(name, **self.opener(path))
+            except Exception as e:
+                log.error("❌ Could not open index generation", extra={"generation": name, "error": str(e)})
+                return
+            with self._lock:
+                old, self._handle = self._handle, handle
+                if old is not None:
+                    old.retired = True
+                    if old.refs == 0:
+                        old.close()
+            log.info("🔁 Index swapped", extra={"from": old.generation if old else None, "to": name})
+        finally:
+            self._swap_lock.release()
+
+    @contextmanager
+    def acquire(self):
+        """
+        with manager.acquire() as handle: ...  (handle is None when nothing is published yet)
+        """
+        self._maybe_swap()
+        with self._lock:
+            handle = self._handle
+            if handle is not None:
+                handle.refs += 1
+        try:
+            yield handle
+        finally:
+            if handle is not None:
+                with self._lock:
+                    handle.refs -= 1
+                    # Drained: the last in-flight search on a retired generation closes it
+                    if handle.retired and handle.refs == 0:
+                        handle.close()
@@ -0,0 +1,228 @@
+"""
+Record/replay layer for the Groq HTTP traffic of RAGService and OCRLLMService.
+
+    LLM_CASSETTE_MODE=record  -> calls go to Groq; every request/response (+ timing) is appended to the cassette
+    LLM_CASSETTE_MODE=replay  -> responses come from the cassette; a request that was never recorded raises CassetteMiss
+                                 (no SDK retries, and never turned into a degraded answer: the run fails)
+    LLM_CASSETTE_MODE=off     -> (default) plain Groq client
+
+    LLM_CASSETTE_PATH=cassettes/llm.jsonl   (".gz" suffix -> gzip-compressed)
+    LLM_REPLAY_LATENCY=0 | recorded | <scale>   e.g. 0.5 replays at half the recorded latency
+"""
+import asyncio
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+import httpx
+from app.services.log_service import get_logger
+
+log = get_logger(__name__)
+
+# Request fields that change between otherwise identical calls
+VOLATILE_FIELDS = ("user", "seed", "stream_options")
+
+
+class CassetteMiss(Exception):
+    """
+    Replay mode was asked for a request that is not on the cassette.
+    """
+
+
+def cassette_miss(exc):
+    """
+    The CassetteMiss behind `exc`, or None. SDKs wrap transport errors (Groq raises
+    APIConnectionError from it), so handlers that degrade on errors check this and re-raise.
+    """
+    seen = set()
+    while exc is not None and id(exc) not in seen:
+        if isinstance(exc, CassetteMiss):
+            return exc
+        seen.add(id(exc))
+        exc = exc.__cause__ or exc.__context__
+    return None
+
+
+def max_retries(default=2):
+    """
+    SDK retry count: none in replay mode, where a retry only replays the same miss.
+    """
+    return 0 if os.getenv("LLM_CASSETTE_MODE", "off").lower() == "replay" else default
+
+
+def fingerprint(request):
+    try:
+        body = json.loads(request.content or b"{}")
+        for field in VOLATILE_FIELDS:
+            body.pop(field, None)
+        canonical = json.dumps(body, sort_keys=True, separators=(",", ":"))
+    except (ValueError, AttributeError):
+        canonical = (request.content or b"").decode("utf-8", "replace")
+    raw = f"{request.method} {request.url.path}\n{canonical}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class CassetteStore:
+    """
+    Append-only JSON-lines file: one {fp, method, path, status, content_type, body, elapsed_ms} per line.
+    Repeated identical requests are replayed in the order they were recorded.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._entries = {}
+        self._cursor = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def _open(self, mode):
+        if self.path.endswith(".gz"):
+            return gzip.open(self.path, mode + "t", encoding="utf-8")
+        return open(self.path, mode, encoding="utf-8")
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with self._open("r") as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    self._entries.setdefault(entry["fp"], []).append(entry)
+        log.info("📼 Cassette loaded", extra={"path": self.path, "requests": len(self._entries)})
+
+    def lookup(self, fp):
+        with self._lock:
+            entries = self._entries.get(fp)
+            if not entries:
+                return None
+            i = self._cursor.get(fp, 0)
+            self._cursor[fp] = i + 1
+            return entries[i % len(entries)]
+
+    def append(self, entry):
+        with self._lock:
+            self._entries.setdefault(entry["fp"], []).append(entry)
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with self._open("a") as f:
+                f.write(json.dumps(entry, separators=(",", ":")) + "\n")
+
+
+class _CassetteMixin:
+    def _setup(self, store, mode, latency):
+        self.store, self.mode, self.latency = store, mode, latency
+
+    def _replay_entry(self, request):
+        fp = fingerprint(request)
+        entry = self.store.lookup(fp)
+        if entry is None:
+            raise CassetteMiss(
+                f"No recorded response for {request.method} {request.url.path} (fingerprint {fp[:12]}). "
+                f"Re-record with LLM_CASSETTE_MODE=record."
+            )
+        return entry
+
+    def _delay(self, entry):
+        if self.latency == "recorded":
+            return entry["elapsed_ms"] / 1000
+        return entry["elapsed_ms"] / 1000 * float(self.latency)
+
+    def _to_response(self, entry, request):
+        return httpx.Response(
+            entry["status"],
+            headers={"content-type": entry.get("content_type", "application/json")},
+            content=entry["body"].encode("utf-8"),
+            request=request,
+        )
+
+    def _record(self, request, response, body, elapsed):
+        self.store.append({
+            "fp": fingerprint(request),
+            "method": request.method,
+            "path": request.url.path,
+            "status": response.status_code,
+            "content_type": response.headers.get("content-type", "application/json"),
+            "body": body.decode("utf-8", "replace"),
+            "elapsed_ms": round(elapsed * 1000, 1),
+            "recorded_at": int(time.time()),
+        })
+
+
+class RecordReplayTransport(_CassetteMixin, httpx.BaseTransport):
+    def __init__(self, store, mode, latency="0"):
+        self._setup(store, mode, latency)
+        self.inner = httpx.HTTPTransport(retries=1) if mode == "record" else None
+
+    def handle_request(self, request):
+        if self.mode == "replay":
+            entry = self._replay_entry(request)
+            delay = self._delay(entry)
+            if delay:
+                time.sleep(delay)
+            return self._to_response(entry, request)
+
+        start = time.perf_counter()
+        response = self.inner.handle_request(request)
+        body = response.read()
+        elapsed = time.perf_counter() - start
+        self._record(request, response, body, elapsed)
+        return httpx.Response(response.status_code, headers={"content-type": response.headers.get(
+            "content-type", "application/json")}, content=body, request=request)
+
+    def close(self):
+        if self.inner:
+            self.inner.close()
+
+
+class AsyncRecordReplayTransport(_CassetteMixin, httpx.AsyncBaseTransport):
+    def __init__(self, store, mode, latency="0"):
+        self._setup(store, mode, latency)
+        self.inner = httpx.AsyncHTTPTransport(retries=1) if mode == "record" else None
+
+    async def handle_async_request(self, request):
+        if self.mode == "replay":
+            entry = self._replay_entry(request)
+            delay = self._delay(entry)
+            if delay:
+                await asyncio.sleep(delay)
+            return self._to_response(entry, request)
+
+        start = time.perf_counter()
+        response = await self.inner.handle_async_request(request)
+        body = await response.aread()
+        elapsed = time.perf_counter() - start
+        self._record(request, response, body, elapsed)
+        return httpx.Response(response.status_code, headers={"content-type": response.headers.get(
+            "content-type", "application/json")}, content=body, request=request)
+
+    async def aclose(self):
+        if self.inner:
+            await self.inner.aclose()
+
+
+_stores = {}
+
+
+def cassette_clients():
+    """
+    (sync httpx.Client, async httpx.AsyncClient) wired to the cassette, or (None, None) when disabled.
+    Clients in one process share the same cassette file.
+    """
+    mode = os.getenv("LLM_CASSETTE_MODE", "off").lower()
+    if mode not in ("record", "replay"):
+        return None, None
+
+    path = os.getenv("LLM_CASSETTE_PATH", "cassettes/llm.jsonl")
+    latency = os.getenv("LLM_REPLAY_LATENCY", "0")
+    if path not in _stores:
+        _stores[path] = CassetteStore(path)
+    store = _stores[path]
+
+    log.info("📼 LLM cassette active", extra={"mode": mode, "path": path, "latency": latency})
+    timeout = httpx.Timeout(60.0)
+    return (
+        httpx.Client(transport=RecordReplayTransport(store, mode, latency), timeout=timeout),
+        httpx.AsyncClient(transport=AsyncRecordReplayTransport(store, mode, latency), timeout=timeout),
+    )
@@ -0,0 +1,75 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+
+# Extra keys passed as logger.info(..., extra={...}) that end up in the JSON line
+_RESERVED = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+_listener = None
+
+
+class JSONFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def _start_listener():
+    """
+    Hot-path code only puts records on an in-memory queue; one background thread does the (slow) writes.
+    """
+    global _listener
+    log_queue = queue.SimpleQueue()
+
+    handler = logging.StreamHandler()
+    handler.setFormatter(JSONFormatter())
+
+    root = logging.getLogger("sevai")
+    root.setLevel(os.getenv("SEVAI_LOG_LEVEL", "INFO"))
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    root.propagate = False
+
+    _listener = logging.handlers.QueueListener(log_queue, handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+
+def _restart_in_child():
+    """
+    Threads do not survive fork(): a worker forked by serve.py would queue records nobody writes.
+    """
+    global _listener
+    if _listener is None:
+        return
+    atexit.unregister(_listener.stop)
+    root = logging.getLogger("sevai")
+    for handler in list(root.handlers):
+        if isinstance(handler, logging.handlers.QueueHandler):
+            root.removeHandler(handler)
+    _start_listener()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_restart_in_child)
+
+
+def get_logger(name):
+    """
+    Structured, non-blocking logger: get_logger(__name__).info("Database Updated", extra={"user": key})
+    """
+    if _listener is None:
+        _start_listener()
+    return logging.getLogger(f"sevai.{name}")
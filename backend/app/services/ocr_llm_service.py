@@ -4,19 +4,59 @@ import os
 import json
 import re
 from dotenv import load_dotenv
+from app.services.image_service import ImagePreprocessor, sniff_mime
+from app.services.metrics import span, record_tokens
+from app.services.llm_replay import cassette_clients, cassette_miss, max_retries
+from app.services.log_service import get_logger
+
+log = get_logger(__name__)
 
 class OCRLLMService:
     def __init__(self):
         load_dotenv()
         api_key = os.getenv("GROQ_API_KEY") 
         if not api_key:
-             print("❌ CRITICAL: GROQ_API_KEY missing.")
+             log.critical("❌ GROQ_API_KEY missing.")
         
-        self.client = Groq(api_key=api_key)
+        self.api_key = api_key
+        self.build_clients()
         self.model = "meta-llama/llama-4-scout-17b-16e-instruct"
 
-    def extract_text(self, file_bytes):
-        base64_image = base64.b64encode(file_bytes).decode('utf-8')
+        # Shrink uploads before they hit the vision model (set to None to send raw bytes)
+        self.preprocessor = ImagePreprocessor(
+            max_long_edge=int(os.getenv("VISION_MAX_EDGE", "1600")),
+            max_bytes=int(os.getenv("VISION_MAX_BYTES", "350000")),
+            fmt=os.getenv("VISION_FORMAT", "JPEG"),
+        )
+        self.last_payload_bytes = 0
+
+    def build_clients(self):
+        """
+        (Re)creates the Groq client; called again in each forked worker (serve.py).
+        """
+        # Record/replay (LLM_CASSETTE_MODE) plugs in at the HTTP layer; None = normal client
+        http_client, _ = cassette_clients()
+        self.client = Groq(api_key=self.api_key, http_client=http_client, max_retries=max_retries())
+
+    def _encode_page(self, file_bytes):
+        """
+        Returns a data URL for one page, with the correct MIME type.
+        """
+        if self.preprocessor:
+            with span("ocr.preprocess"):
+                prepared = self.preprocessor.prepare(file_bytes)
+            payload, mime = prepared["bytes"], prepared["mime"]
+        else:
+            payload, mime = file_bytes, sniff_mime(file_bytes)
+
+        base64_image = base64.b64encode(payload).decode('utf-8')
+        return f"data:{mime};base64,{base64_image}"
+
+    def extract_text(self, file_bytes, back_bytes=None):
+        # Front and back of a card go together in ONE request
+        pages = [file_bytes] + ([back_bytes] if back_bytes else [])
+        image_urls = [self._encode_page(page) for page in pages]
+        self.last_payload_bytes = sum(len(url) for url in image_urls)
 
         # --- UNIVERSAL PROMPT ---
         prompt = """
@@ -53,32 +93,36 @@ class OCRLLMService:
         
         Return ONLY valid JSON.
         """
+        if len(image_urls) > 1:
+            prompt += "\nThe images are the FRONT and BACK of the same document. Merge them into ONE JSON.\n"
 
         try:
-            print("👁️ Sending Image to Universal Vision AI...")
-            chat_completion = self.client.chat.completions.create(
-                messages=[
-                    {
-                        "role": "user",
-                        "content": [
-                            {"type": "text", "text": prompt},
-                            {
-                                "type": "image_url",
-                                "image_url": { # <--- FIXED HERE
-                                    "url": f"data:image/jpeg;base64,{base64_image}"
-                                }
-                            },
-                        ],
-                    }
-                ],
-                model=self.model,
-                temperature=0,
-            )
+            log.info("👁️ Sending pages to Universal Vision AI",
+                     extra={"pages": len(image_urls), "payload_bytes": self.last_payload_bytes})
+            content = [{"type": "text", "text": prompt}]
+            content += [{"type": "image_url", "image_url": {"url": url}} for url in image_urls]
+            with span("ocr.vision_llm"):
+                chat_completion = self.client.chat.completions.create(
+                    messages=[
+                        {
+                            "role": "user",
+                            "content": content,
+                        }
+                    ],
+                    model=self.model,
+                    temperature=0,
+                )
+
+            usage = getattr(chat_completion, "usage", None)
+            if usage:
+                record_tokens(self.model, usage.prompt_tokens, usage.completion_tokens)
 
             return chat_completion.choices[0].message.content
 
         except Exception as e:
-            print(f"❌ Vision LLM Error: {e}")
+            if cassette_miss(e):
+                raise cassette_miss(e)
+            log.error("❌ Vision LLM Error", extra={"error": str(e)})
             return "{}"
 
     def parse_document(self, raw_json_str):
@@ -97,5 +141,5 @@ class OCRLLMService:
             }
 
         except Exception as e:
-            print(f"❌ Parsing Error: {e}")
+            log.error("❌ Parsing Error", extra={"error": str(e)})
             return {"status": "error", "error": str(e)}
\ No newline at end of file
@@ -2,70 +2,64 @@ import pytesseract
 from PIL import Image
 import io
 import re
+from functools import lru_cache
+from app.services.field_extractor import FieldExtractor, detect_document_type
+from app.services.metrics import span
+from app.services.log_service import get_logger
+
+log = get_logger(__name__)
 
 # Update this path for your system
 pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
 
+@lru_cache(maxsize=256)
+def _label_pattern(target_label):
+    return re.compile(f"{re.escape(target_label)}[:\\s\\-]+(.*?)(?:\\n|$)", re.IGNORECASE)
+
 class OCRService:
+    def __init__(self):
+        self.extractor = FieldExtractor()
+
     def extract_text(self, file_bytes):
         try:
             image = Image.open(io.BytesIO(file_bytes))
             # English is sufficient for standard Aadhaar
-            text = pytesseract.image_to_string(image, lang='eng') 
+            with span("ocr.tesseract"):
+                text = pytesseract.image_to_string(image, lang='eng') 
             return text
         except Exception as e:
-            print(f"❌ OCR Error: {e}")
+            log.error("❌ OCR Error", extra={"error": str(e)})
             return ""
 
     def parse_document(self, text):
         """
         Extracts raw data and maps it to NSDL PAN Form fields.
         """
+        with span("ocr.parse"):
+            return self._parse_document(text)
+
+    def _parse_document(self, text):
         data = {}
-        text_lower = text.lower()
-        
-        # 1. Detect Doc Type
-        if "unique identification" in text_lower or "aadhaar" in text_lower or "government of india" in text_lower:
-             data["document_type"] = "Aadhaar Card"
-        else:
-             data["document_type"] = "Unknown"
 
-        # 2. Extract Raw Details (Aadhaar Specific)
+        # 1. Detect Doc Type (one lower-case pass)
+        data["document_type"] = detect_document_type(text.lower())
+
+        # 2. Extract every field of this document type (only the labels present in the text are searched)
+        fields = self.extractor.extract_document(text, data["document_type"])
+        for name, hit in fields.items():
+            data[name] = hit["value"]
+        data["field_confidence"] = {name: hit["confidence"] for name, hit in fields.items()}
+
         if data["document_type"] == "Aadhaar Card":
-            # A. Name (Look for "To" line common in letters, or English text blocks)
-            # Regex: "To" followed by Name OR just a capitalized name line
-            name_match = re.search(r"(?:To|To,)\s+([A-Z][a-zA-Z\s\.]+)", text)
-            if name_match:
-                data["raw_name"] = name_match.group(1).strip().replace("\n", " ")
-            else:
-                # Fallback: Look for the line above "DOB"
-                lines = text.split('\n')
-                for i, line in enumerate(lines):
-                    if "dob" in line.lower() or "year of birth" in line.lower():
-                        # The name is usually 1 or 2 lines above DOB
-                        if i > 0 and len(lines[i-1].strip()) > 3:
-                            data["raw_name"] = lines[i-1].strip()
-                        elif i > 1:
-                            data["raw_name"] = lines[i-2].strip()
-                        break
-            
-            # B. Date of Birth (DD/MM/YYYY)
-            dob_match = re.search(r"(\d{2}/\d{2}/\d{4})", text)
-            if dob_match:
-                data["dob"] = dob_match.group(1)
-            
-            # C. Gender (Male/Female)
-            if "female" in text_lower:
-                data["gender"] = "Female"
-            elif "male" in text_lower:
-                data["gender"] = "Male"
-            else:
-                data["gender"] = "Unknown"
+            # A. Name fallback: the line above DOB (uses the match position, no re-scan)
+            if "raw_name" not in data and "dob" in fields:
+                lines_above = text[:fields["dob"]["start"]].split("\n")[:-1]
+                candidates = [l.strip() for l in lines_above[-2:] if len(l.strip()) > 3]
+                if candidates:
+                    data["raw_name"] = candidates[-1]
 
-            # D. UID (Aadhaar Number)
-            uid_match = re.search(r"\d{4}\s\d{4}\s\d{4}", text)
-            if uid_match:
-                data["uid"] = uid_match.group(0)
+            # B. Gender (Male/Female)
+            data["gender"] = data.get("gender", "Unknown").capitalize()
 
         # 3. MAP TO PAN FORM FIELDS (The Requirement)
         pan_data = self.map_to_pan_form(data)
@@ -124,8 +118,13 @@ class OCRService:
         return form
 
     def extract_dynamic_field(self, text, target_label):
-        pattern = re.compile(f"{re.escape(target_label)}[:\s\-]+(.*?)(?:\n|$)", re.IGNORECASE)
-        match = pattern.search(text)
+        match = _label_pattern(target_label).search(text)
         if match:
              return {"found": True, "label": target_label, "value": match.group(1).strip()}
-        return {"found": False, "label": target_label}
\ No newline at end of file
+        return {"found": False, "label": target_label}
+
+    def extract_fields(self, text, specs):
+        """
+        Batch version of extract_dynamic_field: all LabelSpecs in one pass (positions + confidence).
+        """
+        return self.extractor.extract(text, specs)
\ No newline at end of file
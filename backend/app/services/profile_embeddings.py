@@ -0,0 +1,165 @@
+"""
+Per-user profile embeddings for personalised retrieval.
+
+models.UserProfile.to_search_context() describes the user (age, gender, caste, occupation,
+income, verified documents). Its embedding is computed off the request path whenever
+DataService writes the user (and for everyone at startup), cached by record version, and
+blended into the query vector:
+
+    q' = normalize((1 - w) * q + w * p)        w = PROFILE_BLEND_WEIGHT (0 disables)
+
+so "any scholarships for me?" leans towards schemes that fit the person asking. A record whose
+current version has no vector yet is searched with the plain query while one is built.
+"""
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from app.models import UserProfile
+from app.services.data_service import subscribe
+from app.services.eligibility_service import user_attributes
+from app.services.metrics import CACHE_HITS, CACHE_MISSES
+from app.services.log_service import get_logger
+
+log = get_logger(__name__)
+
+
+def _flat(data, out):
+    for key, value in data.items():
+        if isinstance(value, dict):
+            _flat(value, out)
+        elif isinstance(value, (str, int, float)) and value not in ("", None):
+            out.setdefault(key.lower(), value)
+    return out
+
+
+def user_profile(record):
+    """
+    DataService record -> models.UserProfile (unknown fields keep the model defaults).
+    """
+    flat = _flat(record.get("profile", {}), {})
+    fields = (record.get("view") or {}).get("fields", {})
+    attrs = user_attributes(record)
+    values = {
+        "name": fields.get("full_name") or flat.get("full_name"),
+        "gender": fields.get("gender") or flat.get("gender"),
+        "state": fields.get("state") or flat.get("state"),
+        "caste": flat.get("caste") or flat.get("category") or flat.get("community"),
+        "occupation": flat.get("occupation") or ("Student" if (record.get("view") or {}).get("education") else None),
+        "age": None if np.isnan(attrs["age"]) else int(attrs["age"]),
+        "income": None if np.isnan(attrs["income"]) else int(attrs["income"]),
+    }
+    documents = {}
+    for doc in record.get("documents", []):
+        summary = doc.get("key_fields") or doc.get("data") or {}
+        text = ", ".join(f"{k}: {v}" for k, v in summary.items() if isinstance(v, (str, int, float)))
+        if text:
+            documents[doc.get("type", "Unknown")] = text[:200]
+    return UserProfile(**{k: v for k, v in values.items() if v is not None}, verified_documents=documents)
+
+
+def _unit(vector):
+    v = np.asarray(vector, dtype=np.float32)
+    return v / max(float(np.linalg.norm(v)), 1e-12)
+
+
+def blend(query_vector, profile_vector, weight):
+    return _unit((1 - weight) * _unit(query_vector) + weight * profile_vector)
+
+
+class ProfileEmbeddings:
+    def __init__(self, embeddings, weight=None, max_entries=None):
+        self.embeddings = embeddings
+        self.weight = float(os.getenv("PROFILE_BLEND_WEIGHT", "0.25")) if weight is None else weight
+        self.max_entries = max_entries or int(os.getenv("PROFILE_CACHE_SIZE", "10000"))
+        self._cache = OrderedDict()  # user key -> (record version, unit vector)
+        self._reset()
+        if hasattr(os, "register_at_fork"):
+            # serve.py forks workers: the executor thread, and with it any (key, version) it
+            # was computing, does not exist in the child, and _lock may have been held by it
+            os.register_at_fork(after_in_child=self._reset)
+        if self.weight > 0:
+            subscribe(self._on_user_written)
+
+    def _reset(self):
+        # Per-process state; the cache itself is inherited (copy-on-write)
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._executor = None
+
+    @property
+    def enabled(self):
+        return self.weight > 0
+
+    def _submit(self, fn, *args):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="profile-embed")
+        self._executor.submit(fn, *args)
+
+    def drain(self):
+        """
+        Blocks until every queued embedding is done and stops the worker thread (the next
+        schedule starts a new one). serve.py calls it before fork: workers then inherit the
+        finished vectors and never a half-done computation.
+        """
+        executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    def _on_user_written(self, key, record, previous_stamp, stamp):
+        self.schedule(key, record)
+
+    def schedule(self, key, record):
+        version = record.get("version", 0)
+        with self._lock:
+            cached = self._cache.get(key)
+            if (cached and cached[0] == version) or (key, version) in self._pending:
+                return
+            self._pending.add((key, version))
+        self._submit(self._compute, key, record, version)
+
+    def warm(self, snapshot):
+        """
+        Queue every user of a store snapshot (startup); returns at once.
+        """
+        if self.enabled:
+            for key, record in snapshot.items():
+                self.schedule(key, record)
+
+    def _compute(self, key, record, version):
+        try:
+            vector = _unit(self.embeddings.embed_query(user_profile(record).to_search_context()))
+        except Exception as e:
+            log.warning("⚠️ Profile embedding failed", extra={"user": key, "error": str(e)})
+            return
+        finally:
+            with self._lock:
+                self._pending.discard((key, version))
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is None or cached[0] <= version:
+                self._cache[key] = (version, vector)
+                self._cache.move_to_end(key)
+                while len(self._cache) > self.max_entries:
+                    self._cache.popitem(last=False)
+
+    def vector(self, key, record):
+        """
+        Cached vector for this exact record version, or None (then built in the background).
+        Never calls the model itself.
+        """
+        if not self.enabled or not record:
+            return None
+        version = record.get("version", 0)
+        with self._lock:
+            cached = self._cache.get(key)
+        if cached and cached[0] == version:
+            CACHE_HITS.inc(cache="profile_embedding")
+            return cached[1]
+        CACHE_MISSES.inc(cache="profile_embedding")
+        self.schedule(key, record)
+        return None
+
+    def blend(self, query_vector, profile_vector):
+        return blend(query_vector, profile_vector, self.weight)
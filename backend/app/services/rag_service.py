@@ -6,62 +6,35 @@ from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_core.prompts import PromptTemplate
 from app.services.data_service import DataService
 from langchain_groq import ChatGroq
+from app.services.metrics import span, record_tokens
+from app.services.llm_replay import cassette_clients, cassette_miss, max_retries
+from app.services.scheme_index import SchemeIndex
+from app.services.index_manager import IndexManager
+from app.services.catalog_store import CatalogStore, SECTIONS
+from app.services.profile_embeddings import ProfileEmbeddings
+from app.services.dedupe import expand_variants
+from app.services.log_service import get_logger
 
-class RAGService:
-    def __init__(self):
-        load_dotenv()
-        api_key = os.getenv("GROQ_API_KEY")
-        if not api_key:
-            print("❌ CRITICAL: GROQ_API_KEY is missing!")
-
-        self.embeddings = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
-        self.db_path = "chroma_db"
-        
-        if os.path.exists(self.db_path):
-            try:
-                self.vector_store = Chroma(
-                    persist_directory=self.db_path, 
-                    embedding_function=self.embeddings
-                )
-            except:
-                 self.vector_store = None
-        else:
-            self.vector_store = None
-
-        self.llm = ChatGroq(
-            temperature=0,
-            model_name="llama-3.3-70b-versatile",
-            groq_api_key=api_key
-        )
-        self.data_store = DataService()
-
-    def recommend_schemes(self, simple_profile, user_query, history):
-        try:
-            user_name = getattr(simple_profile, 'name', str(simple_profile)) 
-        except:
-            user_name = "Unknown"
+log = get_logger(__name__)
 
-        # 1. Fetch User Data
-        rich_user_data = self.data_store.get_user_data(user_name)
-        context_str = json.dumps(rich_user_data, indent=2)
+# Record keys that never go into the prompt
+PROMPT_EXCLUDED = ("view", "document_hashes", "version")
+# Store bookkeeping on document references, meaningless to the LLM
+DOCUMENT_PROMPT_EXCLUDED = ("hash", "added_at")
+# Vector hits fetched per requested scheme: section chunks of one scheme and near-duplicate
+# copies collapse into one slot, so over-fetch before aggregating
+CANDIDATE_FACTOR = 6
 
-        # 2. RAG Search
-        if self.vector_store:
-            try:
-                docs = self.vector_store.similarity_search(user_query, k=4) 
-                scheme_context = "\n".join([d.page_content for d in docs])
-            except:
-                scheme_context = "Database search failed."
-        else:
-            scheme_context = "No specific scheme database found."
-
-        # --- THE FIX: CONFIRMATION LOGIC ADDED ---
-        template = """
+# --- THE FIX: CONFIRMATION LOGIC ADDED ---
+CHAT_TEMPLATE = """
         You are Sev-ai, an intelligent government scheme assistant.
         
         --- USER CONTEXT (DATABASE) ---
         {user_data}
         
+        --- RELEVANT SCHEMES (KNOWLEDGE BASE) ---
+        {scheme_info}
+        
         --- SKILLS ---
         1. **PAN Card** (Target: "PAN Card") - Requires: Name, DOB, Mobile, Email.
         
@@ -82,6 +55,7 @@ class RAGService:
            - IF (Intent is Apply OR Confirmation) AND (All Data Present) -> ACTION: "TRIGGER_RPA".
            - IF (Intent is Apply) AND (Data Missing) -> Ask user for missing data.
            - IF (User provided Data) -> Extract it, and if profile is now complete, ACTION: "TRIGGER_RPA".
+           - IF (All Data Present) AND (you are asking the user to confirm) -> ACTION: "NONE", target_scheme: "PAN Card".
 
         --- OUTPUT FORMAT (STRICT JSON) ---
         {{
@@ -93,30 +67,332 @@ class RAGService:
         }}
         """
 
-        prompt = PromptTemplate(
+def _prompt_documents(documents):
+    """
+    Latest reference per document type (they are appended in order), without bookkeeping:
+    the prompt does not grow with every re-upload of the same kind of document.
+    """
+    latest = {}
+    for doc in documents:
+        latest[doc.get("type", "Unknown")] = {k: v for k, v in doc.items() if k not in DOCUMENT_PROMPT_EXCLUDED}
+    return list(latest.values())
+
+
+class RAGService:
+    def __init__(self):
+        load_dotenv()
+        api_key = os.getenv("GROQ_API_KEY")
+        if not api_key:
+            log.critical("❌ GROQ_API_KEY is missing!")
+
+        self.embeddings = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
+        self.db_path = "chroma_db"
+        self.scheme_index = None
+        self.vector_store = None
+
+        # Published generations (ingest.py): hot-swapped when a rebuild is published. Always
+        # watched, so the first generation of a fresh deploy is picked up without a restart
+        index_root = os.getenv("SCHEME_INDEX_ROOT", "scheme_indexes")
+        index_dir = os.getenv("SCHEME_INDEX_DIR")
+        self.index_manager = IndexManager(
+            index_root, self._open_generation, float(os.getenv("SCHEME_INDEX_CHECK_SECONDS", "1.0")))
+        if self.index_manager.generation:
+            log.info("📚 Using published scheme index", extra={"generation": self.index_manager.generation})
+        # Until one is published: read-only mmap export (serve.py) or the legacy Chroma directory
+        elif index_dir and os.path.exists(index_dir):
+            self.scheme_index = SchemeIndex(index_dir)
+            log.info("📚 Using mmap scheme index", extra={"dir": index_dir, "schemes": len(self.scheme_index)})
+        elif os.path.exists(self.db_path):
+            try:
+                self.vector_store = Chroma(
+                    persist_directory=self.db_path, 
+                    embedding_function=self.embeddings
+                )
+            except:
+                 self.vector_store = None
+
+        self.model_name = "llama-3.3-70b-versatile"
+        self.api_key = api_key
+        self.build_clients()
+        self.data_store = DataService()
+        # Personalised retrieval: cached per-user profile vectors, built off the request path
+        self.profiles = ProfileEmbeddings(self.embeddings)
+        self.profiles.warm(self.data_store.snapshot())
+        self.prompt = PromptTemplate(
             input_variables=["user_data", "scheme_info", "query", "history"],
-            template=template
+            template=CHAT_TEMPLATE
         )
 
-        chain = prompt | self.llm
+    def build_clients(self):
+        """
+        (Re)creates the Groq client. serve.py calls this in each worker after fork:
+        connection pools must not be shared across processes.
+        """
+        # Record/replay (LLM_CASSETTE_MODE) plugs in at the HTTP layer; None = normal client
+        http_client, http_async_client = cassette_clients()
+        self.llm = ChatGroq(
+            temperature=0,
+            model_name=self.model_name,
+            groq_api_key=self.api_key,
+            http_client=http_client,
+            http_async_client=http_async_client,
+            max_retries=max_retries()
+        )
+
+    def prepare(self, simple_profile, user_query, history, store=None):
+        """
+        Everything before the LLM: profile + retrieval. -> (prompt inputs, retrieved [(text, metadata)])
+        store: the request's UnitOfWork, so the record read here is the one the turn updates.
+        """
+        try:
+            user_name = getattr(simple_profile, 'name', str(simple_profile)) 
+        except:
+            user_name = "Unknown"
+
+        # 1. Fetch User Data
+        with span("store"):
+            rich_user_data = (store or self.data_store).get_user_data(user_name)
+
+        # 2. RAG Search (leaning towards the user's profile when its vector is cached)
+        with span("retrieval"):
+            profile_vector = self.profiles.vector(user_name.strip().lower(), rich_user_data)
+            docs, note = self._retrieve(user_query, profile_vector=profile_vector)
+        return self._build_inputs(rich_user_data, docs, note, user_query, history), docs
+
+    def prepare_many(self, items, k=4):
+        """
+        Batch form of prepare for [(user_name, query, history)]: one store snapshot, one embedding
+        batch and one vector search pass for all of them. -> [(prompt inputs, retrieved docs)]
+        """
+        with span("store"):
+            snapshot = self.data_store.snapshot()
+        with span("retrieval"):
+            profiles = [self.profiles.vector(user_name.strip().lower(), snapshot.get(user_name.strip().lower(), {}))
+                        for user_name, _, _ in items]
+            results = self._retrieve_many([query for _, query, _ in items], k, profiles)
+        return [
+            (self._build_inputs(snapshot.get(user_name.strip().lower(), {}), docs, note, query, history), docs)
+            for (user_name, query, history), (docs, note) in zip(items, results)
+        ]
+
+    def _build_inputs(self, rich_user_data, docs, note, user_query, history):
+        # The materialized "view" duplicates the profile; documents are compact references (no payloads)
+        record = {k: v for k, v in rich_user_data.items() if k not in PROMPT_EXCLUDED}
+        if "documents" in record:
+            record["documents"] = _prompt_documents(record["documents"])
+        context_str = json.dumps(record, indent=2)
+        scheme_context = note or self._render_docs(docs)
+
+        # JOIN HISTORY INTO A STRING
+        history_str = "\n".join(history) if history else "No previous chat."
+        return {
+            "user_data": context_str, 
+            "scheme_info": scheme_context,
+            "query": user_query,
+            "history": history_str  # <--- PASS HISTORY SO IT REMEMBERS THE QUESTION
+        }
+
+    def recommend_schemes(self, simple_profile, user_query, history):
+        inputs, _ = self.prepare(simple_profile, user_query, history)
         try:
-            # JOIN HISTORY INTO A STRING
-            history_str = "\n".join(history) if history else "No previous chat."
-
-            response = chain.invoke({
-                "user_data": context_str, 
-                "scheme_info": scheme_context,
-                "query": user_query,
-                "history": history_str  # <--- PASS HISTORY SO IT REMEMBERS THE QUESTION
-            })
-            
-            content = response.content
-            json_start = content.find('{')
-            json_end = content.rfind('}') + 1
-            if json_start != -1 and json_end != -1:
-                return content[json_start:json_end]
-            return content
+            with span("llm"):
+                response = self._invoke_llm(inputs)
+            return self._finish(response)
 
         except Exception as e:
-            print(f"❌ Chatbot Error: {e}")
-            return json.dumps({"response_text": "Error.", "action": "NONE"})
\ No newline at end of file
+            if cassette_miss(e):
+                raise cassette_miss(e)
+            log.error("❌ Chatbot Error", extra={"error": str(e)})
+            return json.dumps({"response_text": "Error.", "action": "NONE"})
+
+    async def arecommend(self, inputs):
+        """
+        Async LLM stage for deadline-bound callers: cancelling the task aborts the HTTP call.
+        Errors propagate (the caller decides how to degrade).
+        """
+        with span("llm"):
+            response = await (self.prompt | self.llm).ainvoke(inputs)
+        return self._finish(response)
+
+    def _finish(self, response):
+        usage = getattr(response, "response_metadata", {}).get("token_usage", {})
+        record_tokens(self.model_name, usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0))
+        
+        content = response.content
+        json_start = content.find('{')
+        json_end = content.rfind('}') + 1
+        if json_start != -1 and json_end != -1:
+            return content[json_start:json_end]
+        return content
+
+    def _search_schemes(self, user_query, k=4):
+        docs, note = self._retrieve(user_query, k)
+        return note or self._render_docs(docs)
+
+    def _open_generation(self, path):
+        catalog_dir = os.path.join(path, "catalog")
+        opened = {"catalog": CatalogStore(catalog_dir) if os.path.exists(catalog_dir) else None}
+        # serve.py sets SCHEME_INDEX_BACKEND=mmap so forked workers share the pages
+        if os.getenv("SCHEME_INDEX_BACKEND", "chroma") == "mmap":
+            opened["scheme_index"] = SchemeIndex(os.path.join(path, "mmap"))
+        else:
+            opened["vector_store"] = Chroma(persist_directory=os.path.join(path, "chroma"),
+                                            embedding_function=self.embeddings)
+        return opened
+
+    def has_index(self):
+        return bool(self.index_manager.generation or self.scheme_index is not None or self.vector_store)
+
+    def _retrieve(self, user_query, k=4, profile_vector=None):
+        """
+        -> ([(page_content, metadata)] of k distinct schemes, None) or ([], reason text)
+        """
+        # The handle stays open until this search is done, even if a new generation is swapped in
+        with self.index_manager.acquire() as handle:
+            if handle is not None:
+                docs, note = self._search_index(handle.scheme_index, handle.vector_store, user_query, k,
+                                                profile_vector)
+                return self._hydrate(handle.catalog, docs), note
+        return self._search_index(self.scheme_index, self.vector_store, user_query, k, profile_vector)
+
+    def _retrieve_many(self, user_queries, k=4, profile_vectors=None):
+        with self.index_manager.acquire() as handle:
+            if handle is not None:
+                results = self._search_index_many(handle.scheme_index, handle.vector_store, user_queries, k,
+                                                  profile_vectors)
+                return [(self._hydrate(handle.catalog, docs), note) for docs, note in results]
+        return self._search_index_many(self.scheme_index, self.vector_store, user_queries, k, profile_vectors)
+
+    def _search_index_many(self, scheme_index, vector_store, user_queries, k, profile_vectors=None):
+        if not user_queries:
+            return []
+        if scheme_index is None and not vector_store:
+            return [([], "No specific scheme database found.")] * len(user_queries)
+        with span("embed"):
+            vectors = self.embeddings.embed_documents(list(user_queries))
+        if profile_vectors:
+            vectors = [self.profiles.blend(v, p).tolist() if p is not None else v
+                       for v, p in zip(vectors, profile_vectors)]
+        if scheme_index is not None:
+            found = [[(scheme_index.text(i), scheme_index.metadata(i)) for i, _ in hits]
+                     for hits in scheme_index.search_many(vectors, k=k * CANDIDATE_FACTOR)]
+        else:
+            try:
+                # One collection query for every embedding (similarity_search would do one each)
+                result = vector_store._collection.query(
+                    query_embeddings=vectors, n_results=k * CANDIDATE_FACTOR, include=["documents", "metadatas"])
+                found = [list(zip(texts, [m or {} for m in metas]))
+                         for texts, metas in zip(result["documents"], result["metadatas"])]
+            except Exception as e:
+                log.error("❌ Batch search failed", extra={"error": str(e)})
+                return [([], "Database search failed.")] * len(user_queries)
+        return [(self._distinct(self._aggregate_sections(docs), k), None) for docs in found]
+
+    def _hydrate(self, catalog, docs):
+        """
+        The vector index yields ids; the text the LLM sees comes from the catalog columns.
+        """
+        if catalog is None:
+            return docs
+        hydrated = []
+        for text, meta in docs:
+            # Only the sections that matched the query (plus the name) go into the prompt
+            sections = [s for s in meta.get("sections", ()) if s in SECTIONS]
+            content = catalog.page_content(meta["scheme_id"], sections) if meta.get("scheme_id") else None
+            hydrated.append((content or text, meta))
+        return hydrated
+
+    def eligibility_of(self, docs):
+        """
+        {scheme_id: eligibility column} for retrieved docs, for the degraded answer: hydrated text
+        carries only the sections that matched, which need not include eligibility.
+        """
+        with self.index_manager.acquire() as handle:
+            catalog = handle.catalog if handle is not None else None
+            if catalog is None:
+                return {}
+            found = {}
+            for _, meta in docs:
+                scheme = catalog.get(meta["scheme_id"], ["eligibility"]) if meta.get("scheme_id") else None
+                if scheme:
+                    found[meta["scheme_id"]] = scheme["eligibility"]
+            return found
+
+    def _query_vector(self, user_query, profile_vector):
+        vector = self.embeddings.embed_query(user_query)
+        return vector if profile_vector is None else self.profiles.blend(vector, profile_vector)
+
+    def _search_index(self, scheme_index, vector_store, user_query, k, profile_vector=None):
+        if scheme_index is not None:
+            hits = scheme_index.search(self._query_vector(user_query, profile_vector), k=k * CANDIDATE_FACTOR)
+            docs = [(scheme_index.text(i), scheme_index.metadata(i)) for i, _ in hits]
+        elif not vector_store:
+            return [], "No specific scheme database found."
+        else:
+            try:
+                # Over-fetch (CANDIDATE_FACTOR): chunks and duplicates collapse into fewer schemes
+                if profile_vector is None:
+                    found = vector_store.similarity_search(user_query, k=k * CANDIDATE_FACTOR)
+                else:
+                    found = vector_store.similarity_search_by_vector(
+                        self._query_vector(user_query, profile_vector).tolist(), k=k * CANDIDATE_FACTOR)
+                docs = [(d.page_content, d.metadata) for d in found]
+            except:
+                return [], "Database search failed."
+        return self._distinct(self._aggregate_sections(docs), k), None
+
+    def _aggregate_sections(self, docs):
+        """
+        Section chunks -> one entry per parent scheme, ranked by its best chunk, carrying the
+        matched section names in metadata["sections"]. Whole-scheme documents (indexes built
+        before chunking) pass through unchanged.
+        """
+        parents, order = {}, []
+        for text, meta in docs:
+            meta = meta or {}
+            if "section" not in meta:
+                order.append((text, meta))
+                continue
+            key = meta.get("scheme_id") or meta.get("scheme_name")
+            if key not in parents:
+                parents[key] = ([], {k: v for k, v in meta.items() if k not in ("section", "part")})
+                parents[key][1]["sections"] = []
+                order.append(key)
+            bodies, parent = parents[key]
+            body = text.split("\n", 1)[1] if text.startswith("Scheme Name:") and "\n" in text else text
+            bodies.append(body)
+            if meta["section"] not in parent["sections"]:
+                parent["sections"].append(meta["section"])
+
+        aggregated = []
+        for entry in order:
+            if isinstance(entry, tuple):
+                aggregated.append(entry)
+                continue
+            bodies, parent = parents[entry]
+            header = f"Scheme Name: {parent.get('scheme_name', 'Unknown')}"
+            aggregated.append(("\n".join([header] + bodies) + "\n", parent))
+        return aggregated
+
+    def _render_docs(self, docs):
+        return "\n".join(self._render_scheme(text, meta) for text, meta in docs)
+
+    def _distinct(self, docs, k):
+        seen, picked = set(), []
+        for text, meta in docs:
+            key = (meta or {}).get("cluster_id", (meta or {}).get("scheme_name", text))
+            if key not in seen:
+                seen.add(key)
+                picked.append((text, meta))
+            if len(picked) == k:
+                break
+        return picked
+
+    def _render_scheme(self, text, meta):
+        # One canonical text per cluster; the state/level copies are only named
+        variants = expand_variants(meta)
+        return f"{text.rstrip()}\n        {variants}" if variants else text
+
+    def _invoke_llm(self, inputs):
+        chain = self.prompt | self.llm
+        return chain.invoke(inputs)
\ No newline at end of file
@@ -7,42 +7,287 @@ from selenium.webdriver.support.ui import Select
 from webdriver_manager.chrome import ChromeDriverManager
 from selenium.webdriver.common.keys import Keys
 from selenium.webdriver.common.action_chains import ActionChains
+import os
+import threading
 import time
+from contextlib import contextmanager
+from app.services.metrics import span, record_span, registry
+from app.services.log_service import get_logger
+
+log = get_logger(__name__)
+
+RESERVATIONS = registry.counter("sevai_rpa_reservations_total", "Speculative browser warm-ups, by outcome")
+
+# Live Protean form; benchmarks point this at the local replica (benchmarks/pan_form_stub.py)
+PAN_FORM_URL = "https://onlineservices.proteantech.in/paam/endUserRegisterContact.html"
+
+def _is_pan(scheme_name):
+    scheme_key = str(scheme_name).lower()
+    return "pan" in scheme_key or "permanent account" in scheme_key
+
+
+class Reservation:
+    """
+    A browser opened on the form ahead of the user's "yes" (see RPAService.reserve).
+    """
+    def __init__(self, user, scheme, on_done=None):
+        self.user = user
+        self.scheme = scheme
+        self.on_done = on_done
+        self.created = time.monotonic()
+        self.steps = {}
+        self.driver = None
+        self.ready = threading.Event()
+        self.cancelled = False
+
 
 class RPAService:
-    def __init__(self):
+    def __init__(self, form_url=None, headless=None, keep_open=None):
+        """
+        headless / keep_open default to RPA_HEADLESS=0 / RPA_KEEP_OPEN=1: a visible browser left
+        open for the user to finish the application. Benchmarks run headless and close it.
+        """
+        self.form_url = form_url or os.getenv("PAN_FORM_URL", PAN_FORM_URL)
+        self.headless = os.getenv("RPA_HEADLESS", "0") == "1" if headless is None else headless
+        self.keep_open = os.getenv("RPA_KEEP_OPEN", "1") == "1" if keep_open is None else keep_open
         # We define options here but instantiate the driver in the specific method
         # to ensure a fresh browser session for every request.
         self.options = webdriver.ChromeOptions()
-        self.options.add_argument("--start-maximized")
-        self.options.add_experimental_option("detach", True)
+        if self.headless:
+            self.options.add_argument("--headless=new")
+            self.options.add_argument("--window-size=1366,900")
+        else:
+            self.options.add_argument("--start-maximized")
+        if self.keep_open:
+            self.options.add_experimental_option("detach", True)
+
+        # Speculative warm-up: one pre-opened form per user, bounded, expired by a reaper thread
+        self.max_reservations = int(os.getenv("RPA_MAX_RESERVATIONS", "2"))
+        self.reservation_ttl = float(os.getenv("RPA_RESERVATION_TTL_SECONDS", "120"))
+        self._reservations = {}
+        self._lock = threading.Lock()
+        self._reaper = None
+
+    def _driver_service(self):
+        # CHROMEDRIVER_PATH skips webdriver_manager's download/version check (offline benchmarks)
+        path = os.getenv("CHROMEDRIVER_PATH")
+        return Service(path) if path else Service(ChromeDriverManager().install())
+
+    @contextmanager
+    def _step(self, steps, name):
+        """
+        Times one bot step into `steps` (ms, returned to the caller) and the rpa.<name> histogram.
+        """
+        start = time.perf_counter()
+        try:
+            with span(f"rpa.{name}"):
+                yield
+        finally:
+            steps[name] = round((time.perf_counter() - start) * 1000, 1)
+
+    # --- SPECULATIVE WARM-UP ---
+    def reserve(self, user, scheme_name, on_done=None):
+        """
+        The next turn is likely "yes": start a browser and open the form in the background.
+        Returns immediately; False when nothing new was started (no automation for the scheme,
+        no room, or the user already has one). on_done() runs once that browser is gone again:
+        discarded, expired, or used by the run that claimed it (main.py frees its RPA slot there).
+        """
+        if not _is_pan(scheme_name):
+            return False
+        with self._lock:
+            if user in self._reservations:
+                return False
+            if len(self._reservations) >= self.max_reservations:
+                RESERVATIONS.inc(outcome="full")
+                return False
+            reservation = Reservation(user, scheme_name, on_done)
+            self._reservations[user] = reservation
+            if self._reaper is None:
+                self._reaper = threading.Thread(target=self._reap, name="rpa-reaper", daemon=True)
+                self._reaper.start()
+        RESERVATIONS.inc(outcome="reserved")
+        threading.Thread(target=self._warm, args=(reservation,), name="rpa-warm", daemon=True).start()
+        return True
+
+    def _warm(self, reservation):
+        driver = None
+        try:
+            driver = self._start_browser(reservation.steps)
+            self._open_pan_form(driver, reservation.steps)
+            log.info("🔥 PAN form pre-opened", extra={"user": reservation.user, "timings": reservation.steps})
+        except Exception as e:
+            log.warning("⚠️ RPA warm-up failed", extra={"user": reservation.user, "error": str(e)})
+            RESERVATIONS.inc(outcome="failed")
+            if driver is not None:
+                driver.quit()
+                driver = None
+        with self._lock:
+            reservation.driver = driver
+            abandoned = reservation.cancelled
+            reservation.ready.set()
+        # Released (or expired) while the browser was still starting
+        if abandoned and driver is not None:
+            driver.quit()
+        if abandoned or driver is None:
+            self._finish(reservation)
+
+    def claim(self, user, scheme_name, timeout=None):
+        """
+        -> the user's Reservation with an open form, or None. Waits (up to `timeout`, default 30s)
+        for a warm-up still in progress: it is already ahead of a cold start.
+        """
+        with self._lock:
+            reservation = self._reservations.pop(user, None)
+        if reservation is None:
+            return None
+        if not _is_pan(scheme_name) or not reservation.ready.wait(timeout or 30):
+            self._discard(reservation, "released")
+            return None
+        if reservation.driver is None:
+            self._finish(reservation)
+            return None
+        RESERVATIONS.inc(outcome="claimed")
+        return reservation
 
-    def apply_for_scheme(self, user_data, scheme_name="generic"):
+    def wait_warm(self, user, timeout=None):
+        """
+        True once the user's reserved form is open (benchmarks time the fill from here).
+        """
+        with self._lock:
+            reservation = self._reservations.get(user)
+        return bool(reservation and reservation.ready.wait(timeout) and reservation.driver is not None)
+
+    def release(self, user, outcome="released"):
+        with self._lock:
+            reservation = self._reservations.pop(user, None)
+        if reservation is not None:
+            self._discard(reservation, outcome)
+
+    def _discard(self, reservation, outcome):
+        with self._lock:
+            reservation.cancelled = True
+            driver, reservation.driver = reservation.driver, None
+            # Still starting: the browser is not gone until _warm has closed it
+            warmed = reservation.ready.is_set()
+        RESERVATIONS.inc(outcome=outcome)
+        if driver is not None:
+            try:
+                driver.quit()
+            except Exception as e:
+                log.warning("⚠️ Could not close reserved browser", extra={"error": str(e)})
+        if warmed:
+            self._finish(reservation)
+
+    def _finish(self, reservation):
+        # Exactly once per reservation, whichever way it ends
+        with self._lock:
+            callback, reservation.on_done = reservation.on_done, None
+        if callback is not None:
+            try:
+                callback()
+            except Exception as e:
+                log.error("❌ Reservation callback failed", extra={"user": reservation.user, "error": str(e)})
+
+    def _reap(self):
+        while True:
+            time.sleep(min(5.0, self.reservation_ttl / 2))
+            now = time.monotonic()
+            with self._lock:
+                expired = [u for u, r in self._reservations.items() if now - r.created > self.reservation_ttl]
+            for user in expired:
+                log.info("⌛ RPA reservation expired", extra={"user": user})
+                self.release(user, outcome="expired")
+
+    def apply_for_scheme(self, user_data, scheme_name="generic", user=None, reservation=None):
         """
         ROUTER: Decides which bot to launch based on the scheme name.
+        `reservation` (already claimed) or `user` picks up a browser reserved for that user.
         """
-        print(f"🤖 RPA Request Received for: {scheme_name}")
+        log.info("🤖 RPA Request Received", extra={"scheme": scheme_name})
         
         # Normalize scheme name safely
         scheme_key = str(scheme_name).lower()
         
-        if "pan" in scheme_key or "permanent account" in scheme_key:
-            return self._apply_for_pan(user_data)
+        if _is_pan(scheme_key):
+            with span("rpa"):
+                if reservation is None and user:
+                    reservation = self.claim(user, scheme_name)
+                try:
+                    return self._apply_for_pan(user_data, reservation)
+                finally:
+                    if reservation is not None:
+                        self._finish(reservation)
         elif "scholarship" in scheme_key:
             return {"status": "skipped", "message": "Scholarship automation is currently in development."}
         else:
             return {"status": "error", "message": f"No automation script found for '{scheme_name}'"}
 
-    def _apply_for_pan(self, user_data):
+    def _apply_for_pan(self, user_data, reservation=None):
         """
         YOUR ROBUST PAN BOT (Protean/NSDL)
+        With a claimed reservation the form is already open and the dropdowns set: fill only.
+        """
+        if reservation is not None:
+            log.info("🤖 RPA: Filling pre-opened PAN form", extra={"user": reservation.user})
+            driver, steps, result = reservation.driver, dict(reservation.steps), None
+        else:
+            log.info("🤖 RPA: Launching PAN Bot with Advanced Logic...")
+            steps, result = {}, None
+            try:
+                driver = self._start_browser(steps)
+            except Exception as e:
+                return {"status": "error", "message": f"Driver Init Failed: {str(e)}", "timings": steps}
+            try:
+                self._open_pan_form(driver, steps)
+            except Exception as e:
+                log.error("❌ RPA Runtime Error", extra={"error": str(e)})
+                result = {"status": "error", "message": str(e)}
+
+        try:
+            result = result or self._fill_pan_form(driver, user_data, steps)
+        finally:
+            if not self.keep_open:
+                driver.quit()
+        result["timings"] = steps
+        result["warm_start"] = reservation is not None
+        return result
+
+    def _start_browser(self, steps):
+        with self._step(steps, "browser_start"):
+            return webdriver.Chrome(service=self._driver_service(), options=self.options)
+
+    def _open_pan_form(self, driver, steps):
+        """
+        Everything before the user's data is needed: page load and the dependent dropdowns.
         """
-        print("🤖 RPA: Launching PAN Bot with Advanced Logic...")
+        # 2. NAVIGATE
+        with self._step(steps, "navigate"):
+            driver.get(self.form_url)
+        wait = WebDriverWait(driver, 20)
+
+        # 3. DROPDOWNS (Application Type, Category, Title)
         try:
-            driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=self.options)
+            with self._step(steps, "dropdowns"):
+                # Wait for dropdowns to appear
+                dropdowns = wait.until(EC.presence_of_all_elements_located((By.TAG_NAME, "select")))
+                if len(dropdowns) >= 3:
+                    # Application Type -> New PAN (Index 1)
+                    Select(dropdowns[0]).select_by_index(1)
+                    time.sleep(1) # Small pause for UI refresh
+                
+                    # Refresh element references
+                    dropdowns = driver.find_elements(By.TAG_NAME, "select")
+                
+                    # Category -> Individual (Index 1)
+                    Select(dropdowns[1]).select_by_index(1)
+                
+                    # Title -> Shri/Mr (Index 1) - Logic can be improved with Gender later
+                    Select(dropdowns[2]).select_by_index(1)
         except Exception as e:
-            return {"status": "error", "message": f"Driver Init Failed: {str(e)}"}
+            log.warning("⚠️ Dropdown Error", extra={"error": str(e)})
 
+    def _fill_pan_form(self, driver, user_data, steps):
         missing_fields = []
 
         try:
@@ -58,114 +303,97 @@ class RPAService:
             mobile = contact.get("mobile", "")
             email = contact.get("email", "")
             
-            print(f"   -> Data: {fname} {lname} | DOB: {dob} | Mob: {mobile}")
-
-            # 2. NAVIGATE
-            url = "https://onlineservices.proteantech.in/paam/endUserRegisterContact.html"
-            driver.get(url)
-            wait = WebDriverWait(driver, 20)
-
-            # 3. DROPDOWNS (Application Type, Category, Title)
-            try:
-                # Wait for dropdowns to appear
-                dropdowns = wait.until(EC.presence_of_all_elements_located((By.TAG_NAME, "select")))
-                if len(dropdowns) >= 3:
-                    # Application Type -> New PAN (Index 1)
-                    Select(dropdowns[0]).select_by_index(1)
-                    time.sleep(1) # Small pause for UI refresh
-                    
-                    # Refresh element references
-                    dropdowns = driver.find_elements(By.TAG_NAME, "select")
-                    
-                    # Category -> Individual (Index 1)
-                    Select(dropdowns[1]).select_by_index(1)
-                    
-                    # Title -> Shri/Mr (Index 1) - Logic can be improved with Gender later
-                    Select(dropdowns[2]).select_by_index(1)
-            except Exception as e:
-                print(f"⚠️ Dropdown Error: {e}")
+            log.info("   -> Data", extra={"first_name": fname, "last_name": lname, "has_dob": bool(dob), "has_mobile": bool(mobile)})
 
             # 4. NAMES
-            print(f"   -> Filling Name: {fname} {lname}")
-            text_inputs = driver.find_elements(By.CSS_SELECTOR, "input[type='text']")
-            if len(text_inputs) >= 2:
-                # Index 0 is often Last Name/Surname
-                text_inputs[0].send_keys(lname)
-                # Index 1 is often First Name
-                text_inputs[1].send_keys(fname)
-                # Index 2 is Middle Name
-                if mname and len(text_inputs) > 2:
-                    text_inputs[2].send_keys(mname)
+            fill_start = time.perf_counter()
+            with self._step(steps, "names"):
+                log.info("   -> Filling Name")
+                text_inputs = driver.find_elements(By.CSS_SELECTOR, "input[type='text']")
+                if len(text_inputs) >= 2:
+                    # Index 0 is often Last Name/Surname
+                    text_inputs[0].send_keys(lname)
+                    # Index 1 is often First Name
+                    text_inputs[1].send_keys(fname)
+                    # Index 2 is Middle Name
+                    if mname and len(text_inputs) > 2:
+                        text_inputs[2].send_keys(mname)
 
             # 5. DOB (YOUR ROBUST FIX)
-            if dob:
-                print(f"   -> Attempting DOB: {dob}")
-                try:
-                    # Try finding by ID then XPath
+            with self._step(steps, "dob"):
+                if dob:
+                    log.info("   -> Attempting DOB")
                     try:
-                        dob_input = driver.find_element(By.ID, "dob")
-                    except:
-                        dob_input = driver.find_element(By.XPATH, "//input[@type='date' or contains(@name, 'dob')]")
+                        # Try finding by ID then XPath
+                        try:
+                            dob_input = driver.find_element(By.ID, "dob")
+                        except:
+                            dob_input = driver.find_element(By.XPATH, "//input[@type='date' or contains(@name, 'dob')]")
 
-                    # ACTION 1: Unlock readonly
-                    driver.execute_script("arguments[0].removeAttribute('readonly');", dob_input)
+                        # ACTION 1: Unlock readonly
+                        driver.execute_script("arguments[0].removeAttribute('readonly');", dob_input)
 
-                    # ACTION 2: Type
-                    dob_input.click()
-                    dob_input.clear()
-                    dob_input.send_keys(dob) 
-                    time.sleep(0.5)
+                        # ACTION 2: Type
+                        dob_input.click()
+                        dob_input.clear()
+                        dob_input.send_keys(dob) 
+                        time.sleep(0.5)
 
-                    # ACTION 3: Close Datepicker Popup
-                    dob_input.send_keys(Keys.TAB)
+                        # ACTION 3: Close Datepicker Popup
+                        dob_input.send_keys(Keys.TAB)
 
-                    # ACTION 4: Verify & Force if needed
-                    current_val = dob_input.get_attribute("value")
-                    if current_val != dob:
-                        print(f"⚠️ Typing failed (Got '{current_val}'). Forcing via JS...")
-                        driver.execute_script(f"arguments[0].value = '{dob}';", dob_input)
+                        # ACTION 4: Verify & Force if needed
+                        current_val = dob_input.get_attribute("value")
+                        if current_val != dob:
+                            log.warning("⚠️ Typing failed. Forcing via JS...", extra={"got": current_val})
+                            driver.execute_script(f"arguments[0].value = '{dob}';", dob_input)
 
-                except Exception as e:
-                    print(f"⚠️ DOB Error: {e}")
+                    except Exception as e:
+                        log.warning("⚠️ DOB Error", extra={"error": str(e)})
+                        missing_fields.append("Date of Birth")
+                else:
                     missing_fields.append("Date of Birth")
-            else:
-                missing_fields.append("Date of Birth")
 
             # 6. EMAIL
-            if email:
-                try:
-                    # Usually ID is 'emailId' on Protean
-                    email_input = driver.find_element(By.ID, "emailId")
-                    email_input.send_keys(email)
-                except:
-                    # Fallback
+            with self._step(steps, "email"):
+                if email:
                     try:
-                        email_input = driver.find_element(By.XPATH, "//input[contains(@name, 'email') or contains(@id, 'email')]")
+                        # Usually ID is 'emailId' on Protean
+                        email_input = driver.find_element(By.ID, "emailId")
                         email_input.send_keys(email)
                     except:
-                        missing_fields.append("Email ID")
-            else:
-                missing_fields.append("Email ID")
+                        # Fallback
+                        try:
+                            email_input = driver.find_element(By.XPATH, "//input[contains(@name, 'email') or contains(@id, 'email')]")
+                            email_input.send_keys(email)
+                        except:
+                            missing_fields.append("Email ID")
+                else:
+                    missing_fields.append("Email ID")
 
             # 7. MOBILE
-            if mobile:
-                print(f"   -> Filling Mobile: {mobile}")
-                try:
-                    # Using the robust XPath
-                    mob_input = driver.find_element(By.XPATH, "//label[contains(translate(., 'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz'), 'mobile number')]/following::input[1]")
-                    mob_input.clear()
-                    mob_input.send_keys(mobile)
-                except:
-                    print("⚠️ Could not locate Mobile field")
+            with self._step(steps, "mobile"):
+                if mobile:
+                    log.info("   -> Filling Mobile")
+                    try:
+                        # Using the robust XPath
+                        mob_input = driver.find_element(By.XPATH, "//label[contains(translate(., 'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz'), 'mobile number')]/following::input[1]")
+                        mob_input.clear()
+                        mob_input.send_keys(mobile)
+                    except:
+                        log.warning("⚠️ Could not locate Mobile field")
+                        missing_fields.append("Mobile Number")
+                else:
                     missing_fields.append("Mobile Number")
-            else:
-                missing_fields.append("Mobile Number")
 
             # 8. CHECKBOX (Consent)
-            try:
-                driver.execute_script("document.querySelector('input[type=\"checkbox\"]').click();")
-            except:
-                pass
+            with self._step(steps, "consent"):
+                try:
+                    driver.execute_script("document.querySelector('input[type=\"checkbox\"]').click();")
+                except:
+                    pass
+
+            record_span("rpa.fill", time.perf_counter() - fill_start)
 
             # 9. REPORT STATUS
             if missing_fields:
@@ -175,5 +403,5 @@ class RPAService:
                 return {"status": "success", "message": "Form opened and pre-filled successfully!"}
 
         except Exception as e:
-            print(f"❌ RPA Runtime Error: {e}")
+            log.error("❌ RPA Runtime Error", extra={"error": str(e)})
             return {"status": "error", "message": str(e)}
\ No newline at end of file
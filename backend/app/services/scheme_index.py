@@ -0,0 +1,135 @@
+"""
+Read-only, memory-mapped copy of the scheme vectors for serving.
+
+    scheme_index/
+        embeddings.npy      float32 [n, dim], L2-normalised (dot product == cosine)
+        text.bin            UTF-8 page_content of every scheme, back to back
+        text_offsets.npy    int64 [n + 1] byte offsets into text.bin
+        meta.bin / meta_offsets.npy   same layout, one JSON metadata object per scheme
+
+Every process that opens the directory maps the same file pages, so forked workers (serve.py)
+share one physical copy instead of each holding Chroma in its heap.
+
+Build it from the Chroma store after ingest:
+    python -m app.services.scheme_index export [chroma_db] [scheme_index]
+"""
+import json
+import os
+import sys
+import numpy as np
+from app.services.log_service import get_logger
+
+log = get_logger(__name__)
+
+DEFAULT_DIR = "scheme_index"
+
+
+def write_blob(directory, name, strings):
+    encoded = [s.encode("utf-8") for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    with open(os.path.join(directory, f"{name}.bin"), "wb") as f:
+        for b in encoded:
+            f.write(b)
+    np.save(os.path.join(directory, f"{name}_offsets.npy"), offsets)
+
+
+def write_index(directory, vectors, texts, metadatas):
+    """
+    Writes into a temp dir and renames it, so readers never see a half-written index.
+    """
+    tmp = directory.rstrip("/") + ".tmp"
+    os.makedirs(tmp, exist_ok=True)
+
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    np.save(os.path.join(tmp, "embeddings.npy"), vectors / np.maximum(norms, 1e-12))
+    write_blob(tmp, "text", texts)
+    write_blob(tmp, "meta", [json.dumps(m or {}, ensure_ascii=False) for m in metadatas])
+
+    if os.path.exists(directory):
+        old = directory.rstrip("/") + ".old"
+        os.replace(directory, old)
+        os.replace(tmp, directory)
+        for name in os.listdir(old):
+            os.remove(os.path.join(old, name))
+        os.rmdir(old)
+    else:
+        os.replace(tmp, directory)
+    log.info("✅ Scheme index written", extra={"dir": directory, "schemes": len(texts)})
+
+
+def export_from_chroma(vector_store, directory=DEFAULT_DIR):
+    data = vector_store.get(include=["embeddings", "documents", "metadatas"])
+    write_index(directory, data["embeddings"], data["documents"], data["metadatas"])
+    return len(data["documents"])
+
+
+class SchemeIndex:
+    """
+    Brute-force cosine search over the mapped matrix (a few thousand schemes: one GEMV).
+    Nothing is copied into the process heap except the k hits that are returned.
+    """
+    def __init__(self, directory=DEFAULT_DIR):
+        self.directory = directory
+        self.vectors = np.load(os.path.join(directory, "embeddings.npy"), mmap_mode="r")
+        self._text = np.memmap(os.path.join(directory, "text.bin"), dtype=np.uint8, mode="r")
+        self._text_offsets = np.load(os.path.join(directory, "text_offsets.npy"), mmap_mode="r")
+        self._meta = np.memmap(os.path.join(directory, "meta.bin"), dtype=np.uint8, mode="r")
+        self._meta_offsets = np.load(os.path.join(directory, "meta_offsets.npy"), mmap_mode="r")
+
+    def __len__(self):
+        return self.vectors.shape[0]
+
+    def _slice(self, blob, offsets, i):
+        return blob[offsets[i]:offsets[i + 1]].tobytes().decode("utf-8")
+
+    def text(self, i):
+        return self._slice(self._text, self._text_offsets, i)
+
+    def metadata(self, i):
+        return json.loads(self._slice(self._meta, self._meta_offsets, i))
+
+    def search(self, query_vector, k=4):
+        """
+        Returns [(row, score)] best first.
+        """
+        q = np.asarray(query_vector, dtype=np.float32)
+        q = q / max(float(np.linalg.norm(q)), 1e-12)
+        scores = self.vectors @ q
+        k = min(k, len(scores))
+        if k == 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(i), float(scores[i])) for i in top]
+
+    def search_many(self, query_vectors, k=4):
+        """
+        One matrix product for a batch of queries -> [[(row, score)] best first] per query.
+        """
+        q = np.asarray(query_vectors, dtype=np.float32)
+        if q.ndim != 2 or not len(q):
+            return []
+        q = q / np.maximum(np.linalg.norm(q, axis=1, keepdims=True), 1e-12)
+        scores = self.vectors @ q.T
+        k = min(k, scores.shape[0])
+        if k == 0:
+            return [[] for _ in range(len(q))]
+        top = np.argpartition(-scores, k - 1, axis=0)[:k]
+        results = []
+        for j in range(len(q)):
+            column = top[:, j][np.argsort(-scores[top[:, j], j])]
+            results.append([(int(i), float(scores[i, j])) for i in column])
+        return results
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] != "export":
+        print("Usage: python -m app.services.scheme_index export [chroma_db] [scheme_index]")
+        sys.exit(1)
+    from langchain_chroma import Chroma
+    source = sys.argv[2] if len(sys.argv) > 2 else "chroma_db"
+    target = sys.argv[3] if len(sys.argv) > 3 else DEFAULT_DIR
+    count = export_from_chroma(Chroma(persist_directory=source), target)
+    print(f"✅ Exported {count} schemes from '{source}' to '{target}'.")
@@ -0,0 +1,178 @@
+"""
+Server-side chat sessions: the client sends only the new message plus a session_id.
+
+Each session keeps the last SESSION_MAX_TURNS turns verbatim; older turns are folded into a
+short rolling summary as they fall out, so the prompt history stays the same size no matter
+how long the conversation runs.
+
+    SESSION_STORE=memory | file      (file = shared by the workers of serve.py)
+    SESSION_DIR=sessions             (file store only)
+    SESSION_TTL_SECONDS=1800
+    SESSION_MAX_TURNS=6
+    SESSION_SUMMARY_CHARS=600
+"""
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from app.services.log_service import get_logger
+
+log = get_logger(__name__)
+
+_SESSION_ID = re.compile(r"^[A-Za-z0-9_-]{8,64}$")
+
+
+class MemorySessionStore:
+    """
+    LRU of sessions in this process; expired entries are dropped on access.
+    """
+    def __init__(self, ttl_seconds=1800, max_sessions=10_000):
+        self.ttl = ttl_seconds
+        self.max_sessions = max_sessions
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _evict(self, now):
+        # Oldest-touched first, so we can stop at the first live one
+        while self._sessions:
+            sid, session = next(iter(self._sessions.items()))
+            if now - session["last_seen"] < self.ttl and len(self._sessions) <= self.max_sessions:
+                break
+            del self._sessions[sid]
+
+    def get(self, session_id):
+        now = time.time()
+        with self._lock:
+            self._evict(now)
+            session = self._sessions.get(session_id)
+            if session is not None:
+                self._sessions.move_to_end(session_id)
+            return session
+
+    def save(self, session):
+        with self._lock:
+            self._sessions[session["id"]] = session
+            self._sessions.move_to_end(session["id"])
+            self._evict(time.time())
+
+
+class FileSessionStore:
+    """
+    One small JSON file per session; expiry by file mtime, swept every `sweep_every` saves.
+    """
+    def __init__(self, directory="sessions", ttl_seconds=1800, sweep_every=100):
+        self.directory = directory
+        self.ttl = ttl_seconds
+        self.sweep_every = sweep_every
+        self._saves = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, session_id):
+        return os.path.join(self.directory, f"{session_id}.json")
+
+    def get(self, session_id):
+        path = self._path(session_id)
+        try:
+            if time.time() - os.path.getmtime(path) >= self.ttl:
+                os.remove(path)
+                return None
+            with open(path, "r") as f:
+                session = json.load(f)
+        except (OSError, ValueError):
+            return None
+        session["turns"] = deque(session["turns"], maxlen=session["max_turns"])
+        return session
+
+    def save(self, session):
+        data = dict(session, turns=list(session["turns"]))
+        tmp = self._path(session["id"]) + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp, self._path(session["id"]))
+
+        self._saves += 1
+        if self._saves % self.sweep_every == 0:
+            self._sweep()
+
+    def _sweep(self):
+        cutoff = time.time() - self.ttl
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except OSError:
+                pass
+
+
+class SessionService:
+    def __init__(self, store=None, max_turns=None, summary_chars=None):
+        ttl = int(os.getenv("SESSION_TTL_SECONDS", "1800"))
+        if store is None:
+            if os.getenv("SESSION_STORE", "memory") == "file":
+                store = FileSessionStore(os.getenv("SESSION_DIR", "sessions"), ttl_seconds=ttl)
+            else:
+                store = MemorySessionStore(ttl_seconds=ttl)
+        self.store = store
+        self.max_turns = max_turns or int(os.getenv("SESSION_MAX_TURNS", "6"))
+        self.summary_chars = summary_chars or int(os.getenv("SESSION_SUMMARY_CHARS", "600"))
+
+    def get_or_create(self, session_id, user_name):
+        """
+        Unknown, expired or malformed ids (or another user's id) start a fresh session.
+        """
+        if session_id and _SESSION_ID.match(session_id):
+            session = self.store.get(session_id)
+            if session is not None and session["user"] == user_name:
+                return session
+        return {
+            "id": uuid.uuid4().hex,
+            "user": user_name,
+            "max_turns": self.max_turns,
+            "turns": deque(maxlen=self.max_turns),
+            "summary": "",
+            "summarized_turns": 0,
+            "created": time.time(),
+            "last_seen": time.time(),
+        }
+
+    def prompt_history(self, session):
+        """
+        Same shape as the old client-side history list: ["User: ...", "AI: ..."].
+        """
+        lines = []
+        if session["summary"]:
+            lines.append(f"Summary of earlier conversation ({session['summarized_turns']} turns): {session['summary']}")
+        for user_text, ai_text in session["turns"]:
+            lines.append(f"User: {user_text}")
+            lines.append(f"AI: {ai_text}")
+        return lines
+
+    def record_turn(self, session, user_text, ai_text):
+        turns = session["turns"]
+        if len(turns) == turns.maxlen:
+            self._fold_into_summary(session, turns[0])
+        turns.append((user_text, ai_text))
+        session["last_seen"] = time.time()
+        self.store.save(session)
+
+    def _fold_into_summary(self, session, turn):
+        """
+        Incremental and LLM-free: one clipped line per evicted turn, oldest lines dropped past the budget.
+        """
+        user_text, ai_text = turn
+        line = f"user: {_clip(user_text, 120)} / ai: {_clip(ai_text, 80)}"
+        summary = f"{session['summary']} | {line}" if session["summary"] else line
+        if len(summary) > self.summary_chars:
+            summary = summary[-self.summary_chars:]
+            summary = summary[summary.find(" | ") + 3:] if " | " in summary else summary
+        session["summary"] = summary
+        session["summarized_turns"] += 1
+
+
+def _clip(text, limit):
+    text = " ".join(str(text).split())
+    return text if len(text) <= limit else text[:limit - 1] + "…"
@@ -0,0 +1,118 @@
+"""
+Request-scoped unit of work over DataService user records.
+
+One chat turn reads the user for the prompt, may merge fields the LLM extracted, and reads the
+view again for readiness / RPA. Through a UnitOfWork that is one store read per user (first
+access) and at most one write (commit) per turn; reads after an update see the pending change.
+
+    uow = UnitOfWork(data_store)
+    record = uow.get_user_data("asha")
+    uow.update_user_data("asha", {"standardized_data": {"mobile": "9876543210"}})
+    uow.get_rpa_payload("asha")      # already includes the new mobile
+    uow.commit()                     # re-merged once if another request wrote "asha" meanwhile
+
+Exposes the read/update subset of DataService it replaces, so services take either.
+"""
+import copy
+# VersionConflict is re-exported for callers of commit
+from app.services.data_service import VersionConflict, view_ready, view_missing, view_rpa_payload
+from app.services.log_service import get_logger
+
+log = get_logger(__name__)
+
+
+class UnitOfWork:
+    def __init__(self, store):
+        self.store = store
+        self._records = {}   # key -> record as this request sees it (None: no such user)
+        self._versions = {}  # key -> version when first read
+        self._updates = {}   # key -> update_user_data payloads not yet committed, in order
+
+    @staticmethod
+    def _key(primary_key):
+        return (primary_key or "").strip().lower()
+
+    def _load(self, key):
+        if key not in self._records:
+            # merge_record works on a copy: this stays the record as read
+            record = self.store.get_user_data(key) or None
+            self._records[key] = record
+            self._versions[key] = (record or {}).get("version", 0)
+        return self._records[key]
+
+    def get_user_data(self, primary_key):
+        key = self._key(primary_key)
+        if not key or key.startswith("__"):
+            return {}
+        return self._load(key) or {}
+
+    def update_user_data(self, primary_key, new_data):
+        key = self._key(primary_key)
+        if not key or key.startswith("__"):
+            return {}
+        self._records[key] = self.store.merge_record(key, self._load(key), new_data)
+        self._updates.setdefault(key, []).append(new_data)
+        return self._records[key]
+
+    def get_application_view(self, primary_key):
+        if not primary_key:
+            return {}
+        return self.store.record_view(self.get_user_data(primary_key))
+
+    def is_ready(self, primary_key, scheme):
+        return view_ready(self.get_application_view(primary_key), scheme)
+
+    def missing_fields(self, primary_key, scheme):
+        return view_missing(self.get_application_view(primary_key), scheme)
+
+    def get_rpa_payload(self, primary_key):
+        return view_rpa_payload(self.get_application_view(primary_key))
+
+    def snapshot(self):
+        """
+        A read-only copy of what this unit of work sees now (pending updates included), for
+        readers on other threads while commit runs in the background.
+        """
+        frozen = UnitOfWork(self.store)
+        frozen._records = copy.deepcopy(self._records)
+        frozen._versions = dict(self._versions)
+        return frozen
+
+    @property
+    def dirty(self):
+        return bool(self._updates)
+
+    def commit(self, retries=1):
+        """
+        Writes every changed record in one save, if none of them changed in the store since it
+        was read here. On a conflict the changed users are re-read and the same payloads merged
+        again (they are plain field/document merges, safe to re-apply), up to `retries` times;
+        after that VersionConflict propagates and nothing is written. No-op when clean.
+        """
+        if not self._updates:
+            return
+        while True:
+            try:
+                written = self.store.commit(
+                    {key: self._records[key] for key in self._updates},
+                    expected_versions={key: self._versions[key] for key in self._updates},
+                )
+                break
+            except VersionConflict as conflict:
+                if retries <= 0:
+                    raise
+                retries -= 1
+                log.info("🔁 Re-merging after concurrent update", extra={"user": conflict.key})
+                self._remerge()
+        self._records.update(written)
+        for key, record in written.items():
+            self._versions[key] = record["version"]
+        self._updates.clear()
+
+    def _remerge(self):
+        for key, payloads in self._updates.items():
+            record = self.store.get_user_data(key) or None
+            self._versions[key] = (record or {}).get("version", 0)
+            for new_data in payloads:
+                record = self.store.merge_record(key, record, new_data)
+            self._records[key] = record
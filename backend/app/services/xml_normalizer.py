@@ -0,0 +1,184 @@
+import io
+import json
+import os
+import xml.etree.ElementTree as ET
+from collections import OrderedDict
+from app.services.metrics import span, CACHE_HITS, CACHE_MISSES
+from app.services.log_service import get_logger
+
+log = get_logger(__name__)
+
+# --- PER-DOCTYPE MAPPINGS ---
+# "fields": path (relative to the root, "@attr" for attributes) -> [section, field, transform]
+#           section is "standardized" (profile) or "specific" (document record)
+# "repeat": path of a repeated element -> {"key_attr": attribute used as key, "target": specific_data field}
+# "compose": standardized field built by joining other extracted fields
+# More doctypes can be added without code changes via DIGILOCKER_MAPPINGS_FILE (same JSON shape).
+DOCTYPE_MAPPINGS = {
+    "HSCM": {
+        "document_type": "Class XII Marksheet",
+        "root": "Certificate",
+        "fields": {
+            "@name": ["specific", "certificate_name", None],
+            "StudentDetails/Name": ["standardized", "full_name", None],
+            "StudentDetails/DOB": ["standardized", "dob", "dob"],
+            "StudentDetails/RollNo": ["standardized", "id_number", None],
+            "FinalResult": ["specific", "result", None],
+        },
+        "repeat": {
+            "Marks/Subject": {"key_attr": "name", "target": "marks"},
+        },
+    },
+    "ADHAR": {
+        "document_type": "Aadhaar Card",
+        "root": "KycRes",
+        "fields": {
+            "UidData@uid": ["standardized", "uid", None],
+            "UidData/Poi@name": ["standardized", "full_name", None],
+            "UidData/Poi@dob": ["standardized", "dob", "dob"],
+            "UidData/Poi@gender": ["standardized", "gender", "gender"],
+            "UidData/Poa@co": ["specific", "care_of", None],
+            "UidData/Poa@house": ["specific", "house", None],
+            "UidData/Poa@dist": ["standardized", "district", None],
+            "UidData/Poa@state": ["standardized", "state", None],
+            "UidData/Poa@pc": ["standardized", "pincode", None],
+        },
+        "compose": {
+            "address": ["house", "district", "state", "pincode"],
+        },
+    },
+}
+
+TRANSFORMS = {
+    "dob": lambda v: v.replace("-", "/").replace(".", "/"),  # 31-07-2005 -> 31/07/2005 (same as OCR)
+    "gender": lambda v: {"M": "Male", "F": "Female", "T": "Transgender"}.get(v.upper(), v),
+}
+
+
+def load_mappings():
+    mappings = dict(DOCTYPE_MAPPINGS)
+    path = os.getenv("DIGILOCKER_MAPPINGS_FILE")
+    if path and os.path.exists(path):
+        with open(path, "r") as f:
+            mappings.update(json.load(f))
+    return mappings
+
+
+class DigiLockerXMLNormalizer:
+    """
+    Streams DigiLocker XML (iterparse) into the {"document_type", "standardized_data", "specific_data"}
+    shape that DataService.update_user_data expects. No LLM involved.
+    Elements are cleared as soon as they are consumed, so memory stays flat for large bundles.
+    """
+    def __init__(self, mappings=None, cache_size=512):
+        self.mappings = mappings or load_mappings()
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._root_to_doctype = {m.get("root"): d for d, m in self.mappings.items() if m.get("root")}
+
+    # --- CACHE (keyed by URI + version, e.g. the issued-doc date) ---
+    def get_cached(self, uri, version):
+        entry = self._cache.get((uri, version))
+        if entry is not None:
+            self._cache.move_to_end((uri, version))
+        return entry
+
+    def _remember(self, uri, version, parsed):
+        self._cache[(uri, version)] = parsed
+        self._cache.move_to_end((uri, version))
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def normalize(self, source, doctype=None, uri=None, version=None):
+        """
+        source: XML str/bytes or a binary file-like object (e.g. a streamed HTTP body).
+        """
+        if uri is not None:
+            cached = self.get_cached(uri, version)
+            if cached is not None:
+                CACHE_HITS.inc(cache="digilocker_xml")
+                return cached
+            CACHE_MISSES.inc(cache="digilocker_xml")
+
+        if isinstance(source, str):
+            source = io.BytesIO(source.strip().encode("utf-8"))
+        elif isinstance(source, bytes):
+            source = io.BytesIO(source.strip())
+
+        with span("digilocker.parse"):
+            parsed = self._parse(source, doctype)
+        if uri is not None and parsed.get("document_type") != "Unknown":
+            self._remember(uri, version, parsed)
+        return parsed
+
+    def _parse(self, stream, doctype):
+        mapping = self.mappings.get(doctype) if doctype else None
+        fields, repeats = {}, {}
+        values = {}
+        standardized, specific = {}, {}
+        stack = []
+        root = None
+
+        try:
+            for event, elem in ET.iterparse(stream, events=("start", "end")):
+                if event == "start":
+                    stack.append(elem.tag)
+                    if root is None:
+                        root = elem
+                        # Detect doctype from the root tag when the caller did not know it
+                        if mapping is None:
+                            doctype = self._root_to_doctype.get(elem.tag)
+                            mapping = self.mappings.get(doctype)
+                        if mapping is None:
+                            break
+                        fields = mapping.get("fields", {})
+                        repeats = mapping.get("repeat", {})
+                        self._apply_attrs("", elem, fields, values, standardized, specific)
+                    continue
+
+                path = "/".join(stack[1:])
+                if path:
+                    self._apply_attrs(path, elem, fields, values, standardized, specific)
+                    if path in fields and elem.text and elem.text.strip():
+                        self._store(fields[path], elem.text.strip(), values, standardized, specific)
+                    if path in repeats:
+                        rule = repeats[path]
+                        key = elem.get(rule["key_attr"]) or f"item_{len(specific.get(rule['target'], {}))}"
+                        specific.setdefault(rule["target"], {})[key] = (elem.text or "").strip()
+
+                stack.pop()
+                elem.clear()
+                # Drop consumed top-level children so the tree never grows
+                if len(stack) == 1 and root is not None:
+                    root.clear()
+        except ET.ParseError as e:
+            log.error("❌ XML Parse Error", extra={"doctype": doctype, "error": str(e)})
+            return {"document_type": "Unknown", "standardized_data": {}, "specific_data": {}, "error": str(e)}
+
+        if mapping is None:
+            return {"document_type": "Unknown", "standardized_data": {}, "specific_data": {}}
+
+        for target, parts in mapping.get("compose", {}).items():
+            joined = ", ".join(values[p] for p in parts if values.get(p))
+            if joined:
+                standardized[target] = joined
+
+        return {
+            "document_type": mapping.get("document_type", doctype),
+            "doctype": doctype,
+            "standardized_data": standardized,
+            "specific_data": specific,
+        }
+
+    def _apply_attrs(self, path, elem, fields, values, standardized, specific):
+        for attr, value in elem.attrib.items():
+            rule = fields.get(f"{path}@{attr}")
+            if rule and value.strip():
+                self._store(rule, value.strip(), values, standardized, specific)
+
+    def _store(self, rule, value, values, standardized, specific):
+        section, field, transform = (list(rule) + [None])[:3]
+        if transform in TRANSFORMS:
+            value = TRANSFORMS[transform](value)
+        values[field] = value
+        (standardized if section == "standardized" else specific)[field] = value
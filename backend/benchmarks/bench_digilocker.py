@@ -0,0 +1,85 @@
+"""
+DigiLocker onboarding load test (fully offline).
+
+Compares the old sequential pattern (list, then one XML call per URI) with
+AsyncDigiLockerClient.onboard (parallel listing + concurrent XML fetch),
+for many users onboarding at the same time.
+
+Usage (from backend/):
+    python -m benchmarks.bench_digilocker --users 50 --latency-ms 80 --extra-docs 6
+    # or against a stand-in started with: uvicorn app.routers.digilocker_mock:mock_app --port 8100
+    python -m benchmarks.bench_digilocker --base-url http://127.0.0.1:8100
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+
+from app.services.digilocker_client import AsyncDigiLockerClient
+
+
+async def sequential_onboard(client, code):
+    token_data = await client.get_access_token(code)
+    token = token_data["access_token"]
+    await client.get_user_details(token)
+    listing = await client.get_issued_documents(token)
+    return [await client.get_file_xml(item["uri"], token) for item in listing.get("items", [])]
+
+
+async def run_mode(client, mode, users):
+    async def one_user():
+        start = time.perf_counter()
+        if mode == "sequential":
+            await sequential_onboard(client, "mock_auth_code")
+        else:
+            await client.onboard("mock_auth_code")
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    latencies = await asyncio.gather(*(one_user() for _ in range(users)))
+    wall = time.perf_counter() - start
+    latencies = sorted(latencies)
+    return {
+        "mode": mode,
+        "users": users,
+        "wall_s": wall,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": latencies[int(0.95 * (len(latencies) - 1))] * 1000,
+        "users_per_s": users / wall,
+    }
+
+
+async def main(args):
+    os.environ["DIGILOCKER_MOCK_LATENCY_MS"] = str(args.latency_ms)
+    os.environ["DIGILOCKER_MOCK_EXTRA_DOCS"] = str(args.extra_docs)
+    client = AsyncDigiLockerClient(base_url=args.base_url, concurrency=args.concurrency)
+
+    results = []
+    try:
+        for mode in ("sequential", "concurrent"):
+            r = await run_mode(client, mode, args.users)
+            results.append(r)
+            print(f"{mode:11} users={r['users']:<4} wall={r['wall_s']:.2f}s "
+                  f"p50={r['p50_ms']:.0f}ms p95={r['p95_ms']:.0f}ms ({r['users_per_s']:.1f} users/s)")
+    finally:
+        await client.aclose()
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="DigiLocker onboarding load test")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--extra-docs", type=int, default=4)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--base-url", default=None)
+    parser.add_argument("--out", default="benchmarks/results/digilocker.json")
+    args = parser.parse_args()
+
+    results = asyncio.run(main(args))
+    os.makedirs(os.path.dirname(args.out), exist_ok=True)
+    with open(args.out, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"✅ Saved to {args.out}")
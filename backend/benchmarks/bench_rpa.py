@@ -0,0 +1,157 @@
+"""
+RPA throughput benchmark against the local PAN form replica (benchmarks/pan_form_stub.py).
+
+Runs N applications through the real RPAService code path (headless Chrome, closed after
+each run), `--concurrency` at a time, and reports per-step timings (browser start, navigate,
+dropdowns, names, dob, email, mobile, consent), success rate, applications per minute and
+peak browser memory (RSS of every chromedriver / Chrome process under this one).
+
+Usage (from backend/):
+    python -m benchmarks.bench_rpa --applications 20 --concurrency 4
+    python -m benchmarks.bench_rpa --dropdown-delay-ms 800 --page-delay-ms 500   # a slow day on the live site
+    python -m benchmarks.bench_rpa --warm      # form pre-opened by RPAService.reserve: time from "yes" only
+    CHROMEDRIVER_PATH=/usr/bin/chromedriver python -m benchmarks.bench_rpa      # fully offline
+"""
+import argparse
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.common import percentiles, save_results
+from benchmarks.pan_form_stub import start_pan_form_server
+from app.services.rpa_service import RPAService
+
+STEPS = ("browser_start", "navigate", "dropdowns", "names", "dob", "email", "mobile", "consent")
+
+
+def sample_user(i):
+    return {
+        "personal_details": {"first_name": f"Bench{i}", "middle_name": "", "last_name": "User", "dob": "15/08/1999"},
+        "contact_details": {"mobile": f"98{i:08d}"[:10], "email": f"bench{i}@example.com"},
+    }
+
+
+def _children():
+    by_parent = {}
+    for pid in os.listdir("/proc"):
+        if not pid.isdigit():
+            continue
+        try:
+            with open(f"/proc/{pid}/stat") as f:
+                # Field 4 is the parent pid; the command name (field 2) may contain spaces
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        by_parent.setdefault(ppid, []).append(int(pid))
+    return by_parent
+
+
+def descendants_rss_kb(root=None):
+    by_parent = _children()
+    stack, total = list(by_parent.get(root or os.getpid(), [])), 0
+    while stack:
+        pid = stack.pop()
+        stack.extend(by_parent.get(pid, []))
+        try:
+            with open(f"/proc/{pid}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        total += int(line.split()[1])
+        except OSError:
+            continue
+    return total
+
+
+class MemorySampler(threading.Thread):
+    """Polls the RSS of all child processes (the browsers) and keeps the peak."""
+    def __init__(self, interval=0.1):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.peak_kb = 0
+        self._done = threading.Event()
+
+    def run(self):
+        while not self._done.is_set():
+            self.peak_kb = max(self.peak_kb, descendants_rss_kb())
+            self._done.wait(self.interval)
+
+    def stop(self):
+        self._done.set()
+        self.join()
+
+
+def run(args, form_url):
+    rpa = RPAService(form_url=form_url, headless=not args.headed, keep_open=False)
+    rpa.max_reservations = args.concurrency
+
+    def one(i):
+        user = f"bench{i}" if args.warm else None
+        if user:
+            rpa.reserve(user, "PAN Card")
+            rpa.wait_warm(user, timeout=60)
+        start = time.perf_counter()
+        result = rpa.apply_for_scheme(sample_user(i), scheme_name="PAN Card", user=user)
+        return time.perf_counter() - start, result
+
+    sampler = MemorySampler()
+    sampler.start()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        outcomes = list(pool.map(one, range(args.applications)))
+    wall = time.perf_counter() - start
+    sampler.stop()
+
+    ok = [r for _, r in outcomes if r.get("status") == "success"]
+    failures = {}
+    for _, r in outcomes:
+        if r.get("status") != "success":
+            key = f"{r.get('status')}: {r.get('message', '')[:80]}"
+            failures[key] = failures.get(key, 0) + 1
+    return {
+        "applications": args.applications,
+        "concurrency": args.concurrency,
+        "warm": args.warm,
+        "warm_starts": sum(1 for _, r in outcomes if r.get("warm_start")),
+        "wall_s": round(wall, 2),
+        "success_rate": round(len(ok) / max(len(outcomes), 1), 3),
+        "applications_per_min": round(len(outcomes) / wall * 60, 2),
+        "latency": percentiles([seconds for seconds, _ in outcomes]),
+        "steps": {
+            step: percentiles([r["timings"][step] / 1000 for _, r in outcomes if step in r.get("timings", {})])
+            for step in STEPS
+        },
+        "peak_browser_mb": round(sampler.peak_kb / 1024, 1),
+        "failures": failures,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="PAN RPA throughput against the local form replica")
+    parser.add_argument("--applications", type=int, default=8)
+    parser.add_argument("--concurrency", type=int, default=2)
+    parser.add_argument("--page-delay-ms", type=float, default=150)
+    parser.add_argument("--script-delay-ms", type=float, default=100)
+    parser.add_argument("--dropdown-delay-ms", type=float, default=300)
+    parser.add_argument("--form-url", default=None, help="use another form (e.g. a stub on another host)")
+    parser.add_argument("--headed", action="store_true", help="show the browsers")
+    parser.add_argument("--warm", action="store_true", help="reserve each browser first, time the fill only")
+    parser.add_argument("--out", default=None)
+    args = parser.parse_args()
+
+    os.environ["PAN_FORM_PAGE_DELAY_MS"] = str(args.page_delay_ms)
+    os.environ["PAN_FORM_SCRIPT_DELAY_MS"] = str(args.script_delay_ms)
+    os.environ["PAN_FORM_DROPDOWN_DELAY_MS"] = str(args.dropdown_delay_ms)
+    form_url = args.form_url or start_pan_form_server()
+
+    results = run(args, form_url)
+    print(f"applications={results['applications']} concurrency={results['concurrency']} warm={results['warm_starts']} "
+          f"success={results['success_rate']:.0%} throughput={results['applications_per_min']}/min "
+          f"p50={results['latency']['p50_ms']}ms peak_browser={results['peak_browser_mb']}MB")
+    for step in STEPS:
+        print(f"  {step:14} p50={results['steps'][step]['p50_ms']}ms p95={results['steps'][step]['p95_ms']}ms")
+    for failure, count in results["failures"].items():
+        print(f"  ❌ {count}x {failure}")
+
+    path = save_results("rpa", {"config": vars(args), "form_url": form_url, **results}, out=args.out)
+    print(f"\n✅ Saved to {path}")
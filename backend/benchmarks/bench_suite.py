@@ -0,0 +1,210 @@
+"""
+End-to-end load and latency benchmark, fully offline.
+
+- Starts the deterministic LLM stub (benchmarks/llm_stub.py) and points Groq at it.
+- Loads the FastAPI app in-process on a throwaway copy of user_db.json.
+- Stubs the RPA browser with a fixed delay.
+- Drives /api/chat at the requested concurrency and reports p50/p95/p99 and throughput,
+  overall and per stage (read back from each response's Server-Timing header).
+- Runs micro-benchmarks for DataService, retrieval and ingestion (embedding).
+
+Needs the MiniLM model in the local Hugging Face cache (no download is attempted).
+
+Usage (from backend/):
+    python -m benchmarks.bench_suite --requests 200 --concurrency 8 --llm-latency-ms 300
+"""
+import argparse
+import asyncio
+import os
+import shutil
+import tempfile
+import time
+
+from benchmarks.common import percentiles, timed, save_results
+from benchmarks.llm_stub import start_stub_server
+
+QUERIES = [
+    "Are there any scholarships for a class XII student with good marks?",
+    "I want to apply for a PAN card",
+    "Yes, proceed",
+    "Schemes for small farmers in Tamil Nadu",
+    "What documents do I need for the post matric scholarship?",
+]
+USER_NAME = "Remy Baastin Rayappan"
+
+
+def parse_server_timing(header):
+    """
+    "llm;dur=800.0, store;dur=3.0" -> {"llm": 0.8, "store": 0.003} (seconds)
+    """
+    stages = {}
+    for part in filter(None, (p.strip() for p in (header or "").split(","))):
+        name, _, params = part.partition(";")
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "dur":
+                stages[name] = float(value) / 1000
+    return stages
+
+
+def setup_environment(args):
+    base_url = start_stub_server()
+    os.environ["GROQ_BASE_URL"] = base_url
+    os.environ["GROQ_API_BASE"] = base_url
+    os.environ.setdefault("GROQ_API_KEY", "stub-key")
+    os.environ["LLM_STUB_LATENCY_MS"] = str(args.llm_latency_ms)
+    os.environ["LLM_STUB_JITTER_MS"] = str(args.llm_jitter_ms)
+    os.environ.setdefault("HF_HUB_OFFLINE", "1")
+    os.environ.setdefault("TRANSFORMERS_OFFLINE", "1")
+
+    # Never touch the real user store
+    from app.services import data_service
+    workdir = tempfile.mkdtemp(prefix="sevai_bench_")
+    db_copy = os.path.join(workdir, "user_db.json")
+    if os.path.exists(data_service.DB_FILE):
+        shutil.copy(data_service.DB_FILE, db_copy)
+    data_service.DB_FILE = db_copy
+    return workdir
+
+
+def load_app(args):
+    import main
+    from app.services.metrics import span
+
+    def fake_rpa(user_data, scheme_name="generic", user=None, reservation=None):
+        with span("rpa"):
+            time.sleep(args.rpa_latency_ms / 1000)
+        return {"status": "success", "message": "RPA stubbed for benchmark."}
+
+    main.rpa_engine.apply_for_scheme = fake_rpa
+    # No speculative Chrome either
+    main.rpa_engine.reserve = lambda user, scheme_name, on_done=None: False
+    main.rpa_engine.release = lambda user, outcome="released": None
+    return main
+
+
+async def drive_chat(main, args):
+    import httpx
+
+    semaphore = asyncio.Semaphore(args.concurrency)
+    totals, per_stage, errors = [], {}, 0
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app),
+                                 base_url="http://bench", timeout=120) as client:
+        async def one(i):
+            nonlocal errors
+            async with semaphore:
+                stages = {}
+                start = time.perf_counter()
+                try:
+                    response = await client.post("/api/chat", json={
+                        "user_profile": {"name": USER_NAME},
+                        "query": QUERIES[i % len(QUERIES)],
+                        "history": []
+                    })
+                    if response.status_code != 200:
+                        errors += 1
+                    stages = parse_server_timing(response.headers.get("server-timing"))
+                    stages.pop("total", None)
+                except Exception:
+                    errors += 1
+                finally:
+                    totals.append(time.perf_counter() - start)
+                for stage, seconds in stages.items():
+                    per_stage.setdefault(stage, []).append(seconds)
+
+        # Warm-up (model/index first touch) is not measured
+        await client.post("/api/chat", json={"user_profile": {"name": USER_NAME}, "query": "hello", "history": []})
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(args.requests)))
+        wall = time.perf_counter() - start
+
+    return {
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "errors": errors,
+        "wall_s": round(wall, 3),
+        "throughput_rps": round(args.requests / wall, 2),
+        "latency": percentiles(totals),
+        "stages": {stage: {"calls": len(v), **percentiles(v)} for stage, v in per_stage.items()},
+    }
+
+
+def micro_benchmarks(main, args):
+    from app.services.data_service import DataService
+
+    results = {}
+
+    # 1. DataService on a synthetic population
+    store = DataService()
+    for n in range(args.users):
+        store.update_user_data(f"Bench User {n}", {
+            "document_type": "Marks Sheet",
+            "standardized_data": {"full_name": f"Bench User {n}", "mobile": f"9{n:09d}", "dob": "01/01/2005"},
+            "specific_data": {"Physics": n % 100, "Total": 400 + n % 100}
+        })
+    results["data_service"] = {
+        "users": args.users,
+        "update_user_data": percentiles(timed(lambda: store.update_user_data(
+            "Bench User 1", {"standardized_data": {"email": "bench@example.com"}}), args.micro_repeat)),
+        "get_user_data": percentiles(timed(lambda: store.get_user_data("Bench User 1"), args.micro_repeat)),
+        "get_application_view": percentiles(
+            timed(lambda: store.get_application_view("Bench User 1"), args.micro_repeat)),
+    }
+
+    # 2. Retrieval (embedding the query + vector search)
+    rag = main.rag_engine
+    if rag.has_index():
+        queries = iter(QUERIES * args.micro_repeat)
+        results["retrieval"] = percentiles(timed(lambda: rag._search_schemes(next(queries)), args.micro_repeat))
+    else:
+        results["retrieval"] = "skipped (no scheme index)"
+
+    # 3. Ingestion throughput (embedding cost dominates)
+    texts = [f"Scheme Name: Bench Scheme {i}\nDetails: Financial assistance for students of class {i % 12}. " * 4
+             for i in range(args.ingest_docs)]
+    start = time.perf_counter()
+    rag.embeddings.embed_documents(texts)
+    elapsed = time.perf_counter() - start
+    results["ingestion"] = {"docs": len(texts), "seconds": round(elapsed, 3), "docs_per_s": round(len(texts) / elapsed, 1)}
+    return results
+
+
+def print_report(e2e, micro):
+    lat = e2e["latency"]
+    print(f"\n/api/chat  {e2e['requests']} req @ {e2e['concurrency']}  "
+          f"p50={lat['p50_ms']}ms p95={lat['p95_ms']}ms p99={lat['p99_ms']}ms  "
+          f"{e2e['throughput_rps']} req/s  errors={e2e['errors']}")
+    for stage, s in e2e["stages"].items():
+        print(f"  {stage:10} calls={s['calls']:<5} p50={s['p50_ms']}ms p95={s['p95_ms']}ms p99={s['p99_ms']}ms")
+    ds = micro["data_service"]
+    print(f"\nDataService ({ds['users']} users): update p50={ds['update_user_data']['p50_ms']}ms "
+          f"get p50={ds['get_user_data']['p50_ms']}ms view p50={ds['get_application_view']['p50_ms']}ms")
+    print(f"Retrieval: {micro['retrieval']}")
+    print(f"Ingestion: {micro['ingestion']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline end-to-end benchmark")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--llm-latency-ms", type=float, default=300)
+    parser.add_argument("--llm-jitter-ms", type=float, default=0)
+    parser.add_argument("--rpa-latency-ms", type=float, default=50)
+    parser.add_argument("--users", type=int, default=500, help="synthetic users for DataService micro-bench")
+    parser.add_argument("--micro-repeat", type=int, default=50)
+    parser.add_argument("--ingest-docs", type=int, default=256)
+    parser.add_argument("--out", default=None)
+    args = parser.parse_args()
+
+    workdir = setup_environment(args)
+    try:
+        main = load_app(args)
+        e2e = asyncio.run(drive_chat(main, args))
+        micro = micro_benchmarks(main, args)
+        print_report(e2e, micro)
+        path = save_results("suite", {"config": vars(args), "chat": e2e, "micro": micro}, out=args.out)
+        print(f"\n✅ Saved to {path}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
@@ -0,0 +1,112 @@
+"""
+Vision payload benchmark.
+
+Sends every sample document through OCRLLMService with different preprocessing
+settings and reports bytes sent and latency against field agreement with the
+raw (unprocessed) upload.
+
+Usage (from backend/):
+    python -m benchmarks.bench_vision samples/ --runs 1
+"""
+import argparse
+import json
+import os
+import time
+
+from app.services.ocr_llm_service import OCRLLMService
+from app.services.image_service import ImagePreprocessor
+
+IMAGE_EXTS = (".jpg", ".jpeg", ".png", ".webp")
+
+CONFIGS = {
+    "raw": None,
+    "jpeg_2048_600k": dict(max_long_edge=2048, max_bytes=600_000, fmt="JPEG"),
+    "jpeg_1600_350k": dict(max_long_edge=1600, max_bytes=350_000, fmt="JPEG"),
+    "jpeg_1280_200k": dict(max_long_edge=1280, max_bytes=200_000, fmt="JPEG"),
+    "webp_1600_250k": dict(max_long_edge=1600, max_bytes=250_000, fmt="WEBP"),
+}
+
+
+def flatten(data, prefix=""):
+    """
+    {"a": {"b": 1}} -> {"a.b": "1"} (lower-cased, whitespace-collapsed values)
+    """
+    flat = {}
+    for key, value in (data or {}).items():
+        path = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{path}."))
+        elif value not in (None, "", [], "null"):
+            flat[path] = " ".join(str(value).lower().split())
+    return flat
+
+
+def field_agreement(baseline, candidate):
+    """
+    Share of baseline fields that the candidate reproduced exactly.
+    """
+    base = flatten(baseline.get("standardized_data", {}))
+    base.update(flatten(baseline.get("specific_data", {}), "specific."))
+    if not base:
+        return None
+    cand = flatten(candidate.get("standardized_data", {}))
+    cand.update(flatten(candidate.get("specific_data", {}), "specific."))
+    hits = sum(1 for k, v in base.items() if cand.get(k) == v)
+    return hits / len(base)
+
+
+def run(samples_dir, runs):
+    service = OCRLLMService()
+    files = sorted(f for f in os.listdir(samples_dir) if f.lower().endswith(IMAGE_EXTS))
+    if not files:
+        print(f"❌ No images found in {samples_dir}")
+        return []
+
+    results = []
+    for name in files:
+        with open(os.path.join(samples_dir, name), "rb") as f:
+            file_bytes = f.read()
+
+        baseline = None
+        for config_name, config in CONFIGS.items():
+            service.preprocessor = ImagePreprocessor(**config) if config else None
+            latencies = []
+            extracted = {}
+            for _ in range(runs):
+                start = time.perf_counter()
+                raw = service.extract_text(file_bytes)
+                latencies.append(time.perf_counter() - start)
+                extracted = service.parse_document(raw).get("extracted_data", {})
+
+            if config_name == "raw":
+                baseline = extracted
+
+            results.append({
+                "file": name,
+                "config": config_name,
+                "file_bytes": len(file_bytes),
+                "bytes_sent": service.last_payload_bytes,
+                "latency_s": sum(latencies) / len(latencies),
+                "agreement": field_agreement(baseline, extracted) if baseline else None,
+            })
+            r = results[-1]
+            agreement = "n/a" if r["agreement"] is None else f"{r['agreement']:.0%}"
+            print(f"{name:30} {config_name:16} {r['bytes_sent'] // 1024:>7} KB "
+                  f"{r['latency_s']:>6.2f}s  agree={agreement}")
+
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Vision LLM payload benchmark")
+    parser.add_argument("samples_dir")
+    parser.add_argument("--runs", type=int, default=1)
+    parser.add_argument("--out", default="benchmarks/results/vision.json")
+    args = parser.parse_args()
+
+    results = run(args.samples_dir, args.runs)
+    if results:
+        os.makedirs(os.path.dirname(args.out), exist_ok=True)
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"✅ Saved {len(results)} rows to {args.out}")
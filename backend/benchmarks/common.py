@@ -0,0 +1,62 @@
+import json
+import math
+import os
+import platform
+import subprocess
+import time
+from datetime import datetime
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+
+def percentiles(values, points=(50, 95, 99)):
+    """
+    Nearest-rank percentiles in milliseconds from a list of seconds.
+    """
+    if not values:
+        return {f"p{p}_ms": None for p in points}
+    ordered = sorted(values)
+    out = {}
+    for p in points:
+        # Smallest value with at least p% of the samples at or below it
+        rank = max(0, min(len(ordered) - 1, math.ceil(p / 100 * len(ordered)) - 1))
+        out[f"p{p}_ms"] = round(ordered[rank] * 1000, 2)
+    out["mean_ms"] = round(sum(ordered) / len(ordered) * 1000, 2)
+    return out
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except Exception:
+        return "unknown"
+
+
+def save_results(name, payload, out=None):
+    """
+    Writes results/<name>_<timestamp>.json (plus results/<name>_latest.json for quick diffs).
+    """
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    payload = {
+        "benchmark": name,
+        "timestamp": stamp,
+        "git": git_revision(),
+        "python": platform.python_version(),
+        "host": platform.node(),
+        **payload,
+    }
+    path = out or os.path.join(RESULTS_DIR, f"{name}_{stamp}.json")
+    for target in (path, os.path.join(RESULTS_DIR, f"{name}_latest.json")):
+        with open(target, "w") as f:
+            json.dump(payload, f, indent=2)
+    return path
@@ -0,0 +1,297 @@
+"""
+Retrieval quality vs latency, per configuration, over the scheme catalog.
+
+For every (embedding model, normalisation, backend) it builds an index of the catalog and
+reports recall@k, MRR, p50/p99 query latency (embed + search), build time and memory.
+Backends embed one whole-scheme text per scheme, except "chunked": one vector per section
+chunk (what ingest.py publishes), over-fetched and aggregated to distinct schemes by their
+best chunk the way RAGService does.
+
+Queries come from a labelled JSONL file ({"query": ..., "relevant": [scheme_name, ...]})
+or are generated from the catalog itself:
+    - name:        the scheme name, lower-cased, with a word dropped
+    - eligibility: a question built from the parsed eligibility rules (who / where / income)
+    - details:     the first clause of the scheme details
+
+Usage (from backend/):
+    python -m benchmarks.eval_retrieval --catalog updated_data.csv --sample 300
+    python -m benchmarks.eval_retrieval --models sentence-transformers/all-MiniLM-L6-v2 \
+        sentence-transformers/all-mpnet-base-v2 --backends numpy chroma mmap chunked --k 1 4 10
+    python -m benchmarks.eval_retrieval --write-queries queries.jsonl   # save the generated set to label by hand
+"""
+import argparse
+import csv
+import gc
+import json
+import os
+import random
+import re
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.common import percentiles, save_results
+from ingest import scheme_page_content
+from app.services.catalog_store import chunk_sections, row_fields
+from app.services.eligibility_service import parse_rules
+
+DEFAULT_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+
+
+# --- DATA ---
+def load_catalog(path):
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        rows = [{k: (v or "Not Specified") for k, v in row.items()} for row in csv.DictReader(f)]
+    return rows
+
+
+def generate_queries(rows, sample, seed=7):
+    rng = random.Random(seed)
+    picks = rng.sample(range(len(rows)), min(sample, len(rows)))
+    queries = []
+    for i in picks:
+        row = rows[i]
+        name = row.get("scheme_name", "")
+        relevant = [name]
+
+        words = name.lower().split()
+        if len(words) > 2:
+            words.pop(rng.randrange(len(words)))
+        if words:
+            queries.append({"query": " ".join(words), "relevant": relevant, "kind": "name"})
+
+        rules = parse_rules(row.get("eligibility", ""))
+        if rules:
+            who = " ".join(rules.get("gender", []) + [o.replace("_", " ") for o in rules.get("occupations", [])])
+            parts = [f"scheme for {who or 'people'}"]
+            if rules.get("castes"):
+                parts.append(f"from {'/'.join(c.upper() for c in rules['castes'])} category")
+            if rules.get("states"):
+                parts.append(f"in {rules['states'][0].title()}")
+            if rules.get("income_max"):
+                parts.append(f"with family income below {int(rules['income_max'])}")
+            if rules.get("age_min") or rules.get("age_max"):
+                parts.append(f"aged {int(rules.get('age_min', 0))} to {int(rules.get('age_max', 100))}")
+            parts.append(f"({row.get('schemeCategory', '')})")
+            queries.append({"query": " ".join(parts), "relevant": relevant, "kind": "eligibility"})
+
+        details = re.split(r"[.;\n]", row.get("details", ""))[0].strip()
+        if len(details.split()) >= 5:
+            queries.append({"query": " ".join(details.split()[:20]), "relevant": relevant, "kind": "details"})
+    return queries
+
+
+def load_queries(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+# --- BACKENDS ---
+class NumpyBackend:
+    """Exact brute-force search over an in-heap matrix (cosine if normalised, else L2 like Chroma)."""
+    def __init__(self, vectors, texts, normalize):
+        self.vectors = np.asarray(vectors, dtype=np.float32)
+        self.normalize = normalize
+        self.nbytes = self.vectors.nbytes
+
+    def search(self, q, k):
+        q = np.asarray(q, dtype=np.float32)
+        if self.normalize:
+            scores = self.vectors @ q
+        else:
+            scores = -np.sum((self.vectors - q) ** 2, axis=1)
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        return top[np.argsort(-scores[top])].tolist()
+
+
+class MmapBackend:
+    """The production SchemeIndex (serve.py), read back through mmap."""
+    def __init__(self, vectors, texts, normalize):
+        from app.services.scheme_index import SchemeIndex, write_index
+        self.directory = os.path.join(tempfile.mkdtemp(prefix="eval_idx_"), "index")
+        write_index(self.directory, vectors, texts, [{"row": i} for i in range(len(texts))])
+        self.index = SchemeIndex(self.directory)
+        self.nbytes = os.path.getsize(os.path.join(self.directory, "embeddings.npy"))
+
+    def search(self, q, k):
+        return [i for i, _ in self.index.search(q, k)]
+
+
+class ChromaBackend:
+    """In-memory Chroma collection (same HNSW index as chroma_db, without persistence)."""
+    def __init__(self, vectors, texts, normalize):
+        import chromadb
+        client = chromadb.EphemeralClient()
+        self.collection = client.create_collection(f"eval_{time.time_ns()}")
+        ids = [str(i) for i in range(len(texts))]
+        for start in range(0, len(ids), 1000):
+            self.collection.add(ids=ids[start:start + 1000], embeddings=[list(map(float, v)) for v in
+                                vectors[start:start + 1000]], documents=texts[start:start + 1000])
+        self.nbytes = None
+
+    def search(self, q, k):
+        result = self.collection.query(query_embeddings=[list(map(float, q))], n_results=k)
+        return [int(i) for i in result["ids"][0]]
+
+
+class ChunkedBackend:
+    """
+    Exact search over section chunks; a scheme ranks by its best chunk. Over-fetches
+    CANDIDATE_FACTOR x k chunks like RAGService, widening until k distinct schemes are found.
+    """
+    chunked = True
+
+    def __init__(self, vectors, texts, normalize, owners):
+        from app.services.rag_service import CANDIDATE_FACTOR
+        self.chunks = NumpyBackend(vectors, texts, normalize)
+        self.owners = owners
+        self.factor = CANDIDATE_FACTOR
+        self.nbytes = self.chunks.nbytes
+
+    def search(self, q, k):
+        fetch = k * self.factor
+        while True:
+            schemes = []
+            for i in self.chunks.search(q, fetch):
+                if self.owners[i] not in schemes:
+                    schemes.append(self.owners[i])
+            if len(schemes) >= k or fetch >= len(self.owners):
+                return schemes[:k]
+            fetch *= 2
+
+
+BACKENDS = {"numpy": NumpyBackend, "mmap": MmapBackend, "chroma": ChromaBackend, "chunked": ChunkedBackend}
+
+
+def index_units(rows, chunked):
+    """
+    -> (texts to embed, catalog row of each text): whole schemes, or their section chunks.
+    """
+    if not chunked:
+        return [scheme_page_content(row) for row in rows], list(range(len(rows)))
+    units = [(i, text) for i, row in enumerate(rows) for _, _, text in chunk_sections(row_fields(row))]
+    return [text for _, text in units], [i for i, _ in units]
+
+
+# --- METRICS ---
+def rss_mb():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1e6
+    except (OSError, ValueError, AttributeError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def evaluate(model_name, normalize, backend_name, rows, queries, ks, embed_cache):
+    from langchain_huggingface import HuggingFaceEmbeddings
+
+    backend_class = BACKENDS[backend_name]
+    chunked = getattr(backend_class, "chunked", False)
+    texts, owners = index_units(rows, chunked)
+    row_of = {}
+    for i, row in enumerate(rows):
+        row_of.setdefault(row.get("scheme_name"), []).append(i)
+
+    cache_key = (model_name, normalize, chunked)
+    rss_before = rss_mb()
+    build_start = time.perf_counter()
+    if cache_key not in embed_cache:
+        # The model is shared by the whole-scheme and chunked runs of one configuration
+        model = next((m for (name, norm, _), (m, _, _) in embed_cache.items()
+                      if (name, norm) == (model_name, normalize)), None)
+        if model is None:
+            model = HuggingFaceEmbeddings(model_name=model_name, encode_kwargs={"normalize_embeddings": normalize})
+        start = time.perf_counter()
+        vectors = np.asarray(model.embed_documents(texts), dtype=np.float32)
+        embed_cache[cache_key] = (model, vectors, time.perf_counter() - start)
+    model, vectors, embed_seconds = embed_cache[cache_key]
+    index_start = time.perf_counter()
+    if chunked:
+        backend = backend_class(vectors, texts, normalize, owners)
+    else:
+        backend = backend_class(vectors, texts, normalize)
+    index_seconds = time.perf_counter() - index_start
+    rss_after = rss_mb()
+
+    kmax = max(ks)
+    hits = {k: 0 for k in ks}
+    reciprocal_ranks, latencies = [], []
+    for q in queries:
+        relevant = {i for name in q["relevant"] for i in row_of.get(name, [])}
+        start = time.perf_counter()
+        ranked = backend.search(model.embed_query(q["query"]), kmax)
+        latencies.append(time.perf_counter() - start)
+        rank = next((pos for pos, i in enumerate(ranked, 1) if i in relevant), None)
+        reciprocal_ranks.append(1 / rank if rank else 0.0)
+        for k in ks:
+            if rank and rank <= k:
+                hits[k] += 1
+
+    lat = percentiles(latencies, points=(50, 99))
+    return {
+        "model": model_name.split("/")[-1],
+        "normalize": normalize,
+        "backend": backend_name,
+        "queries": len(queries),
+        "vectors": len(texts),
+        **{f"recall@{k}": round(hits[k] / max(len(queries), 1), 4) for k in ks},
+        f"mrr@{kmax}": round(sum(reciprocal_ranks) / max(len(queries), 1), 4),
+        "p50_ms": lat["p50_ms"],
+        "p99_ms": lat["p99_ms"],
+        "embed_s": round(embed_seconds, 2),
+        "index_build_s": round(index_seconds, 3),
+        "index_mb": round(backend.nbytes / 1e6, 2) if backend.nbytes else None,
+        "rss_delta_mb": round(rss_after - rss_before, 1),
+        "time_build_s": round(time.perf_counter() - build_start, 2),
+    }
+
+
+def print_table(rows, ks):
+    cols = ["model", "normalize", "backend"] + [f"recall@{k}" for k in ks] + \
+           [f"mrr@{max(ks)}", "p50_ms", "p99_ms", "embed_s", "index_build_s", "index_mb", "rss_delta_mb"]
+    widths = [max(len(c), *(len(str(r.get(c))) for r in rows)) for c in cols]
+    print("\n" + "  ".join(c.ljust(w) for c, w in zip(cols, widths)))
+    for r in rows:
+        print("  ".join(str(r.get(c)).ljust(w) for c, w in zip(cols, widths)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Retrieval quality vs latency")
+    parser.add_argument("--catalog", default="updated_data.csv")
+    parser.add_argument("--queries", default=None, help="labelled JSONL (default: generated from the catalog)")
+    parser.add_argument("--write-queries", default=None, help="save the generated queries and exit")
+    parser.add_argument("--sample", type=int, default=200, help="schemes to generate queries from")
+    parser.add_argument("--models", nargs="+", default=[DEFAULT_MODEL])
+    parser.add_argument("--normalize", nargs="+", default=["true", "false"], choices=["true", "false"])
+    parser.add_argument("--backends", nargs="+", default=["numpy", "chroma"], choices=sorted(BACKENDS))
+    parser.add_argument("--k", nargs="+", type=int, default=[1, 4, 10])
+    parser.add_argument("--out", default=None)
+    args = parser.parse_args()
+
+    os.environ.setdefault("HF_HUB_OFFLINE", "1")
+    catalog = load_catalog(args.catalog)
+    queries = load_queries(args.queries) if args.queries else generate_queries(catalog, args.sample)
+    if args.write_queries:
+        with open(args.write_queries, "w", encoding="utf-8") as f:
+            for q in queries:
+                f.write(json.dumps(q, ensure_ascii=False) + "\n")
+        print(f"✅ Wrote {len(queries)} queries to {args.write_queries}")
+        raise SystemExit(0)
+    print(f"📄 {len(catalog)} schemes, {len(queries)} queries")
+
+    results, embed_cache = [], {}
+    for model_name in args.models:
+        for normalize in (n == "true" for n in args.normalize):
+            for backend in args.backends:
+                print(f"⚙️ {model_name} normalize={normalize} backend={backend}")
+                results.append(evaluate(model_name, normalize, backend, catalog, queries, sorted(args.k), embed_cache))
+                gc.collect()
+        # Free the model before loading the next one
+        embed_cache.clear()
+
+    print_table(results, sorted(args.k))
+    path = save_results("retrieval", {"config": vars(args), "results": results}, out=args.out)
+    print(f"\n✅ Saved to {path}")
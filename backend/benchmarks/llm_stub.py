@@ -0,0 +1,112 @@
+"""
+Deterministic, offline stand-in for the Groq chat-completions API.
+
+Answers POST /openai/v1/chat/completions (the path the Groq SDK and ChatGroq call)
+with a fixed-shape JSON reply derived from the last user message, after a
+configurable delay. Point the app at it with GROQ_BASE_URL / GROQ_API_BASE.
+
+    uvicorn benchmarks.llm_stub:stub_app --port 8200
+
+Knobs (read per request):
+    LLM_STUB_LATENCY_MS   - base delay per completion (default 300)
+    LLM_STUB_JITTER_MS    - extra deterministic jitter, 0..N ms keyed on the prompt (default 0)
+"""
+import asyncio
+import hashlib
+import json
+import os
+import socket
+import threading
+import time
+
+from fastapi import FastAPI, Request
+
+stub_app = FastAPI(title="LLM Stub")
+
+CONFIRM_WORDS = ("yes", "apply", "proceed", "correct")
+
+
+def _prompt_text(messages):
+    parts = []
+    for message in messages:
+        content = message.get("content")
+        if isinstance(content, list):
+            parts.extend(c.get("text", "") for c in content if isinstance(c, dict))
+        else:
+            parts.append(str(content or ""))
+    return "\n".join(parts)
+
+
+def _reply_for(prompt):
+    """
+    Same prompt -> same answer. Confirmation words trigger the RPA path so that stage is exercised.
+    """
+    marker = "--- CURRENT USER MESSAGE ---"
+    query = prompt.split(marker, 1)[1].split("---", 1)[0].strip().lower() if marker in prompt else prompt.lower()
+    if any(word in query for word in CONFIRM_WORDS):
+        return {
+            "response_text": "All details are available. Starting your PAN application.",
+            "extracted_data": None,
+            "action": "TRIGGER_RPA",
+            "target_scheme": "PAN Card",
+            "missing_data": []
+        }
+    return {
+        "response_text": "Here are some schemes that may suit you.",
+        "extracted_data": None,
+        "action": "NONE",
+        "target_scheme": None,
+        "missing_data": []
+    }
+
+
+@stub_app.post("/openai/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    prompt = _prompt_text(body.get("messages", []))
+    digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+
+    latency_ms = float(os.getenv("LLM_STUB_LATENCY_MS", "300"))
+    jitter_ms = float(os.getenv("LLM_STUB_JITTER_MS", "0"))
+    if jitter_ms:
+        latency_ms += int(digest[:8], 16) % int(jitter_ms + 1)
+    await asyncio.sleep(latency_ms / 1000)
+
+    content = json.dumps(_reply_for(prompt))
+    prompt_tokens = len(prompt) // 4
+    completion_tokens = len(content) // 4
+    return {
+        "id": f"chatcmpl-stub-{digest[:12]}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "stub"),
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content},
+            "finish_reason": "stop"
+        }],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens
+        }
+    }
+
+
+def start_stub_server(port=0):
+    """
+    Runs the stub in a daemon thread on 127.0.0.1 and returns its base URL.
+    """
+    import uvicorn
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind(("127.0.0.1", port))
+    port = sock.getsockname()[1]
+
+    server = uvicorn.Server(uvicorn.Config(stub_app, log_level="warning"))
+    thread = threading.Thread(target=server.run, kwargs={"sockets": [sock]}, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    return f"http://127.0.0.1:{port}"
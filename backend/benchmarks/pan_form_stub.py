@@ -0,0 +1,161 @@
+"""
+Offline replica of the Protean (NSDL) PAN registration form that RPAService._apply_for_pan drives.
+
+Reproduces what the bot depends on, in the same order and with the same behaviours:
+    - three <select>s: Application Type -> Category (filled in after a delay) -> Title
+    - surname / first / middle name as the first three text inputs
+    - a readonly #dob with a datepicker popup that opens on click and closes on Tab / blur
+    - #emailId, and a mobile input with no id, located through its "Mobile Number" label
+    - a consent checkbox; submitting echoes what was filled (for checking the bot by hand)
+The form behaviour lives in a separately served script, like the real page's assets.
+
+    uvicorn benchmarks.pan_form_stub:pan_app --port 8300
+    PAN_FORM_URL=http://127.0.0.1:8300/paam/endUserRegisterContact.html
+
+Knobs (read per request):
+    PAN_FORM_PAGE_DELAY_MS       - delay before the HTML is served (default 150)
+    PAN_FORM_SCRIPT_DELAY_MS     - delay before form.js is served (default 100)
+    PAN_FORM_DROPDOWN_DELAY_MS   - client-side delay before Category is populated (default 300)
+"""
+import asyncio
+import os
+import socket
+import threading
+import time
+
+from fastapi import FastAPI, Request
+from fastapi.responses import HTMLResponse, Response
+
+pan_app = FastAPI(title="PAN Form Replica")
+
+PAGE = """<!DOCTYPE html>
+<html>
+<head>
+  <title>Online PAN application</title>
+  <style>
+    .datepicker {{ position: absolute; border: 1px solid #888; background: #fff; padding: 6px; display: none; }}
+    .row {{ margin: 8px 0; }}
+  </style>
+</head>
+<body>
+  <h2>Online PAN application</h2>
+  <form id="registerForm" method="post" action="/paam/endUserRegisterContact.html">
+    <div class="row"><label>Application Type *</label>
+      <select name="applnType" id="applnType">
+        <option value="">Please select</option>
+        <option value="49A">New PAN - Indian Citizen (Form 49A)</option>
+        <option value="49AA">New PAN - Foreign Citizen (Form 49AA)</option>
+        <option value="CR">Changes or Correction in existing PAN Data</option>
+      </select>
+    </div>
+    <div class="row"><label>Category *</label>
+      <select name="category" id="category" disabled><option value="">Please select</option></select>
+    </div>
+    <div class="row"><label>Title *</label>
+      <select name="title" id="title" disabled><option value="">Please select</option></select>
+    </div>
+    <div class="row"><label>Last Name / Surname *</label><input type="text" name="lastName" maxlength="75"></div>
+    <div class="row"><label>First Name</label><input type="text" name="firstName" maxlength="25"></div>
+    <div class="row"><label>Middle Name</label><input type="text" name="middleName" maxlength="25"></div>
+    <div class="row"><label>Date of Birth / Incorporation *</label>
+      <input type="text" name="dob" id="dob" class="hasDatepicker" readonly placeholder="DD/MM/YYYY">
+      <div id="ui-datepicker-div" class="datepicker">
+        <span>&lt; Prev</span> <b id="dp-month"></b> <span>Next &gt;</span>
+      </div>
+    </div>
+    <div class="row"><label>Email ID *</label><input type="text" name="emailId" id="emailId" maxlength="75"></div>
+    <div class="row"><label>Mobile Number *</label><span>+91</span><input type="text" name="mobileNo" maxlength="10"></div>
+    <div class="row">
+      <input type="checkbox" name="consent" value="Y">
+      <span>I have read the consent terms and agree to proceed further.</span>
+    </div>
+    <div class="row"><button type="submit" id="submitBtn">Submit</button></div>
+  </form>
+  <script>window.DROPDOWN_DELAY_MS = {dropdown_delay};</script>
+  <script src="/paam/static/form.js"></script>
+</body>
+</html>
+"""
+
+SCRIPT = """
+(function () {
+  var categories = {
+    "49A": ["Individual", "Association of Persons", "Body of Individuals", "Company", "Trust", "Firm"],
+    "49AA": ["Individual", "Company", "Trust"],
+    "CR": ["Individual", "Company"]
+  };
+  var titles = {"Individual": ["Shri", "Smt", "Kumari"]};
+  function fill(select, values) {
+    select.innerHTML = '<option value="">Please select</option>';
+    values.forEach(function (v) {
+      var o = document.createElement("option"); o.value = v; o.textContent = v; select.appendChild(o);
+    });
+    select.disabled = values.length === 0;
+  }
+  var applnType = document.getElementById("applnType");
+  var category = document.getElementById("category");
+  var title = document.getElementById("title");
+  applnType.addEventListener("change", function () {
+    fill(category, []); fill(title, []);
+    // The live site fetches the category list; it arrives after a round trip
+    setTimeout(function () { fill(category, categories[applnType.value] || []); }, window.DROPDOWN_DELAY_MS);
+  });
+  category.addEventListener("change", function () {
+    fill(title, titles[category.value] || ["M/s"]);
+  });
+
+  var dob = document.getElementById("dob");
+  var picker = document.getElementById("ui-datepicker-div");
+  dob.addEventListener("click", function () {
+    document.getElementById("dp-month").textContent = new Date().toDateString();
+    picker.style.display = "block";
+  });
+  dob.addEventListener("keydown", function (e) { if (e.key === "Tab") { picker.style.display = "none"; } });
+  dob.addEventListener("blur", function () { picker.style.display = "none"; });
+})();
+"""
+
+
+async def _delay(name, default):
+    delay_ms = float(os.getenv(name, default))
+    if delay_ms > 0:
+        await asyncio.sleep(delay_ms / 1000)
+
+
+@pan_app.get("/paam/endUserRegisterContact.html", response_class=HTMLResponse)
+async def form_page():
+    await _delay("PAN_FORM_PAGE_DELAY_MS", "150")
+    return PAGE.format(dropdown_delay=int(float(os.getenv("PAN_FORM_DROPDOWN_DELAY_MS", "300"))))
+
+
+@pan_app.get("/paam/static/form.js")
+async def form_script():
+    await _delay("PAN_FORM_SCRIPT_DELAY_MS", "100")
+    return Response(SCRIPT, media_type="application/javascript")
+
+
+@pan_app.post("/paam/endUserRegisterContact.html")
+async def form_submit(request: Request):
+    fields = dict(await request.form())
+    required = ("applnType", "category", "title", "lastName", "dob", "emailId", "mobileNo", "consent")
+    missing = [f for f in required if not fields.get(f)]
+    return {"status": "error" if missing else "accepted", "missing": missing, "fields": fields}
+
+
+def start_pan_form_server(port=0):
+    """
+    Runs the replica in a daemon thread on 127.0.0.1 and returns the form URL.
+    """
+    import uvicorn
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind(("127.0.0.1", port))
+    port = sock.getsockname()[1]
+
+    server = uvicorn.Server(uvicorn.Config(pan_app, log_level="warning"))
+    thread = threading.Thread(target=server.run, kwargs={"sockets": [sock]}, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    return f"http://127.0.0.1:{port}/paam/endUserRegisterContact.html"
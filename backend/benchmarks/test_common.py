@@ -0,0 +1,17 @@
+"""
+python -m pytest benchmarks/test_common.py   (from backend/)
+"""
+from benchmarks.common import percentiles
+
+
+def test_percentiles_nearest_rank():
+    out = percentiles([ms / 1000 for ms in range(1, 101)])
+    assert (out["p50_ms"], out["p95_ms"], out["p99_ms"]) == (50, 95, 99)
+    assert out["mean_ms"] == 50.5
+
+
+def test_percentiles_small_samples():
+    assert percentiles([0.003, 0.001, 0.002], points=(1, 50, 100)) == \
+        {"p1_ms": 1, "p50_ms": 2, "p100_ms": 3, "mean_ms": 2}
+    assert percentiles([0.004], points=(50, 99))["p99_ms"] == 4
+    assert percentiles([], points=(50,)) == {"p50_ms": None}
@@ -9,8 +9,8 @@ def chat_session():
     print(f"🤖 Connected to Sev-ai as {USER_NAME}")
     print("Type 'exit' to quit.\n")
 
-    # Start with empty history
-    history = []
+    # The server keeps the conversation; we only hold the session id
+    session_id = None
 
     while True:
         # 1. Get User Input
@@ -22,7 +22,7 @@ def chat_session():
         payload = {
             "user_profile": {"name": USER_NAME},
             "query": user_input,
-            "history": history
+            "session_id": session_id
         }
 
         # 3. Send to Backend
@@ -35,9 +35,8 @@ def chat_session():
             bot_text = data.get("response_text", "No response text")
             print(f"🤖 Sev-ai: {bot_text}")
 
-            # 5. Update History (So the bot remembers context!)
-            history.append(f"User: {user_input}")
-            history.append(f"AI: {bot_text}")
+            # 5. Keep the session (So the bot remembers context!)
+            session_id = data.get("session_id", session_id)
 
             # 6. Check for ACTION (The Magic Moment)
             if data.get("action") == "TRIGGER_RPA":
@@ -6,10 +6,18 @@ import os
 import shutil
 import torch
 from tqdm import tqdm
+from app.services.dedupe import dedupe_documents
+from app.services import index_manager, catalog_store
 
-# Define where the database lives
-DB_DIR = "chroma_db"
+# Every run builds a new generation here; the server follows the CURRENT pointer
+INDEX_ROOT = os.getenv("SCHEME_INDEX_ROOT", index_manager.DEFAULT_ROOT)
+KEEP_GENERATIONS = 3
 BATCH_SIZE = 100
+# Collapse near-identical (state copies of the same) schemes into one embedding each
+DEDUPE = True
+DEDUPE_THRESHOLD = 0.7
+# Embed each scheme section separately (retrieval aggregates chunks back to their scheme)
+SECTION_CHUNKS = True
 
 def get_device():
     if torch.cuda.is_available():
@@ -19,14 +27,27 @@ def get_device():
     else:
         return "cpu"
 
+def scheme_page_content(row):
+    """
+    The text that gets embedded for one catalog row (also used by benchmarks/eval_retrieval.py).
+    """
+    return catalog_store.page_content(catalog_store.row_fields(row))
+
 def ingest_data():
-    # 1. Clean Slate
-    if os.path.exists(DB_DIR):
-        print(f"🧹 Clearing old database at {DB_DIR}...")
-        try:
-            shutil.rmtree(DB_DIR)
-        except Exception as e:
-            print(f"⚠️ Could not delete old DB: {e}")
+    # 1. Load Data (before anything is created on disk)
+    csv_file = "updated_data.csv"
+    if not os.path.exists(csv_file):
+        print(f"❌ Error: '{csv_file}' not found.")
+        return
+
+    print("📂 Reading CSV file...")
+    try:
+        # THE FIX: dtype=str forces everything to be text, preventing the float error
+        df = pd.read_csv(csv_file, dtype=str)
+        df.fillna("Not Specified", inplace=True)
+    except Exception as e:
+        print(f"❌ Error reading CSV: {e}")
+        return
 
     # 2. Setup High-Performance Embeddings
     device = get_device()
@@ -42,60 +63,66 @@ def ingest_data():
         encode_kwargs=encode_kwargs
     )
 
-    # 3. Load Data
-    csv_file = "updated_data.csv"
-    if not os.path.exists(csv_file):
-        print(f"❌ Error: '{csv_file}' not found.")
-        return
-
-    print("📂 Reading CSV file...")
+    # 3. Fresh generation (the live one keeps serving until the pointer moves); removed again
+    # unless it gets published, so failed runs leave nothing behind
+    generation, generation_dir = index_manager.new_generation(INDEX_ROOT)
+    print(f"🆕 Building generation {generation} in {INDEX_ROOT}...")
+    published = False
     try:
-        # THE FIX: dtype=str forces everything to be text, preventing the float error
-        df = pd.read_csv(csv_file, dtype=str)
-        df.fillna("Not Specified", inplace=True)
-    except Exception as e:
-        print(f"❌ Error reading CSV: {e}")
-        return
+        published = _build_generation(embeddings, df, csv_file, generation, generation_dir)
+    finally:
+        if not published:
+            shutil.rmtree(generation_dir, ignore_errors=True)
 
-    # 4. Create Documents
+
+def _build_generation(embeddings, df, csv_file, generation, generation_dir):
+    """
+    Catalog, vectors, mmap export and manifest into generation_dir; publishes it if it validates.
+    -> True once published.
+    """
+    # 4. Columnar catalog (fields by scheme id), then one Document per row carrying that id
+    rows = [catalog_store.row_fields(row) for _, row in df.iterrows()]
+    scheme_ids = catalog_store.write_catalog(os.path.join(generation_dir, "catalog"), rows)
     documents = []
     print(f"📄 Preparing {len(df)} documents...")
 
-    for index, row in df.iterrows():
-        page_content = f"""
-        Scheme Name: {row.get('scheme_name', 'Unknown')}
-        Category: {row.get('schemeCategory', 'Unknown')}
-        Level: {row.get('level', 'Unknown')}
-        
-        Details:
-        {row.get('details', '')}
-        
-        Benefits:
-        {row.get('benefits', '')}
-        
-        Eligibility:
-        {row.get('eligibility', '')}
-        
-        Documents Required:
-        {row.get('documents', '')}
-        """
+    for fields, scheme_id in zip(rows, scheme_ids):
+        page_content = catalog_store.page_content(fields)
         
         metadata = {
-            "scheme_name": row.get('scheme_name', 'Unknown'),
-            "category": row.get('schemeCategory', 'Unknown'),
-            "level": row.get('level', 'Unknown')
+            "scheme_id": scheme_id,
+            "scheme_name": fields["name"] or 'Unknown',
+            "category": fields["category"] or 'Unknown',
+            "level": fields["level"] or 'Unknown'
         }
         
         doc = Document(page_content=page_content, metadata=metadata)
         documents.append(doc)
 
+    # 4b. Near-duplicate pass (MinHash/LSH): one canonical document per cluster, variants in metadata
+    if DEDUPE and documents:
+        before = len(documents)
+        documents = dedupe_documents(documents, threshold=DEDUPE_THRESHOLD)
+        print(f"🧬 Dedupe: {before} rows -> {len(documents)} distinct schemes ({before - len(documents)} variants folded)")
+
+    # 4c. Section chunks of each canonical scheme (MiniLM truncates whole scheme texts)
+    if SECTION_CHUNKS and documents:
+        schemes = len(documents)
+        by_id = dict(zip(scheme_ids, rows))
+        documents = [
+            Document(page_content=text, metadata=dict(doc.metadata, section=section, part=part))
+            for doc in documents
+            for section, part, text in catalog_store.chunk_sections(by_id[doc.metadata["scheme_id"]])
+        ]
+        print(f"✂️ Chunking: {schemes} schemes -> {len(documents)} section chunks")
+
     # 5. Ingest in Batches
     print(f"⚙️ Ingesting into ChromaDB in batches of {BATCH_SIZE}...")
     
     if documents:
         vector_db = Chroma(
             embedding_function=embeddings,
-            persist_directory=DB_DIR
+            persist_directory=os.path.join(generation_dir, "chroma")
         )
         
         total_docs = len(documents)
@@ -103,9 +130,26 @@ def ingest_data():
             batch = documents[i : i + BATCH_SIZE]
             vector_db.add_documents(batch)
             
-        print(f"✅ Success! Knowledge Base with {total_docs} schemes saved to '{DB_DIR}'.")
-    else:
-        print("⚠️ No documents found to ingest.")
+        print(f"✅ Success! Knowledge Base with {total_docs} documents saved to '{generation_dir}'.")
+
+        # 6. Read-only mmap copy for the pre-fork server (serve.py)
+        from app.services.scheme_index import export_from_chroma
+        export_from_chroma(vector_db, os.path.join(generation_dir, "mmap"))
+        index_manager.write_manifest(generation_dir, count=total_docs, rows=len(df), csv=csv_file,
+                                     model="sentence-transformers/all-MiniLM-L6-v2", chunks=SECTION_CHUNKS)
+
+        # 7. Validate, then publish atomically; running servers swap on their next search
+        try:
+            index_manager.validate_generation(generation_dir, vector_db, total_docs)
+        except ValueError as e:
+            print(f"❌ Validation failed, keeping the live index: {e}")
+            return False
+        index_manager.publish(INDEX_ROOT, generation)
+        print(f"📢 Generation {generation} is live.")
+        index_manager.collect_garbage(INDEX_ROOT, keep=KEEP_GENERATIONS)
+        return True
+    print("⚠️ No documents found to ingest.")
+    return False
 
 if __name__ == "__main__":
     ingest_data()
\ No newline at end of file
@@ -1,13 +1,28 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import PlainTextResponse, JSONResponse, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
 from typing import List, Optional
 from fastapi.middleware.cors import CORSMiddleware
+import asyncio
 import json
+import os
+import time
 
 # Services
 from app.services.rag_service import RAGService
-from app.services.data_service import DataService
+from app.services.data_service import DataService, SCHEME_REQUIREMENTS
 from app.services.rpa_service import RPAService
+from app.services.session_service import SessionService
+from app.services.unit_of_work import UnitOfWork, VersionConflict
+from app.services.admission import get_controller, client_key, Lease, Rejected
+from app.services.chat_deadline import resolve_budget, build_degraded_answer, PendingResults
+from app.routers import identity, eligibility, catalog
+from app.services.llm_replay import cassette_miss
+from app.services.metrics import registry, request_timings, server_timing_header, span, HTTP_SECONDS
+from app.services.log_service import get_logger
+
+log = get_logger("main")
 
 app = FastAPI()
 
@@ -15,11 +30,63 @@ app.add_middleware(
     CORSMiddleware, allow_origins=["*"], allow_credentials=True, allow_methods=["*"], allow_headers=["*"],
 )
 
-print("⚡ Initializing Services...")
+log.info("⚡ Initializing Services...")
 data_store = DataService()
 rag_engine = RAGService()
 rpa_engine = RPAService()
-print("✅ Services Ready!")
+sessions = SessionService()
+pending_results = PendingResults()
+# Below this much remaining budget the LLM is not even tried
+MIN_LLM_SECONDS = 0.25
+# /api/chat/batch: items per request, LLM calls in flight per batch
+BATCH_MAX_ITEMS = int(os.getenv("CHAT_BATCH_MAX_ITEMS", "500"))
+BATCH_CONCURRENCY = int(os.getenv("CHAT_BATCH_CONCURRENCY", "8"))
+log.info("✅ Services Ready!")
+
+# OCR upload + DigiLocker endpoints
+app.include_router(identity.router)
+# Precomputed scheme eligibility / proactive recommendations
+app.include_router(eligibility.router)
+# Scheme catalog browsing (columnar store of the published index generation)
+app.include_router(catalog.router)
+
+@app.on_event("shutdown")
+async def close_pools():
+    await identity.digilocker_client.aclose()
+
+@app.middleware("http")
+async def stage_timing(request: Request, call_next):
+    """
+    Collects the spans recorded while serving this request and returns them as Server-Timing.
+    """
+    timings = []
+    token = request_timings.set(timings)
+    start = time.perf_counter()
+    try:
+        response = await call_next(request)
+    finally:
+        request_timings.reset(token)
+    total = time.perf_counter() - start
+    # The route template (/api/catalog/{scheme_id}), never the raw path: one series per endpoint
+    route = request.scope.get("route")
+    HTTP_SECONDS.observe(total, path=getattr(route, "path", "unmatched"))
+    response.headers["Server-Timing"] = server_timing_header(timings, total)
+    return response
+
+@app.exception_handler(Rejected)
+async def rejected_handler(request: Request, exc: Rejected):
+    """
+    Overload: answer immediately instead of queueing without bound.
+    """
+    return JSONResponse(
+        status_code=exc.status,
+        content={"detail": "Server busy, retry later.", "reason": exc.reason},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+@app.get("/metrics")
+def metrics():
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
 
 class UserProfile(BaseModel):
     name: str
@@ -27,80 +94,352 @@ class UserProfile(BaseModel):
 class SchemeRequest(BaseModel):
     user_profile: UserProfile
     query: str
+    session_id: Optional[str] = None
+    # Legacy: full client-side history. New clients send only session_id.
     history: List[str] = []
+    # Latency budget (X-Deadline-Ms header wins); past it the answer is built locally
+    deadline_ms: Optional[int] = None
+    # Keep computing the full answer after a degraded reply (GET /api/chat/result/{result_id})
+    background: bool = True
 
-@app.post("/api/chat")
-async def chat_endpoint(request: SchemeRequest):
+class BatchItem(BaseModel):
+    user_profile: UserProfile
+    query: str
+    # Echoed back so the client can match streamed results (they arrive in completion order)
+    id: Optional[str] = None
+
+class BatchRequest(BaseModel):
+    items: List[BatchItem]
+    concurrency: Optional[int] = None
+
+def _open_session(request, user_name):
+    # 0. Server-side session (bounded turns + rolling summary)
+    with span("session"):
+        session = sessions.get_or_create(request.session_id, user_name)
+        history = request.history or sessions.prompt_history(session)
+    return session, history
+
+def _parse_answer(response_json_str):
     try:
-        # 1. Ask Brain
-        response_json_str = rag_engine.recommend_schemes(request.user_profile, request.query, request.history)
+        return json.loads(response_json_str)
+    except:
+        return {"response_text": response_json_str, "action": "NONE"}
+
+def _apply_extracted(user_name, ai_response, store=data_store):
+    # 2. Self-Healing (Update DB with new info)
+    extracted = ai_response.get("extracted_data")
+    if extracted and isinstance(extracted, dict):
+        log.info("📥 New Data Detected", extra={"fields": sorted(extracted)})
+        update_payload = {"standardized_data": extracted}
+        with span("store"):
+            store.update_user_data(user_name, update_payload)
+
+def _missing_by_scheme(user_name, store=data_store):
+    return {scheme: store.missing_fields(user_name, scheme) for scheme in SCHEME_REQUIREMENTS}
+
+def _commit(uow):
+    # The turn's only store write (extracted fields), before anything acts on them
+    with span("store"):
+        uow.commit()
+
+def _save_extracted(answers, store=data_store):
+    # A batch's extracted fields, all users merged into one store write (not one per item)
+    uow = UnitOfWork(store)
+    for user_name, ai_response in answers:
+        _apply_extracted(user_name, ai_response, uow)
+    _commit(uow)
+    return len({user_name for user_name, _ in answers})
+
+def _launch_rpa(user_name, target_scheme, store=data_store, reservation=None):
+    # The materialized view of the record this turn already holds (kept up to date by update_user_data)
+    rpa_data = store.get_rpa_payload(user_name)
+
+    log.info("🚀 Launching RPA", extra={"scheme": target_scheme, "user": user_name})
+    if reservation is not None:
+        return rpa_engine.apply_for_scheme(rpa_data, scheme_name=target_scheme, reservation=reservation)
+    return rpa_engine.apply_for_scheme(rpa_data, scheme_name=target_scheme, user=user_name)
+
+async def _speculate_rpa(user_name, ai_response, store=data_store):
+    """
+    A turn that leaves an application one "yes" away opens the form in the background now,
+    so confirming only costs the fill. Any other (non-degraded) turn gives the browser back.
+    A reserved browser is a Chrome like any run: it holds an "rpa" slot until it is used or
+    discarded, and is only started when a slot is free without queueing.
+    """
+    target_scheme = ai_response.get("target_scheme")
+    if target_scheme and store.is_ready(user_name, target_scheme):
+        lease = get_controller("rpa").try_acquire()
+        if lease is None:
+            return
+        loop = asyncio.get_running_loop()
+        # The controller lives on the loop; the reservation ends on a worker thread. Idle time
+        # waiting for the "yes" is not service time: keep it out of the Retry-After estimate
+        release = lambda: loop.call_soon_threadsafe(lease.controller.release)
         try:
-            ai_response = json.loads(response_json_str)
-        except:
-            return {"response_text": response_json_str, "action": "NONE"}
+            started = await run_in_threadpool(rpa_engine.reserve, user_name, target_scheme, release)
+        except BaseException:
+            lease.release()
+            raise
+        if not started:
+            lease.release()
+    elif not ai_response.get("degraded"):
+        # Quitting the browser is not this turn's business: don't wait for it
+        asyncio.ensure_future(run_in_threadpool(rpa_engine.release, user_name)).add_done_callback(_late_failure)
+
+async def _complete_in_background(task, user_name, lease):
+    # Still counted against the "chat" class: the request handed its slot over
+    try:
+        ai_response = _parse_answer(await task)
+        await run_in_threadpool(_apply_extracted, user_name, ai_response)
+        return ai_response
+    finally:
+        lease.release()
+
+def _late_failure(future):
+    # A stage that finished after the reply went out: only its failure is worth a line
+    if not future.cancelled() and future.exception() is not None:
+        log.error("❌ Late stage failed", extra={"error": str(future.exception())})
 
-        user_name = request.user_profile.name
+async def _within(deadline, fn, *args):
+    """
+    fn(*args) in the threadpool, waited for until the deadline at most. -> (finished, result)
+    A late call cannot be interrupted (it is a thread): it completes on its own, result dropped.
+    """
+    future = asyncio.ensure_future(run_in_threadpool(fn, *args))
+    done, _ = await asyncio.wait({future}, timeout=max(deadline - time.perf_counter(), 0))
+    if not done:
+        future.add_done_callback(_late_failure)
+        return False, None
+    return True, future.result()
 
-        # 2. Self-Healing (Update DB with new info)
-        extracted = ai_response.get("extracted_data")
-        if extracted and isinstance(extracted, dict):
-            print(f"📥 New Data Detected: {extracted}")
-            update_payload = {"standardized_data": extracted}
-            data_store.update_user_data(user_name, update_payload)
+def _degraded_answer(docs, user_name, reason, store=data_store):
+    # Eligibility from the catalog: the docs hold only the sections that matched the query
+    missing = _missing_by_scheme(user_name, store)
+    return build_degraded_answer(docs, missing, reason, rag_engine.eligibility_of(docs))
 
-        # 3. CHECK FOR ACTION
+async def _degrade(docs, user_name, reason, store):
+    answer = await run_in_threadpool(_degraded_answer, docs, user_name, reason, store)
+    log.warning("⏱️ Degraded chat answer", extra={"reason": reason, "user": user_name})
+    return answer
+
+async def _answer_within(deadline, inputs, docs, request, user_name, uow, lease):
+    """
+    1. Ask Brain, but never past the deadline: otherwise answer locally (degraded).
+    """
+    remaining = deadline - time.perf_counter()
+    task = None
+    if remaining < MIN_LLM_SECONDS:
+        reason = "budget_exhausted"
+    else:
+        task = asyncio.create_task(rag_engine.arecommend(inputs))
+        try:
+            done, _ = await asyncio.wait({task}, timeout=remaining)
+        except asyncio.CancelledError:
+            task.cancel()
+            raise
+        if not done:
+            reason = "deadline"
+        elif task.exception() is not None:
+            if cassette_miss(task.exception()):
+                # Replay runs must fail, not pass with a degraded answer
+                raise cassette_miss(task.exception())
+            log.error("❌ Chatbot Error", extra={"error": str(task.exception())})
+            reason = "llm_error"
+        else:
+            ai_response = _parse_answer(task.result())
+            await run_in_threadpool(_apply_extracted, user_name, ai_response, uow)
+            return ai_response
+
+    answer = await _degrade(docs, user_name, reason, uow)
+    if reason == "deadline":
+        # Let the full answer finish for GET /api/chat/result/{id} (bounded, and holding this
+        # request's chat slot until it does), or stop paying for it
+        result_id = None
+        if request.background:
+            result_id = pending_results.submit(_complete_in_background(task, user_name, lease))
+        if result_id is None:
+            task.cancel()
+        else:
+            lease.transfer()
+        answer["result_id"] = result_id
+    return answer
+
+async def _run_rpa(client, user_name, target_scheme, store):
+    """
+    An application run, off the response path (GET /api/chat/result/{id}): queueing for a
+    browser and the Selenium fill take far longer than any chat budget.
+    """
+    # A browser reserved by an earlier turn already holds its "rpa" slot (see _speculate_rpa)
+    reservation = await run_in_threadpool(rpa_engine.claim, user_name, target_scheme)
+    if reservation is not None:
+        return await run_in_threadpool(_launch_rpa, user_name, target_scheme, store, reservation)
+    try:
+        # Each run holds a Chrome instance: separate, much smaller limit
+        async with get_controller("rpa").slot(client):
+            return await run_in_threadpool(_launch_rpa, user_name, target_scheme, store)
+    except Rejected as busy:
+        return {"status": "busy", "message": "Automation is busy, please confirm again shortly.",
+                "retry_after": busy.retry_after}
+
+@app.post("/api/chat")
+async def chat_endpoint(request: SchemeRequest, http_request: Request):
+    user_name = request.user_profile.name
+    client = client_key(http_request)
+    deadline = time.perf_counter() + resolve_budget(http_request.headers, request.deadline_ms)
+
+    # Bounded concurrency + fair per-client queue; refusals surface as 429/503 (see rejected_handler)
+    async with get_controller("chat").slot(client) as lease:
+        # One read of the user record and at most one write for the whole turn
+        uow = UnitOfWork(data_store)
+        try:
+            session, history = await run_in_threadpool(_open_session, request, user_name)
+            # Every stage is bounded by what is left of the budget, not only the LLM call
+            prepared, result = await _within(
+                deadline, rag_engine.prepare, request.user_profile, request.query, history, uow)
+            # What the rest of the turn reads through; never a unit of work a late stage still uses
+            # (UnitOfWork is not thread-safe)
+            reader = uow
+            if prepared:
+                inputs, docs = result
+                ai_response = await _answer_within(deadline, inputs, docs, request, user_name, uow, lease)
+            else:
+                # The late prepare still owns the unit of work: read the store directly
+                reader = data_store
+                ai_response = await _degrade([], user_name, "retrieval_deadline", data_store)
+            try:
+                if uow.dirty:
+                    # Taken before the commit starts: a late commit keeps rewriting uow
+                    reader = uow.snapshot()
+                    saved, _ = await _within(deadline, _commit, uow)
+                    if not saved:
+                        log.warning("⏱️ Store write finishing after the reply", extra={"user": user_name})
+            except VersionConflict as conflict:
+                # Still racing after the re-merge (commit retries once): keep the answer already paid
+                # for; the extracted fields are simply asked for again
+                log.warning("⚠️ Concurrent update, fields not saved", extra={"user": conflict.key, "error": str(conflict)})
+
+            # 3. CHECK FOR ACTION
+            if ai_response.get("action") == "TRIGGER_RPA":
+                target_scheme = ai_response.get("target_scheme", "Unknown Scheme")
+                result_id = pending_results.submit(_run_rpa(client, user_name, target_scheme, reader))
+                if result_id:
+                    rpa_result = {"status": "pending", "result_id": result_id,
+                                  "message": "Follow it at /api/chat/result/" + result_id}
+                    ai_response["response_text"] += "\n\n🚀 [System]: Application process started!"
+                else:
+                    rpa_result = {"status": "busy", "message": "Automation is busy, please confirm again shortly."}
+                    ai_response["response_text"] += f"\n\n⏳ [System]: {rpa_result['message']}"
+                ai_response["rpa_status"] = rpa_result
+            else:
+                await _speculate_rpa(user_name, ai_response, reader)
+
+            with span("session"):
+                sessions.record_turn(session, request.query, ai_response.get("response_text", ""))
+            ai_response["session_id"] = session["id"]
+            return ai_response
+
+        except Exception as e:
+            log.error("Chat Error", extra={"error": str(e)}, exc_info=True)
+            raise HTTPException(status_code=500, detail="Chat failed, please try again.")
+
+class AdmittedStream(StreamingResponse):
+    """
+    A StreamingResponse holding an admission lease until the response is over, however it ends:
+    a generator's finally never runs if the client leaves before the first chunk.
+    """
+    def __init__(self, content, lease, **kwargs):
+        super().__init__(content, **kwargs)
+        self.lease = lease
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.lease.release()
+
+def _batch_saved(future):
+    if future.cancelled():
+        return
+    if isinstance(future.exception(), VersionConflict):
+        # Still racing after the re-merge: the extracted fields are simply asked for again
+        log.warning("⚠️ Concurrent update, batch fields not saved", extra={"user": future.exception().key})
+    elif future.exception() is not None:
+        log.error("❌ Batch store write failed", extra={"error": str(future.exception())})
+    else:
+        log.info("💾 Batch fields saved", extra={"users": future.result()})
+
+@app.post("/api/chat/batch")
+async def chat_batch(request: BatchRequest, http_request: Request):
+    """
+    Bulk recommendations (enrollment camps): one store snapshot, one embedding batch and one
+    vector search for all items, then LLM calls fanned out under a cap. Streams one NDJSON line
+    per item as it finishes: {"index", "id", "user", "status": ok | degraded, "response"}.
+    Single-turn: no sessions, and automation is never launched from a batch.
+    """
+    if not request.items:
+        raise HTTPException(status_code=400, detail="No items.")
+    if len(request.items) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"At most {BATCH_MAX_ITEMS} items per batch.")
+    concurrency = max(1, min(request.concurrency or BATCH_CONCURRENCY, BATCH_CONCURRENCY))
+
+    # Admitted (or refused with 429/503) before the stream starts; the response owns the slot from
+    # here on (see AdmittedStream), so it is released even if the stream is never iterated
+    client = client_key(http_request)
+    controller = get_controller("batch")
+    await controller.acquire(client)
+    lease = Lease(controller)
+    try:
+        prepared = await run_in_threadpool(
+            rag_engine.prepare_many, [(item.user_profile.name, item.query, []) for item in request.items])
+    except BaseException:
+        lease.release()
+        raise
+    # (user, answer) with extracted fields, written in one commit when the stream ends
+    extracted = []
+
+    async def answer(index, item, inputs, docs, limit):
+        user_name = item.user_profile.name
+        async with limit:
+            try:
+                ai_response = _parse_answer(await rag_engine.arecommend(inputs))
+                if ai_response.get("extracted_data"):
+                    extracted.append((user_name, ai_response))
+                status = "ok"
+            except Exception as e:
+                if cassette_miss(e):
+                    raise cassette_miss(e)
+                log.error("❌ Batch item failed", extra={"user": user_name, "error": str(e)})
+                ai_response = await run_in_threadpool(_degraded_answer, docs, user_name, "llm_error")
+                status = "degraded"
         if ai_response.get("action") == "TRIGGER_RPA":
-            target_scheme = ai_response.get("target_scheme", "Unknown Scheme")
-            
-            # Fetch fresh data
-            full_user_data = data_store.get_user_data(user_name)
-            
-            # --- FIXED EXTRACTION LOGIC ---
-            profile_root = full_user_data.get("profile", {})
-            
-            # Check if names are nested inside 'personal_details' (Common in OCR data)
-            personal_info = profile_root.get("personal_details", profile_root)
-            
-            # Check if contact is nested inside 'contact_details'
-            contact_info = profile_root.get("contact_details", profile_root)
-
-            # Get Docs (for Marks)
-            docs = full_user_data.get("documents", [])
-            marks_data = {}
-            for doc in docs:
-                if doc.get("type") == "Marks Sheet":
-                    marks_data = doc.get("data", {})
-
-            # Construct Payload with CORRECT Paths
-            rpa_data = {
-                "personal_details": {
-                    "first_name": personal_info.get("first_name", ""),
-                    "middle_name": personal_info.get("middle_name", ""),
-                    "last_name": personal_info.get("last_name", ""), # Now correctly fetches "Rayappan"
-                    "dob": personal_info.get("dob", ""),
-                    "father_name": marks_data.get("Father Name") or personal_info.get("father_name", "")
-                },
-                "contact_details": {
-                    "mobile": contact_info.get("mobile", profile_root.get("mobile", "")),
-                    "email": contact_info.get("email", profile_root.get("email", ""))
-                },
-                "education_details": {
-                    "board": marks_data.get("Board", "State Board"),
-                    "marks": {"physics": marks_data.get("Physics"), "total": marks_data.get("Total")}
-                }
-            }
-            
-            print(f"🚀 Launching RPA for {target_scheme}...")
-            # Debug Print to confirm it worked
-            print(f"   Name extracted: {rpa_data['personal_details']['first_name']} {rpa_data['personal_details']['last_name']}")
-            
-            rpa_result = rpa_engine.apply_for_scheme(rpa_data, scheme_name=target_scheme)
-            
-            ai_response["response_text"] += f"\n\n🚀 [System]: Application process started! {rpa_result.get('message', '')}"
-            ai_response["rpa_status"] = rpa_result
+            ai_response["rpa_status"] = {"status": "skipped", "message": "Automation is not run from batch requests."}
+        return {"index": index, "id": item.id, "user": user_name, "status": status, "response": ai_response}
 
-        return ai_response
+    async def stream():
+        start = time.perf_counter()
+        limit = asyncio.Semaphore(concurrency)
+        tasks = [asyncio.create_task(answer(i, item, inputs, docs, limit))
+                 for i, (item, (inputs, docs)) in enumerate(zip(request.items, prepared))]
+        try:
+            for finished in asyncio.as_completed(tasks):
+                yield json.dumps(await finished, ensure_ascii=False) + "\n"
+        finally:
+            # Client went away: stop paying for the remaining LLM calls
+            for task in tasks:
+                task.cancel()
+            if extracted:
+                # Not awaited: a disconnected client's stream is being cancelled, the answers
+                # that did finish still keep their fields
+                saving = asyncio.ensure_future(run_in_threadpool(_save_extracted, extracted))
+                saving.add_done_callback(_batch_saved)
+            log.info("📦 Batch finished", extra={"items": len(tasks), "seconds": round(time.perf_counter() - start, 2)})
+
+    return AdmittedStream(stream(), lease, media_type="application/x-ndjson")
 
-    except Exception as e:
-        print(f"Chat Error: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+@app.get("/api/chat/result/{result_id}")
+def chat_result(result_id: str):
+    """
+    Full LLM answer for a reply that was sent degraded, or the outcome of an application run
+    started by a turn (status: pending | done | failed | unknown).
+    """
+    return pending_results.get(result_id)
@@ -0,0 +1,187 @@
+"""
+Production launcher: pre-fork workers that share the model and the scheme index.
+
+The master imports the app once (MiniLM weights, tokenizer, mmap scheme index, catalog data),
+warms it up, freezes the GC and forks N uvicorn workers on one listening socket.
+Workers share those pages copy-on-write; only caches and connections are per-worker
+(LLM / DigiLocker clients are rebuilt after fork).
+
+Linux/macOS only (needs fork). Build and publish the index first (python ingest.py);
+workers map the mmap copy of the live generation and follow later rebuilds without a restart.
+
+Usage (from backend/):
+    python serve.py --workers 4 --port 8000 --report-after 30
+    kill -USR1 <master pid>     # print the per-worker memory report again
+"""
+import argparse
+import gc
+import os
+import signal
+import socket
+import sys
+import time
+
+# One inference thread per worker: N workers x all cores oversubscribes the CPU,
+# and OpenMP thread pools do not survive fork().
+os.environ.setdefault("OMP_NUM_THREADS", "1")
+os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+os.environ.setdefault("SCHEME_INDEX_BACKEND", "mmap")
+if os.path.exists("scheme_index"):
+    os.environ.setdefault("SCHEME_INDEX_DIR", "scheme_index")
+
+SMAPS_FIELDS = ("Rss", "Pss", "Shared_Clean", "Shared_Dirty", "Private_Clean", "Private_Dirty")
+
+
+def read_smaps_rollup(pid):
+    """
+    {"Rss": kB, "Pss": kB, ..., "Uss": kB}; Uss = private pages = what the process really costs.
+    """
+    values = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                key, _, rest = line.partition(":")
+                if key in SMAPS_FIELDS:
+                    values[key] = int(rest.split()[0])
+    except OSError:
+        return None
+    values["Uss"] = values.get("Private_Clean", 0) + values.get("Private_Dirty", 0)
+    return values
+
+
+def memory_report(master_pid, workers):
+    rows = [("master", master_pid, read_smaps_rollup(master_pid))]
+    rows += [(f"worker-{slot}", pid, read_smaps_rollup(pid)) for slot, pid in sorted(workers.items())]
+
+    print(f"\n{'process':10} {'pid':>7} {'RSS MB':>8} {'PSS MB':>8} {'USS MB':>8} {'shared MB':>10}")
+    total_pss = 0
+    for label, pid, mem in rows:
+        if mem is None:
+            print(f"{label:10} {pid:>7}  (smaps_rollup unavailable)")
+            continue
+        shared = mem.get("Shared_Clean", 0) + mem.get("Shared_Dirty", 0)
+        total_pss += mem.get("Pss", 0)
+        print(f"{label:10} {pid:>7} {mem['Rss'] / 1024:>8.1f} {mem['Pss'] / 1024:>8.1f} "
+              f"{mem['Uss'] / 1024:>8.1f} {shared / 1024:>10.1f}")
+    print(f"{'total PSS':10} {'':>7} {'':>8} {total_pss / 1024:>8.1f}  (real memory used by the whole group)\n")
+    sys.stdout.flush()
+
+
+def preload():
+    """
+    Everything expensive and read-only happens here, before fork.
+    """
+    import main
+    start = time.perf_counter()
+    # First call allocates torch buffers and touches every weight page in the parent
+    main.rag_engine.embeddings.embed_query("warm up")
+    main.rag_engine._search_schemes("scholarship for students")
+    # Profile vectors are queued at import; finish them here so no embedding thread is running
+    # at fork and every worker shares them
+    main.rag_engine.profiles.drain()
+    print(f"🔥 Warm-up done in {time.perf_counter() - start:.2f}s")
+
+    # Objects created so far are never collected: keeps GC from writing to (and un-sharing) their pages
+    gc.collect()
+    gc.freeze()
+    return main
+
+
+def after_fork(main):
+    """
+    Worker-local state only: connection pools and caches.
+    """
+    from app.routers import identity
+    from app.services.digilocker_client import AsyncDigiLockerClient
+
+    main.rag_engine.build_clients()
+    identity.digilocker_client = AsyncDigiLockerClient()
+
+
+def run_worker(main, sock, args):
+    import uvicorn
+
+    after_fork(main)
+    config = uvicorn.Config(main.app, log_level=args.log_level, timeout_keep_alive=5, access_log=False)
+    server = uvicorn.Server(config)
+    server.run(sockets=[sock])
+
+
+def bind_socket(host, port, backlog=2048):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def main_loop(args):
+    if not hasattr(os, "fork"):
+        sys.exit("serve.py needs fork(); use `uvicorn main:app` on Windows.")
+
+    app_module = preload()
+    sock = bind_socket(args.host, args.port)
+    master_pid = os.getpid()
+    workers = {}  # slot -> pid
+    stopping = False
+
+    def spawn(slot):
+        pid = os.fork()
+        if pid == 0:
+            # Child: default signal handling, let uvicorn install its own
+            for sig in (signal.SIGTERM, signal.SIGINT, signal.SIGUSR1, signal.SIGALRM):
+                signal.signal(sig, signal.SIG_DFL)
+            try:
+                run_worker(app_module, sock, args)
+            finally:
+                os._exit(0)
+        workers[slot] = pid
+
+    def shutdown(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in workers.values():
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+    signal.signal(signal.SIGUSR1, lambda *_: memory_report(master_pid, workers))
+    signal.signal(signal.SIGALRM, lambda *_: memory_report(master_pid, workers))
+
+    for slot in range(args.workers):
+        spawn(slot)
+    print(f"🚀 Master {master_pid} serving on http://{args.host}:{args.port} with {args.workers} workers")
+    if args.report_after:
+        signal.alarm(args.report_after)
+
+    while workers:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        slot = next((s for s, p in workers.items() if p == pid), None)
+        if slot is None:
+            continue
+        del workers[slot]
+        if not stopping:
+            print(f"⚠️ Worker {slot} (pid {pid}) exited with status {status}; respawning")
+            spawn(slot)
+
+    sock.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pre-fork multi-worker server")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    parser.add_argument("--log-level", default="warning")
+    parser.add_argument("--report-after", type=int, default=0,
+                        help="print per-worker RSS/PSS/USS this many seconds after start (0 = only on SIGUSR1)")
+    main_loop(parser.parse_args())
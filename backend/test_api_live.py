@@ -2,22 +2,14 @@ import requests
 import json
 
 # 1. The URL of your new Local API
-url = "http://localhost:8000/api/recommend"
+url = "http://localhost:8000/api/chat"
 
 # 2. The Data your Frontend will eventually send
+# (For offline latency numbers use: python -m benchmarks.bench_suite)
 payload = {
-    "user_xml": """
-    <User>
-        <Name>Rahul Kumar</Name>
-        <Age>19</Age>
-        <Gender>Male</Gender>
-        <Occupation>Student</Occupation>
-        <Caste>SC</Caste>
-        <Income>150000</Income>
-        <Education>Class 12 Pass</Education>
-    </User>
-    """,
-    "query": "I need financial help for university."
+    "user_profile": {"name": "Rahul Kumar"},
+    "query": "I am a 19 year old SC student, family income 150000. I need financial help for university.",
+    "history": []
 }
 
 print("🚀 Sending request to Sev-ai API...")